@@ -0,0 +1,47 @@
+import logging
+import datetime
+import schema
+import database
+from utils import tracing
+
+logger = logging.getLogger()
+
+# Key -> value entries with an expiry, the shared MongoDB tier of intent_cache and stt_cache.
+# Each collection has a TTL index on expires_at (schema.INDEX_SPECS); reads also check it,
+# as the TTL monitor only runs once a minute.
+
+@tracing.traced('db')
+def get_cache_entry(collection_name, key):
+    """Returns the cached value for `key` if present and not expired, else None."""
+    try:
+        db = database.get_db()
+        if db is None:
+            return None
+        doc = db[collection_name].find_one(
+            {'key': key, 'expires_at': {'$gt': datetime.datetime.utcnow()}},
+            {'_id': 0, 'value': 1}
+        )
+        return doc['value'] if doc else None
+    except Exception as e:
+        logger.error(f"Mongo Error reading cache {collection_name}: {e}")
+        return None
+
+@tracing.traced('db')
+def save_cache_entry(collection_name, key, value, ttl_seconds):
+    try:
+        db = database.get_db()
+        if db is None:
+            return False
+        collection = db[collection_name]
+        schema.ensure_collection_indexes(collection)
+
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl_seconds)
+        collection.update_one(
+            {'key': key},
+            {'$set': {'key': key, 'value': value, 'expires_at': expires_at}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Mongo Error saving cache {collection_name}: {e}")
+        return False
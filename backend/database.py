@@ -1,58 +1,237 @@
 import os
+import json
+import time
 import pymongo
+import schema
 import uuid
 import datetime
 import logging
+import threading
+from pymongo import monitoring, WriteConcern
+from utils import tracing
+from utils.write_buffer import WriteBuffer
 
 logger = logging.getLogger()
 
 # MongoDB Client (Global to reuse across invocations for warm starts)
 client = None
+_client_lock = threading.Lock()
+_warmup_thread = None
+
+class _ConnectionPhaseListener(monitoring.ServerHeartbeatListener, monitoring.ConnectionPoolListener):
+    """
+    Records how long the first topology discovery (hello) and the first connection
+    handshake (TLS + auth) took, for the warm-up timing log.
+    """
+    def __init__(self):
+        self.phases = {}
+        self._created = {}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.phases.setdefault('topology_discovery_ms', round(event.duration * 1000, 1))
+
+    def failed(self, event):
+        logger.warning(f"Mongo heartbeat failed: {event.reply}")
+
+    def connection_created(self, event):
+        self._created[event.connection_id] = time.perf_counter()
+
+    def connection_ready(self, event):
+        created = self._created.pop(event.connection_id, None)
+        if created is not None:
+            self.phases.setdefault('connection_handshake_ms', round((time.perf_counter() - created) * 1000, 1))
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    def connection_checked_out(self, event): pass
+    def connection_checked_in(self, event): pass
+
+_phase_listener = _ConnectionPhaseListener()
+
+class _CommandTimingListener(monitoring.CommandListener):
+    """Adds the server round-trip time of every MongoDB command to the invocation trace as `mongo`."""
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        tracing.record('mongo', event.duration_micros / 1000)
+
+    def failed(self, event):
+        tracing.record('mongo', event.duration_micros / 1000)
+
+_command_listener = _CommandTimingListener()
 
 # Collection Names
-TODOS_COLLECTION = 'todos'
-NOTES_COLLECTION = 'notes'
-KEYWORDS_COLLECTION = 'keywords'
+from schema import TODOS_COLLECTION, NOTES_COLLECTION, KEYWORDS_COLLECTION, META_COLLECTION
+
+KEYWORDS_VERSION_ID = 'keywords_version'
+
+# Paginated history listing
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Full listings, newest first
+LIST_SORT = [('created_at', pymongo.DESCENDING)]
+# Newest first; id breaks created_at ties between items of one batch insert
+PAGE_SORT = [('created_at', pymongo.DESCENDING), ('id', pymongo.DESCENDING)]
+# Fields a page may be narrowed to (`fields=`); _id is never returned
+ITEM_FIELDS = {
+    TODOS_COLLECTION: ('id', 'text', 'priority', 'status', 'created_at', 'updated_at'),
+    NOTES_COLLECTION: ('id', 'text', 'created_at', 'updated_at'),
+}
+
+# Todo/note inserts: 'ack' (default) returns once MongoDB acknowledged the insert;
+# 'journaled-async' returns once the item is queued and writes it with the next batch
+# (WRITE_BATCH_SIZE items or WRITE_FLUSH_MS after the first), journaled, via insert_many
+WRITE_DURABILITY_MODES = ('ack', 'journaled-async')
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', '50'))
+WRITE_FLUSH_MS = float(os.environ.get('WRITE_FLUSH_MS', '50'))
 
 def _get_db():
-    global client
     db_name = os.environ.get('MONGO_DB_NAME', 'voice_assistant')
     if not client:
-        user = os.environ.get('MONGO_USERNAME')
-        password = os.environ.get('MONGO_PASSWORD')
-        
-        instance_id = os.environ.get('MONGO_INSTANCE_ID')
-        private_network_id = os.environ.get('MONGO_PRIVATE_NETWORK_ID')
-        cert_file = os.environ.get('MONGO_TLS_CERT_FILE', 'cert.pem')
-        
-        # If running in Scaleway Function, cert.pem should be in root (./cert.pem) or backend/cert.pem
-        if not os.path.exists(cert_file):
-             # Fallback to relative path if needed
-             cert_file = os.path.join(os.path.dirname(__file__), cert_file)
-
-        if not instance_id or not private_network_id:
-            # Fallback for local testing or public endpoint
-            host = os.environ.get('MONGO_HOST')
-            if host:
-                uri = f"mongodb+srv://{user}:{password}@{host}/?retryWrites=true&w=majority"
-            else:
-                 # If we are mocking or testing without DB, this might fail unless we mock client
-                 logger.warning("MONGO_INSTANCE_ID or MONGO_HOST not set. DB operations will fail.")
-                 return None 
+        # A background warm-up may be creating the client; wait for it instead of racing it
+        with _client_lock:
+            if not client and not _create_client():
+                return None
+    return client[db_name]
+
+def get_db():
+    """The application database, or None when MongoDB is not configured. For the stores built on this module."""
+    return _get_db()
+
+def _create_client():
+    """Builds the MongoClient from the environment. Returns False when no host is configured."""
+    global client
+    user = os.environ.get('MONGO_USERNAME')
+    password = os.environ.get('MONGO_PASSWORD')
+    
+    instance_id = os.environ.get('MONGO_INSTANCE_ID')
+    private_network_id = os.environ.get('MONGO_PRIVATE_NETWORK_ID')
+    cert_file = os.environ.get('MONGO_TLS_CERT_FILE', 'cert.pem')
+    
+    # If running in Scaleway Function, cert.pem should be in root (./cert.pem) or backend/cert.pem
+    if not os.path.exists(cert_file):
+         # Fallback to relative path if needed
+         cert_file = os.path.join(os.path.dirname(__file__), cert_file)
+
+    if os.environ.get('MONGO_URI'):
+        # Full connection string, e.g. a local mongod or scripts/fake_services
+        uri = os.environ['MONGO_URI']
+    elif not instance_id or not private_network_id:
+        # Fallback for local testing or public endpoint
+        host = os.environ.get('MONGO_HOST')
+        if host:
+            uri = f"mongodb+srv://{user}:{password}@{host}/?retryWrites=true&w=majority"
         else:
-            # Scaleway Private Network Connection String
-            host = f"{instance_id}.{private_network_id}.internal"
-            uri = f"mongodb+srv://{user}:{password}@{host}/?tls=true&tlsCAFile={cert_file}"
+             # If we are mocking or testing without DB, this might fail unless we mock client
+             logger.warning("MONGO_INSTANCE_ID or MONGO_HOST not set. DB operations will fail.")
+             return False 
+    else:
+        # Scaleway Private Network Connection String
+        host = f"{instance_id}.{private_network_id}.internal"
+        uri = f"mongodb+srv://{user}:{password}@{host}/?tls=true&tlsCAFile={cert_file}"
 
-        client = pymongo.MongoClient(uri)
-        
-    return client[db_name]
+    client = pymongo.MongoClient(uri, event_listeners=[_phase_listener, _command_listener])
+
+    # Index bootstrap runs off the request path; warm instances never repeat it
+    db = client[os.environ.get('MONGO_DB_NAME', 'voice_assistant')]
+    threading.Thread(target=_bootstrap_indexes, args=(db,), name='mongo-indexes', daemon=True).start()
+    return True
+
+def _bootstrap_indexes(db):
+    try:
+        schema.ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Mongo index bootstrap failed: {e}")
+
+def warm_up():
+    """
+    Creates the client (SRV lookup, topology monitor) and runs a ping (server selection,
+    TLS handshake, auth) so the first real operation finds a ready connection.
+    Logs and returns the per-phase timings in milliseconds.
+    """
+    timings = {}
+    start = time.perf_counter()
+    db = _get_db()
+    timings['client_init_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    if db is not None:
+        ping_start = time.perf_counter()
+        try:
+            db.command('ping')
+        except Exception as e:
+            logger.error(f"Mongo warm-up ping failed: {e}")
+        timings['ping_ms'] = round((time.perf_counter() - ping_start) * 1000, 1)
+        timings.update(_phase_listener.phases)
+    timings['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(json.dumps(dict(timings, event='mongo_warmup')))
+    return timings
+
+def start_warmup():
+    """Starts `warm_up` on a background thread once per process; returns the thread."""
+    global _warmup_thread
+    with _client_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_up, name='mongo-warmup', daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+def _write_durability():
+    mode = os.environ.get('WRITE_DURABILITY', 'ack')
+    if mode not in WRITE_DURABILITY_MODES:
+        logger.warning(f"Unknown WRITE_DURABILITY {mode!r}, using ack")
+        return 'ack'
+    return mode
+
+def _insert_batch(collection_name, items):
+    """Flushes one write-behind batch; returns the items that cannot be written."""
+    db = _get_db()
+    if db is None:
+        raise Exception("Database connection not configured")
+    collection = db[collection_name].with_options(write_concern=WriteConcern(j=True))
+    try:
+        collection.insert_many(items, ordered=False)
+        return []
+    except pymongo.errors.BulkWriteError as e:
+        if e.details.get('writeConcernErrors'):
+            raise
+        # Duplicate keys are inserts that already landed on an earlier attempt of this batch
+        failed = {error['index'] for error in e.details.get('writeErrors', []) if error.get('code') != 11000}
+        return [items[index] for index in sorted(failed)]
+
+_write_buffer = WriteBuffer(_insert_batch, max_batch=WRITE_BATCH_SIZE, max_delay=WRITE_FLUSH_MS / 1000)
+
+def _insert_items(collection, items):
+    """Inserts todo/note items according to WRITE_DURABILITY."""
+    if _write_durability() == 'journaled-async':
+        # insert_many adds _id to what it writes; the caller's items stay clean
+        _write_buffer.put(collection.name, [dict(item) for item in items])
+    elif len(items) == 1:
+        collection.insert_one(items[0])
+    else:
+        collection.insert_many(items, ordered=False)
+
+def flush_writes(timeout=None):
+    """Writes queued inserts now. Reads and deletes call this so this instance sees its own writes."""
+    return _write_buffer.flush(timeout)
+
+def get_write_stats():
+    """Counts of queued, flushed and failed write-behind items, and those still pending."""
+    return dict(_write_buffer.stats(), mode=_write_durability())
 
 def get_mongo_collection():
     """Legacy helper for backward compatibility, returns 'todos' collection"""
     db = _get_db()
     return db[TODOS_COLLECTION] if db is not None else None
 
+@tracing.traced('db')
 def save_todo_item(text, priority):
     try:
         collection = get_mongo_collection()
@@ -66,8 +245,9 @@ def save_todo_item(text, priority):
             'created_at': datetime.datetime.utcnow().isoformat(),
             'status': 'pending'
         }
+        item['updated_at'] = item['created_at']
         
-        collection.insert_one(item)
+        _insert_items(collection, [item])
         # Remove _id (ObjectId) before returning
         item.pop('_id', None)
         return item
@@ -75,6 +255,7 @@ def save_todo_item(text, priority):
         logger.error(f"Mongo Error: {e}")
         raise e
 
+@tracing.traced('db')
 def save_note_item(text):
     try:
         db = _get_db()
@@ -88,55 +269,109 @@ def save_note_item(text):
             'text': text,
             'created_at': datetime.datetime.utcnow().isoformat()
         }
+        item['updated_at'] = item['created_at']
         
-        collection.insert_one(item)
+        _insert_items(collection, [item])
         item.pop('_id', None)
+        notes_changed(saved=[item])
         return item
     except Exception as e:
         logger.error(f"Mongo Error saving note: {e}")
         raise e
 
+@tracing.traced('db')
+def save_todo_items(entries):
+    """Bulk variant of save_todo_item: one insert_many for a list of (text, priority)."""
+    try:
+        collection = get_mongo_collection()
+        if collection is None:
+             raise Exception("Database connection not configured")
+
+        created_at = datetime.datetime.utcnow().isoformat()
+        items = [
+            {'id': str(uuid.uuid4()), 'text': text, 'priority': priority, 'created_at': created_at, 'updated_at': created_at, 'status': 'pending'}
+            for text, priority in entries
+        ]
+        _insert_items(collection, items)
+        for item in items:
+            item.pop('_id', None)
+        return items
+    except Exception as e:
+        logger.error(f"Mongo Error saving todos: {e}")
+        raise e
+
+@tracing.traced('db')
+def save_note_items(texts):
+    """Bulk variant of save_note_item: one insert_many for a list of texts."""
+    try:
+        db = _get_db()
+        if db is None:
+             raise Exception("Database connection not configured")
+
+        created_at = datetime.datetime.utcnow().isoformat()
+        items = [{'id': str(uuid.uuid4()), 'text': text, 'created_at': created_at, 'updated_at': created_at} for text in texts]
+        _insert_items(db[NOTES_COLLECTION], items)
+        for item in items:
+            item.pop('_id', None)
+        notes_changed(saved=items)
+        return items
+    except Exception as e:
+        logger.error(f"Mongo Error saving notes: {e}")
+        raise e
+
+@tracing.traced('db')
 def delete_todo_item(item_id):
+    flush_writes()
     try:
         collection = get_mongo_collection()
         if collection is not None:
             result = collection.delete_one({'id': item_id})
+            if result.deleted_count > 0:
+                _record_tombstones(collection.database, 'todo', [item_id])
             return result.deleted_count > 0
         return False
     except Exception as e:
         logger.error(f"Mongo Error deleting todo: {e}")
         return False
 
+@tracing.traced('db')
 def delete_note_item(item_id):
+    flush_writes()
     try:
         db = _get_db()
         if db is not None:
             collection = db[NOTES_COLLECTION]
             result = collection.delete_one({'id': item_id})
+            if result.deleted_count > 0:
+                _record_tombstones(db, 'note', [item_id])
+                notes_changed(deleted=[item_id])
             return result.deleted_count > 0
         return False
     except Exception as e:
         logger.error(f"Mongo Error deleting note: {e}")
         return False
 
+@tracing.traced('db')
 def get_all_todos():
+    flush_writes()
     try:
         collection = get_mongo_collection()
         if collection is not None:
-            # Sort by created_at descending (newest first)
-            items = list(collection.find({}, {'_id': 0}).sort('created_at', -1))
+            items = list(collection.find({}, {'_id': 0}).sort(LIST_SORT))
             return items
         return []
     except Exception as e:
         logger.error(f"Mongo Error listing todos: {e}")
         return []
 
+@tracing.traced('db')
 def get_all_notes():
+    flush_writes()
     try:
         db = _get_db()
         if db is not None:
             collection = db[NOTES_COLLECTION]
-            items = list(collection.find({}, {'_id': 0}).sort('created_at', -1))
+            items = list(collection.find({}, {'_id': 0}).sort(LIST_SORT))
             return items
         return []
         return []
@@ -144,7 +379,70 @@ def get_all_notes():
         logger.error(f"Mongo Error listing notes: {e}")
         return []
 
+@tracing.traced('db')
+def iter_items_page(collection_name, before=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+    """
+    Returns a cursor over one page of items, newest first, using keyset pagination on
+    (created_at, id): `before` is page_cursor() of the last item of the previous page. Batch
+    inserts share one created_at, so the id breaks ties and a page boundary inside a batch
+    loses nothing. A bare created_at (older clients) is still accepted.
+    Items are fetched in a single batch of the page size so callers can encode them as they arrive.
+    """
+    flush_writes()
+    try:
+        db = _get_db()
+        if db is None:
+            return []
+        collection = db[collection_name]
+        schema.ensure_collection_indexes(collection)
+
+        query = page_query(before) if before else {}
+        projection = {'_id': 0}
+        if fields:
+            projection.update({field: 1 for field in fields if field in ITEM_FIELDS[collection_name]})
+            # Needed by the client to request the next page
+            projection['created_at'] = 1
+            projection['id'] = 1
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        return collection.find(query, projection).sort(PAGE_SORT).limit(limit).batch_size(limit)
+    except Exception as e:
+        logger.error(f"Mongo Error listing {collection_name} page: {e}")
+        return []
+
+def page_cursor(item):
+    """The `before` value that continues a page listing after `item`."""
+    return f"{item.get('created_at')},{item.get('id')}"
+
+def page_query(before):
+    """The filter for the items after `before` (a page_cursor() value, or a bare created_at)."""
+    created_at, _, item_id = before.partition(',')
+    if not item_id:
+        return {'created_at': {'$lt': created_at}}
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, 'id': {'$lt': item_id}},
+    ]}
+
+@tracing.traced('db')
+def count_items(collection_name):
+    """
+    Cheap total-count hint from collection metadata (may lag behind very recent writes).
+    None when the count is unavailable (no database configured, or an error).
+    """
+    flush_writes()
+    try:
+        db = _get_db()
+        if db is not None:
+            return db[collection_name].estimated_document_count()
+        return None
+    except Exception as e:
+        logger.error(f"Mongo Error counting {collection_name}: {e}")
+        return None
+
+@tracing.traced('db')
 def get_all_keywords():
+    """The {key: value} map, or None when the read failed (so callers can keep what they had)."""
     try:
         db = _get_db()
         if db is not None:
@@ -156,8 +454,32 @@ def get_all_keywords():
         return {}
     except Exception as e:
         logger.error(f"Mongo Error listing keywords: {e}")
-        return {}
+        return None
 
+def get_keywords_collection():
+    db = _get_db()
+    return db[KEYWORDS_COLLECTION] if db is not None else None
+
+@tracing.traced('db')
+def get_keywords_version():
+    """Monotonic version of the keywords collection, bumped on every keyword write."""
+    try:
+        db = _get_db()
+        if db is None:
+            return None
+        doc = db[META_COLLECTION].find_one({'_id': KEYWORDS_VERSION_ID}, {'version': 1})
+        return doc['version'] if doc else 0
+    except Exception as e:
+        logger.error(f"Mongo Error reading keywords version: {e}")
+        return None
+
+def keywords_changed(db):
+    """Bumps the keywords version stamp, so other instances reload, and drops this instance's map."""
+    import keyword_cache
+    db[META_COLLECTION].update_one({'_id': KEYWORDS_VERSION_ID}, {'$inc': {'version': 1}}, upsert=True)
+    keyword_cache.invalidate()
+
+@tracing.traced('db')
 def save_keyword(key, value):
     try:
         db = _get_db()
@@ -172,6 +494,7 @@ def save_keyword(key, value):
             'value': value,
             'created_at': datetime.datetime.utcnow().isoformat()
         }
+        item['updated_at'] = item['created_at']
         
         # Upsert: Update if key exists, otherwise insert
         collection.update_one(
@@ -179,11 +502,14 @@ def save_keyword(key, value):
             {'$set': item},
             upsert=True
         )
+        _clear_tombstones(db, 'keyword', [item['key']])
+        keywords_changed(db)
         return item
     except Exception as e:
         logger.error(f"Mongo Error saving keyword: {e}")
         raise e
 
+@tracing.traced('db')
 def delete_keyword(key):
     try:
         db = _get_db()
@@ -191,8 +517,30 @@ def delete_keyword(key):
             collection = db[KEYWORDS_COLLECTION]
             # Delete by key (which is unique/primary for our usage)
             result = collection.delete_one({'key': key.lower()})
+            if result.deleted_count > 0:
+                _record_tombstones(db, 'keyword', [key.lower()])
+                keywords_changed(db)
             return result.deleted_count > 0
         return False
     except Exception as e:
         logger.error(f"Mongo Error deleting keyword: {e}")
         return False
+
+def notes_changed(saved=(), deleted=()):
+    """Passes note writes on to the search index."""
+    if not saved and not deleted:
+        return
+    import note_search
+    try:
+        note_search.on_notes_changed(saved, deleted)
+    except Exception as e:
+        # Another instance's refresh still picks the change up from the sync delta
+        logger.warning(f"Note search index update failed: {e}")
+
+def _record_tombstones(db, item_type, ids):
+    import sync_store
+    sync_store.record_tombstones(db, item_type, ids)
+
+def _clear_tombstones(db, item_type, ids):
+    import sync_store
+    sync_store.clear_tombstones(db, item_type, ids)
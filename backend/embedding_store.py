@@ -0,0 +1,37 @@
+import schema
+import database
+from pymongo import UpdateOne
+from utils import tracing
+from schema import NOTE_EMBEDDINGS_COLLECTION
+
+# Note embedding vectors (float16 bytes) per embedding model, for note_search.
+
+@tracing.traced('db')
+def get_note_embeddings(model):
+    """Returns [(note id, float16 vector bytes)] stored for the embedding model."""
+    db = database.get_db()
+    if db is None:
+        return []
+    collection = db[NOTE_EMBEDDINGS_COLLECTION]
+    schema.ensure_collection_indexes(collection)
+    return [(doc['id'], doc['vector']) for doc in collection.find({'model': model}, {'_id': 0, 'id': 1, 'vector': 1})]
+
+@tracing.traced('db')
+def save_note_embeddings(model, vectors):
+    """Upserts [(note id, float16 vector bytes)] for the embedding model in one bulk_write."""
+    db = database.get_db()
+    if db is None or not vectors:
+        return
+    collection = db[NOTE_EMBEDDINGS_COLLECTION]
+    schema.ensure_collection_indexes(collection)
+    collection.bulk_write([
+        UpdateOne({'id': note_id, 'model': model}, {'$set': {'vector': vector}}, upsert=True)
+        for note_id, vector in vectors
+    ], ordered=False)
+
+@tracing.traced('db')
+def delete_note_embeddings(ids):
+    db = database.get_db()
+    if db is None or not ids:
+        return
+    db[NOTE_EMBEDDINGS_COLLECTION].delete_many({'id': {'$in': list(ids)}})
@@ -1,18 +1,80 @@
+import time
+_HANDLER_IMPORT_START = time.perf_counter()
+
 import json
 import os
+import sys
 import logging
-import database
-import llm_service
-import stt_service
 import base64
-import datetime
-import pytz
-import intent_handlers
+import importlib
+import threading
+import contextlib
+from utils import base64_stream
+from utils import tracing
+from utils import deadline
+from utils import response as response_body
+from utils import time_context
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Route dependencies are imported on first use so e.g. a GET list never pays for the
+# LLM/STT clients and an audio-only STT call never loads pymongo (NFR-001 cold start).
+_LAZY_MODULES = ('database', 'llm_service', 'stt_service', 'intent_handlers', 'keyword_cache', 'note_search', 'item_routes')
+_import_timings = {}
+_startup_reported = False
+_loop = None
+_loop_lock = threading.Lock()
+
+# Without a runtime-provided remaining time, the budget is the configured function timeout
+# (Scaleway's default is 300 s). The margin is kept back to return the response.
+FUNCTION_TIMEOUT_SECONDS = float(os.environ.get('FUNCTION_TIMEOUT_SECONDS', '300'))
+DEADLINE_MARGIN_SECONDS = float(os.environ.get('DEADLINE_MARGIN_SECONDS', '1'))
+
+def _lazy(name):
+    """Imports a route dependency on first use, recording how long the import took."""
+    if name in sys.modules:
+        # Still goes through the import lock: the warm-up thread may be mid-import of it,
+        # and sys.modules already holds the partially initialised module then
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Deferred import of {name} took {_import_timings[name]} ms")
+    return module
+
+def _start_db_warmup():
+    """
+    Imports `database` and connects to MongoDB on a background thread, so the SRV lookup,
+    TLS handshake and auth overlap with the STT/LLM calls of the first request.
+    """
+    def _warm():
+        try:
+            _lazy('database').start_warmup().join()
+        except Exception as e:
+            logger.error(f"Mongo warm-up failed: {e}")
+    threading.Thread(target=_warm, name='mongo-warmup-init', daemon=True).start()
+
+def __getattr__(name):
+    # Keeps `handler.database` etc. addressable (e.g. for mock.patch) without importing at load time
+    if name in _LAZY_MODULES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _report_startup(invocation_start):
+    """Logs a one-off breakdown of cold-start phases after the first invocation."""
+    global _startup_reported
+    if _startup_reported:
+        return
+    _startup_reported = True
+    logger.info(json.dumps({
+        'event': 'startup',
+        'handler_import_ms': _HANDLER_IMPORT_MS,
+        'deferred_imports_ms': dict(_import_timings),
+        'first_invocation_ms': round((time.perf_counter() - invocation_start) * 1000, 1)
+    }))
+
 def _parse_event_body(event):
     """
     Recovers and parses the request body, handling gateway-imposed base64 encoding.
@@ -36,6 +98,7 @@ def _parse_event_body(event):
     return body if isinstance(body, dict) else {}
 
 def _handle_delete(event, body):
+    database = _lazy('database')
     item_id = body.get('id')
     item_type = body.get('type')
     item_key = body.get('key')
@@ -64,109 +127,345 @@ def _handle_delete(event, body):
     }
 
 def _handle_get(event):
-    params = event.get('queryStringParameters', {})
+    database = _lazy('database')
+    params = event.get('queryStringParameters') or {}
     action = params.get('action')
     item_type = params.get('type')
     
     if action == 'list':
+        paged = params.get('before') or params.get('limit') or params.get('fields')
+        if paged and item_type in ('todo', 'note'):
+            return _lazy('item_routes').handle_list_page(params, item_type)
         if item_type == 'todo':
-            items = database.get_all_todos()
-            return {'statusCode': 200, 'body': json.dumps({'status': 'success', 'type': 'todo_list', 'data': items})}
+            return {'statusCode': 200, 'body': response_body.list_chunks('todo_list', database.get_all_todos())}
         elif item_type == 'note':
-            items = database.get_all_notes()
-            return {'statusCode': 200, 'body': json.dumps({'status': 'success', 'type': 'note_list', 'data': items})}
+            return {'statusCode': 200, 'body': response_body.list_chunks('note_list', database.get_all_notes())}
         elif item_type == 'keyword':
-            keywords = database.get_all_keywords()
+            keywords = _lazy('keyword_cache').get_keyword_map()
             return {'statusCode': 200, 'body': json.dumps({'status': 'success', 'type': 'keyword_list', 'data': keywords})}
+
+    if action == 'sync':
+        return _lazy('item_routes').handle_sync(params.get('since'), params.get('type'))
+
+    if action == 'search':
+        return _lazy('item_routes').handle_search(params)
             
     return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid GET request parameters'})}
 
-def _handle_post(event):
-    headers = event.get('headers', {})
-    content_type = next((v for k, v in headers.items() if k.lower() == 'content-type'), 'application/json')
-    
+def _get_header(event, name, default=None):
+    headers = event.get('headers') or {}
+    return next((v for k, v in headers.items() if k.lower() == name), default)
+
+def _wants_execute(event, body=None):
+    """
+    True when the client asked for STT -> LLM -> dispatch in a single invocation,
+    via `?action=execute`, a `Prefer: execute` header or `"execute": true` in the JSON body.
+    """
+    params = event.get('queryStringParameters') or {}
+    if params.get('action') == 'execute':
+        return True
+    prefer = _get_header(event, 'prefer', '') or ''
+    if 'execute' in [p.strip().lower() for p in prefer.split(',')]:
+        return True
+    return bool(body and body.get('execute'))
+
+def _prefetch_storage():
+    """
+    Opens the MongoDB connection and loads the keyword map. Runs alongside the STT/LLM
+    call so that by the time the intent is known, storage is already warm.
+    """
+    try:
+        _lazy('keyword_cache').get_keyword_map()
+    except Exception as e:
+        logger.warning(f"Storage prefetch failed: {e}")
+
+async def _handle_execute(audio_data, content_type, command):
+    """
+    Transcribes the audio and runs the resulting transcript through the command
+    pipeline, returning the transcript alongside the executed intent result.
+    """
+    asyncio = _lazy('asyncio')
+    stt_service = _lazy('stt_service')
+    stt_response, _ = await asyncio.gather(
+        asyncio.to_thread(tracing.wrap('stt', stt_service.handle_speech_to_text), audio_data, content_type),
+        asyncio.to_thread(tracing.wrap('prefetch', _prefetch_storage))
+    )
+    if stt_response.get('statusCode') != 200:
+        return stt_response
+
+    transcript = json.loads(stt_response['body']).get('transcript')
+    response = await _handle_transcript_command(dict(command, transcript=transcript))
+
+    result = json.loads(response['body'])
+    result['transcript'] = transcript
+    response['body'] = json.dumps(result)
+    return response
+
+async def _handle_post(event):
+    content_type = _get_header(event, 'content-type', 'application/json')
     if content_type.startswith('audio/'):
-        is_base64 = event.get('isBase64Encoded', False)
-        audio_data = event.get('body')
-        if not audio_data:
-            return {'statusCode': 400, 'body': json.dumps({'error': 'Missing audio data'})}
-        if is_base64:
-            audio_data = base64.b64decode(audio_data)
-        return stt_service.handle_speech_to_text(audio_data, content_type)
+        return await _handle_audio_upload(event, content_type)
 
-    body = _parse_event_body(event)
+    with tracing.span('parse'):
+        body = _parse_event_body(event)
     if body is None:
         return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON body'})}
 
+    asyncio = _lazy('asyncio')
+    params = event.get('queryStringParameters') or {}
+    if params.get('action') == 'sync':
+        mutations = body.get('mutations') or []
+        if not isinstance(mutations, list):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'mutations must be a list'})}
+        return await asyncio.to_thread(_lazy('item_routes').handle_sync, body.get('since'), params.get('type'), mutations)
+
     if body.get('audio_base64'):
-        try:
-            audio_data = base64.b64decode(body['audio_base64'])
-            return stt_service.handle_speech_to_text(audio_data, body.get('content_type', 'audio/wav'))
-        except Exception as e:
-            return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid base64 audio', 'details': str(e)})}
+        return await _handle_audio_json(event, body)
 
     if body.get('type') == 'keyword':
-         key = body.get('key')
-         value = body.get('value')
-         if not key or not value:
-             logger.warning(f"Keyword creation failed. Missing key/value. Body: {body}")
-             return {'statusCode': 400, 'body': json.dumps({'error': 'Missing key or value', 'received_body': body})}
-         try:
-             item = database.save_keyword(key, value)
-             return {'statusCode': 200, 'body': json.dumps({'status': 'success', 'data': item})}
-         except Exception as e:
-             logger.error(f"Save keyword error: {e}")
-             return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
-
-    return _handle_transcript_command(body)
-
-def _handle_transcript_command(body):
+        return await asyncio.to_thread(_handle_save_keyword, body)
+
+    return await _handle_transcript_command(body)
+
+async def _handle_audio_upload(event, content_type):
+    """A raw `audio/*` body: transcribed, and executed too when the client asked for it."""
+    audio_data = event.get('body')
+    if not audio_data:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Missing audio data'})}
+    if event.get('isBase64Encoded', False):
+        audio_data = base64_stream.decode(audio_data)
+    if _wants_execute(event):
+        params = event.get('queryStringParameters') or {}
+        command = {
+            'timezone': params.get('timezone') or _get_header(event, 'x-timezone', 'UTC'),
+            'email': params.get('email'),
+            'batch': params.get('batch') in ('1', 'true')
+        }
+        return await _handle_execute(audio_data, content_type, command)
+    return await _lazy('asyncio').to_thread(tracing.wrap('stt', _lazy('stt_service').handle_speech_to_text), audio_data, content_type)
+
+async def _handle_audio_json(event, body):
+    """Audio sent as `audio_base64` in a JSON body, with the command options alongside it."""
+    try:
+        audio_data = base64_stream.decode(body['audio_base64'])
+    except Exception as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid base64 audio', 'details': str(e)})}
+    audio_content_type = body.get('content_type', 'audio/wav')
+    if _wants_execute(event, body):
+        command = {'timezone': body.get('timezone', 'UTC'), 'email': body.get('email'), 'batch': body.get('batch')}
+        return await _handle_execute(audio_data, audio_content_type, command)
+    return await _lazy('asyncio').to_thread(tracing.wrap('stt', _lazy('stt_service').handle_speech_to_text), audio_data, audio_content_type)
+
+def _handle_save_keyword(body):
+    key = body.get('key')
+    value = body.get('value')
+    if not key or not value:
+        logger.warning(f"Keyword creation failed. Missing key/value. Body: {body}")
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Missing key or value', 'received_body': body})}
+    try:
+        item = _lazy('database').save_keyword(key, value)
+        return {'statusCode': 200, 'body': json.dumps({'status': 'success', 'data': item})}
+    except Exception as e:
+        logger.error(f"Save keyword error: {e}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+async def _handle_transcript_command(body):
     transcript = body.get('transcript')
     if not transcript:
         logger.warning(f"Missing transcript. Body: {body}")
         return {'statusCode': 400, 'body': json.dumps({'error': 'Missing transcript'})}
 
     timezone = body.get('timezone', 'UTC')
+    # One "now" in the user's timezone for the prompt, the local parser and the handlers
+    now = time_context.now(timezone)
     email = body.get('email') or os.environ.get('RECIPIENT_EMAIL') or os.environ.get('SENDER_EMAIL')
 
-    try:
-        tz = pytz.timezone(timezone)
-    except:
-        tz = pytz.UTC
-    current_time_iso = datetime.datetime.now(tz).isoformat()
-    
+    if body.get('batch'):
+        return await _handle_batch_command(transcript, body.get('language'), timezone, now, email)
+
+    asyncio = _lazy('asyncio')
+    llm_service = _lazy('llm_service')
+    intent_handlers = _lazy('intent_handlers')
+
+    # Storage warm-up and the keyword lookup overlap with the LLM call
+    prefetch = asyncio.to_thread(tracing.wrap('prefetch', _prefetch_storage))
+
     logger.info(f"Analyzing transcript: '{transcript}' in timezone {timezone}")
-    parsed_data = llm_service.analyze_transcript(transcript, current_time_iso)
-    
-    return intent_handlers.dispatch_intent(
-        intent=parsed_data.get('intent', 'TODO'),
-        parsed_data=parsed_data,
-        email=email,
-        timezone=timezone
+    parsed_data, _ = await asyncio.gather(
+        asyncio.to_thread(
+            tracing.wrap('llm', llm_service.analyze_transcript),
+            transcript, timezone,
+            language=body.get('language'),
+            on_intent=intent_handlers.prepare_intent,
+            now=now
+        ),
+        prefetch
     )
 
-def handler(event, context):
+    intent = parsed_data.get('intent', 'TODO')
+    return await asyncio.to_thread(tracing.wrap('dispatch', intent_handlers.dispatch_intent), intent, parsed_data, email=email, timezone=timezone, now=now)
+
+async def _handle_batch_command(transcript, language, timezone, now, email):
+    """A dictation of several commands: one LLM call, then one dispatch for all of them."""
+    asyncio = _lazy('asyncio')
+    llm_service = _lazy('llm_service')
+    intent_handlers = _lazy('intent_handlers')
+
+    logger.info(f"Analyzing multi-command transcript: '{transcript}' in timezone {timezone}")
+    intents, _ = await asyncio.gather(
+        asyncio.to_thread(tracing.wrap('llm', llm_service.analyze_transcript_batch), transcript, timezone, language=language, now=now),
+        asyncio.to_thread(tracing.wrap('prefetch', _prefetch_storage))
+    )
+    return await asyncio.to_thread(tracing.wrap('dispatch', intent_handlers.dispatch_batch), intents, email=email, timezone=timezone, now=now)
+
+async def async_handler(event, context):
+    """
+    Event-loop entry point: blocking upstream (HTTP pool, pymongo) calls run on worker
+    threads so independent ones overlap. For runtimes that can await the handler.
+    """
     if not event:
         return {'statusCode': 400, 'body': json.dumps({'error': 'No event data'})}
 
+    with _invocation(event, context) as invocation:
+        invocation['response'] = await _encode_response(event, await _route(event))
+        return invocation['response']
+
+@contextlib.contextmanager
+def _invocation(event, context):
+    """Trace, deadline and startup report around one invocation, which sets `['response']`."""
+    invocation_start = time.perf_counter()
+    trace = tracing.Trace(cold=not _startup_reported, bytes_in=_body_size(event.get('body')))
+    token = tracing.activate(trace)
+    deadline_token = deadline.begin(_time_budget(context))
+    invocation = {'response': None}
+    try:
+        yield invocation
+    finally:
+        deadline.end(deadline_token)
+        tracing.deactivate(token)
+        _finish_trace(event, invocation['response'], trace)
+        _report_startup(invocation_start)
+
+def _body_size(body):
+    """
+    UTF-8 size of a str/bytes body. None for a body the gateway already parsed (dict/list),
+    whose wire size is unknown here and not worth re-encoding to measure.
+    """
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body) if body.isascii() else len(body.encode('utf-8'))
+    return None
+
+def _is_final(event, response):
+    body = response.get('body')
+    accept_encoding = _get_header(event, 'accept-encoding')
+    return isinstance(body, str) and (not accept_encoding or len(body) < response_body.COMPRESS_MIN_BYTES)
+
+async def _encode_response(event, response):
+    """
+    Builds the final body: chunked list bodies are encoded (reading their cursor) and
+    large bodies compressed per Accept-Encoding, on a worker thread as both can block.
+    """
+    if _is_final(event, response):
+        return response
+    return await _lazy('asyncio').to_thread(_encode_response_sync, event, response)
+
+def _encode_response_sync(event, response):
+    if _is_final(event, response):
+        return response
+    try:
+        return tracing.wrap('encode', response_body.finalize)(response, _get_header(event, 'accept-encoding'))
+    except Exception as e:
+        logger.error(f"Response encoding error: {e}", exc_info=True)
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+def _time_budget(context):
+    """Seconds the upstream calls of this invocation may use in total."""
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    remaining = get_remaining() / 1000 if callable(get_remaining) else FUNCTION_TIMEOUT_SECONDS
+    return max(remaining - DEADLINE_MARGIN_SECONDS, 0)
+
+def _finish_trace(event, response, trace):
+    """Adds the Server-Timing header and logs one `invocation` line with the phase breakdown."""
+    if response is not None:
+        trace.bytes_out = _body_size(response.get('body'))
+        if os.environ.get('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes'):
+            response.setdefault('headers', {})['Server-Timing'] = trace.server_timing()
+    params = event.get('queryStringParameters') or {}
+    logger.info(json.dumps(dict(
+        trace.summary(),
+        event='invocation',
+        method=event.get('httpMethod', 'POST'),
+        action=params.get('action'),
+        status=response.get('statusCode') if response is not None else None
+    )))
+
+def handler(event, context):
+    """
+    Synchronous entry point (`handler.handler`). GET and DELETE make one blocking call each
+    and run inline, as an event loop would only add a thread hop. Other requests run
+    async_handler on the instance's event loop.
+    """
+    if event and event.get('httpMethod') in ('GET', 'DELETE'):
+        with _invocation(event, context) as invocation:
+            invocation['response'] = _encode_response_sync(event, _route_sync(event))
+            return invocation['response']
+    asyncio = _lazy('asyncio')
+    return asyncio.run_coroutine_threadsafe(async_handler(event, context), _event_loop()).result()
+
+def _event_loop():
+    """
+    The instance's event loop, created on first use and kept running on a daemon thread, so
+    invocations share it (and its default executor) instead of building one per call. Works
+    whether or not the caller's thread already runs a loop, and for concurrent callers.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = _lazy('asyncio').new_event_loop()
+                threading.Thread(target=loop.run_forever, name='handler-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+async def _route(event):
+    method = event.get('httpMethod', 'POST')
+    if method in ('GET', 'DELETE'):
+        return await _lazy('asyncio').to_thread(_route_sync, event)
+    try:
+        if method == 'POST':
+            return await _handle_post(event)
+        return {'statusCode': 405, 'body': json.dumps({'error': 'Method not allowed'})}
+    except Exception as e:
+        logger.error(f"Handler Error: {e}", exc_info=True)
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+def _route_sync(event):
+    """GET and DELETE: one blocking database call each, no upstream calls to overlap."""
     method = event.get('httpMethod', 'POST')
-    
     try:
         if method == 'DELETE':
-            body = _parse_event_body(event)
+            with tracing.span('parse'):
+                body = _parse_event_body(event)
             if body is None:
                 return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON body'})}
             return _handle_delete(event, body)
-            
-        if method == 'GET':
-            return _handle_get(event)
-            
-        if method == 'POST':
-            return _handle_post(event)
-            
-        return {'statusCode': 405, 'body': json.dumps({'error': 'Method not allowed'})}
-
+        return _handle_get(event)
     except Exception as e:
         logger.error(f"Handler Error: {e}", exc_info=True)
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
+# Opt-in: start connecting during function init rather than on the first DB call
+if os.environ.get('MONGO_WARMUP', '').lower() in ('1', 'true', 'yes'):
+    _start_db_warmup()
+
+# Queued write-behind inserts are flushed on SIGTERM, whose handler needs the main thread
+if os.environ.get('WRITE_DURABILITY') == 'journaled-async':
+    from utils import write_buffer
+    write_buffer.install_shutdown_hooks()
+
+_HANDLER_IMPORT_MS = round((time.perf_counter() - _HANDLER_IMPORT_START) * 1000, 1)
+
@@ -0,0 +1,144 @@
+import os
+import re
+import hashlib
+import logging
+import datetime
+import unicodedata
+from utils.ttl_cache import TTLCache
+from utils import time_context
+
+logger = logging.getLogger()
+
+INTENT_CACHE_COLLECTION = 'intent_cache'  # indexes declared in schema.INDEX_SPECS
+CACHE_TTL_SECONDS = int(os.environ.get('INTENT_CACHE_TTL_SECONDS', '86400'))
+
+# In-process tier (survives warm invocations)
+_memory = TTLCache(max_entries=int(os.environ.get('INTENT_CACHE_MAX_ENTRIES', '1024')), ttl=CACHE_TTL_SECONDS)
+_stats = {'mongo_hits': 0, 'stored': 0, 'skipped': 0}
+
+# Phrases whose meaning depends on the time of day, not just the date ("in 2 hours", "kahden tunnin päästä").
+# Their resolved datetime cannot be re-derived from a cached day offset, so they are never cached.
+_SUB_DAY_RELATIVE = re.compile(
+    r"\b(in\s+(\d+|an?|half\s+an|a\s+few)\s+(min|minute|hour|hr)s?|now|right\s+away|päästä|kuluttua|nyt|heti)\b",
+    re.IGNORECASE
+)
+
+# Phrases naming a calendar date ("October 20", "20.10.", "2026-10-20", "the 20th", "lokakuuta").
+# The template only holds for relative phrasing: an absolute date would be re-based by the day
+# offset on a later hit, so such MEETINGs are not cached. A false match only costs a miss.
+_EXPLICIT_DATE = re.compile(
+    r"\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sep(t(ember)?)?|oct(ober)?|nov(ember)?|dec(ember)?"
+    r"|\w+kuu\w*|\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[./]\d{1,2}|\d{1,2}(st|nd|rd|th))\b",
+    re.IGNORECASE
+)
+
+def _mongo_enabled():
+    return os.environ.get('INTENT_CACHE_MONGO', '').lower() in ('1', 'true', 'yes')
+
+def normalize(transcript):
+    """Casefolds, strips punctuation and collapses whitespace so trivial variations share an entry."""
+    text = unicodedata.normalize('NFC', transcript or '').casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def _cache_key(normalized, language):
+    raw = f"{language or 'auto'}|{normalized}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _to_template(parsed, reference):
+    """
+    Converts an absolute MEETING datetime into a day offset + wall-clock time relative
+    to the reference time, so a later hit is re-resolved against the then-current time.
+    No UTC offset is kept: a hit localizes the wall-clock time in the caller's timezone,
+    which may be another user's or the same user's after a DST change.
+    Returns None when the datetime cannot be interpreted (such results are not cached).
+    """
+    value = dict(parsed)
+    raw = value.get('datetime')
+    if raw:
+        try:
+            dt = datetime.datetime.fromisoformat(raw)
+        except (TypeError, ValueError):
+            return None
+        aware = dt.utcoffset() is not None
+        if aware:
+            dt = dt.astimezone(reference.tzinfo)
+        ref = reference if aware else reference.replace(tzinfo=None)
+        # The weekday is the date-relative context: "tomorrow" or "next Friday" resolve to
+        # the same day offset whenever the command is repeated on the same weekday.
+        value['datetime'] = {
+            'days': (dt.date() - ref.date()).days,
+            'time': dt.time().isoformat(),
+            'aware': aware,
+            'weekday': ref.isoweekday()
+        }
+    return value
+
+def _from_template(value, reference):
+    """Resolves a cached entry against `reference`, or returns None if its day offset no longer applies."""
+    result = dict(value)
+    relative = result.get('datetime')
+    if isinstance(relative, dict):
+        # Entries from before wall-clock templates carry a fixed 'offset' instead; treat them as misses
+        if 'aware' not in relative or reference.isoweekday() != relative['weekday']:
+            return None
+        day = reference.date() + datetime.timedelta(days=relative['days'])
+        resolved = datetime.datetime.combine(day, datetime.time.fromisoformat(relative['time']))
+        if relative['aware']:
+            resolved = _localize(resolved, reference.tzinfo)
+        result['datetime'] = resolved.isoformat()
+    return result
+
+def _localize(naive, tz):
+    """Attaches `tz` to a wall-clock datetime, with the UTC offset in effect on that day."""
+    zone = getattr(tz, 'zone', None)
+    if zone:
+        return time_context.localize(naive, zone)
+    return naive.replace(tzinfo=tz)
+
+def lookup(transcript, language, reference):
+    """
+    Returns the cached intent for the transcript resolved against `reference`
+    (an aware datetime), or None on a miss.
+    """
+    normalized = normalize(transcript)
+    if not normalized:
+        return None
+    key = _cache_key(normalized, language)
+
+    value = _memory.get(key)
+    if value is None and _mongo_enabled():
+        import cache_store
+        value = cache_store.get_cache_entry(INTENT_CACHE_COLLECTION, key)
+        if value is not None:
+            _stats['mongo_hits'] += 1
+            _memory.set(key, value)
+    if value is None:
+        return None
+    return _from_template(value, reference)
+
+def store(transcript, language, reference, parsed):
+    normalized = normalize(transcript)
+    if not normalized or _SUB_DAY_RELATIVE.search(transcript):
+        _stats['skipped'] += 1
+        return
+    if parsed.get('datetime') and _EXPLICIT_DATE.search(transcript):
+        _stats['skipped'] += 1
+        return
+    value = _to_template(parsed, reference)
+    if value is None:
+        _stats['skipped'] += 1
+        return
+
+    key = _cache_key(normalized, language)
+    _memory.set(key, value)
+    _stats['stored'] += 1
+    if _mongo_enabled():
+        import cache_store
+        cache_store.save_cache_entry(INTENT_CACHE_COLLECTION, key, value, CACHE_TTL_SECONDS)
+
+def get_stats():
+    return dict(_memory.stats(), **_stats)
+
+def clear():
+    _memory.clear()
@@ -0,0 +1,136 @@
+import os
+import re
+import logging
+
+logger = logging.getLogger()
+
+DEFAULT_THRESHOLD = 0.9
+
+# English triggers per intent. The Finnish ones are read from the LLM system prompt
+# (see `load_prompt_triggers`) so both paths stay in sync when the prompt changes.
+ENGLISH_TRIGGERS = {
+    'MEETING': ["schedule a meeting", "book a meeting", "set up a meeting", "schedule a call", "set up a call", "meeting with", "appointment with"],
+    'TODO': ["remind me to", "remember to", "don't forget to", "add to my list", "add to the list", "i need to", "todo", "buy"],
+    'NOTE': ["take a note", "make a note", "note that", "write down", "note to self"],
+    'TRANSPORT': ["how do i get to", "how do i get", "directions to", "route to", "navigate to", "take me to", "next bus to", "next train to"],
+}
+
+# Leading words removed from the transcript to form the title/destination
+_TITLE_PREFIXES = {
+    'TODO': ["remind me to", "remember to", "don't forget to", "add to my list", "add to the list", "i need to", "todo", "muista", "lisää listalle"],
+    'MEETING': ["schedule a", "book a", "set up a"],
+    'NOTE': ["take a note that", "take a note", "make a note that", "make a note", "note that", "write down", "note to self",
+             "kirjoita muistiinpano että", "kirjoita muistiinpano", "laita ylös että", "laita ylös"],
+}
+
+_HIGH_PRIORITY = re.compile(r"\b(urgent|urgently|important|high priority|asap|kiireellinen|kiireesti|tärkeä)\b", re.IGNORECASE)
+_LOW_PRIORITY = re.compile(r"\b(low priority|whenever|someday|joskus)\b", re.IGNORECASE)
+_PRIORITY_PHRASE = re.compile(r"\b(high|medium|low)\s+priority\b", re.IGNORECASE)
+_TRANSPORT_SUFFIX = re.compile(r"\s+(by|with)\s+(bus|train|tram|metro|public transport)\s*$|\s+(bussilla|junalla|ratikalla|metrolla)\s*$", re.IGNORECASE)
+
+def load_prompt_triggers(prompt_template):
+    """
+    Extracts the `**Finnish Context**` trigger phrases of each `### N. INTENT` section
+    of the system prompt, e.g. {'TODO': ['muista ostaa', ...]}.
+    """
+    triggers = {}
+    intent = None
+    for line in prompt_template.splitlines():
+        header = re.match(r"###\s+\d+\.\s+([A-Z]+)", line)
+        if header:
+            intent = header.group(1)
+            continue
+        if intent and line.startswith("**Finnish Context**"):
+            phrases = re.findall(r'"([^"]+)"', line)
+            triggers[intent] = [p.rstrip('.…').strip().lower() for p in phrases]
+    return triggers
+
+def _normalize(transcript):
+    return " ".join(transcript.strip().rstrip('.!?').split())
+
+def _strip_prefix(text, prefixes):
+    lower = text.lower()
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if lower.startswith(prefix):
+            return text[len(prefix):].strip(' ,:')
+    return text
+
+class IntentClassifier:
+    """
+    Keyword/rules engine for trivially classifiable commands. `classify` returns
+    (parsed_data, confidence); only results at or above the threshold should skip the LLM.
+    """
+    def __init__(self, prompt_template):
+        self.triggers = {intent: list(phrases) for intent, phrases in ENGLISH_TRIGGERS.items()}
+        for intent, phrases in load_prompt_triggers(prompt_template).items():
+            self.triggers.setdefault(intent, []).extend(phrases)
+
+    def _match(self, lower):
+        """Returns {intent: score}: 0.95 when the command starts with a trigger, 0.7 when it contains one."""
+        scores = {}
+        for intent, phrases in self.triggers.items():
+            for phrase in phrases:
+                match = re.search(r"(?<!\w)" + re.escape(phrase) + r"(?!\w)", lower)
+                if match:
+                    score = 0.95 if match.start() == 0 else 0.7
+                    scores[intent] = max(scores.get(intent, 0), score)
+        return scores
+
+    def classify(self, transcript, timezone='UTC', now=None):
+        text = _normalize(transcript or '')
+        if not text:
+            return None, 0.0
+
+        scores = self._match(text.lower())
+        if not scores:
+            return None, 0.0
+
+        intent, confidence = max(scores.items(), key=lambda kv: kv[1])
+        if len(scores) > 1:
+            # Competing triggers ("remind me to book a meeting") are for the LLM to untangle
+            confidence = min(confidence, 0.5)
+
+        if intent == 'TODO':
+            priority = 'medium'
+            if _HIGH_PRIORITY.search(text):
+                priority = 'high'
+            elif _LOW_PRIORITY.search(text):
+                priority = 'low'
+            title = _strip_prefix(_PRIORITY_PHRASE.sub('', text).strip(), _TITLE_PREFIXES['TODO'])
+            if not title:
+                return None, 0.0
+            return {'intent': 'TODO', 'title': title[:1].upper() + title[1:], 'priority': priority}, confidence
+
+        if intent == 'NOTE':
+            title = _strip_prefix(text, _TITLE_PREFIXES['NOTE'])
+            if not title:
+                return None, 0.0
+            return {'intent': 'NOTE', 'title': title}, confidence
+
+        if intent == 'TRANSPORT':
+            destination = _TRANSPORT_SUFFIX.sub('', _strip_prefix(text, self.triggers['TRANSPORT'])).strip()
+            if not destination:
+                return None, 0.0
+            return {'intent': 'TRANSPORT', 'destination': destination}, confidence
+
+        # MEETING: parsedatetime only understands English, so Finnish meetings go to the LLM
+        if not any(p in text.lower() for p in ENGLISH_TRIGGERS['MEETING']):
+            return None, 0.0
+        from utils.parser import extract_meeting_details
+        details = extract_meeting_details(text, timezone, now=now)
+        duration = int((details['end_time'] - details['start_time']).total_seconds() // 60)
+        title = _strip_prefix(details['summary'], _TITLE_PREFIXES['MEETING'])
+        parsed = {
+            'intent': 'MEETING',
+            'title': title[:1].upper() + title[1:],
+            'datetime': details['start_time'].isoformat(),
+            'duration': duration
+        }
+        return parsed, confidence
+
+def get_threshold():
+    try:
+        return float(os.environ.get('LOCAL_INTENT_THRESHOLD', DEFAULT_THRESHOLD))
+    except ValueError:
+        logger.warning("Invalid LOCAL_INTENT_THRESHOLD, using default")
+        return DEFAULT_THRESHOLD
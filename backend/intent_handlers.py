@@ -1,69 +1,106 @@
 import json
 import logging
-import database
+import datetime
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger()
 
 GOOGLE_MAPS_TRANSIT_URL = "https://www.google.com/maps/dir/?api=1&destination={dest}&travelmode=transit"
 
-def handle_meeting(parsed_data, email, timezone):
+def _meeting_start(parsed_data, timezone, now):
+    """The invite's aware start time: the model's datetime in the user's timezone, else parsed from the title."""
+    from utils import time_context
+    try:
+        start = datetime.datetime.fromisoformat(parsed_data['datetime'])
+        return start if start.tzinfo else time_context.localize(start, timezone)
+    except (KeyError, TypeError, ValueError):
+        from utils.parser import extract_meeting_details
+        return extract_meeting_details(parsed_data.get('title', ''), timezone, now=now)['start_time']
+
+def handle_meeting(parsed_data, email, timezone, now=None):
     # Mock meeting logic
+    start = _meeting_start(parsed_data, timezone, now)
     return {
         'statusCode': 200,
         'body': json.dumps({
             'type': 'meeting', 
             'message': 'Invite sent (MOCKED)', 
             'parsed_data': parsed_data,
-            'data': {'messageId': 'mock-message-id'}
+            'data': {'messageId': 'mock-message-id', 'start_time': start.isoformat()}
         })
     }
 
+def _todo_result(parsed_data, item):
+    return {'type': 'todo', 'message': 'Task saved', 'parsed_data': parsed_data, 'data': item}
+
+def _note_result(parsed_data, item):
+    return {'type': 'note', 'message': 'Note saved', 'parsed_data': parsed_data, 'data': item}
+
 def handle_todo(parsed_data):
+    import database
     try:
         item = database.save_todo_item(parsed_data.get('title', 'Untitled Task'), parsed_data.get('priority', 'medium'))
         return {
             'statusCode': 200,
-            'body': json.dumps({'type': 'todo', 'message': 'Task saved', 'parsed_data': parsed_data, 'data': item})
+            'body': json.dumps(_todo_result(parsed_data, item))
         }
     except Exception as e:
         return {'statusCode': 500, 'body': json.dumps({'error': 'Failed to save task', 'details': str(e)})}
 
 def handle_note(parsed_data):
+    import database
     try:
         item = database.save_note_item(parsed_data.get('title', ''))
         return {
             'statusCode': 200,
-            'body': json.dumps({'type': 'note', 'message': 'Note saved', 'parsed_data': parsed_data, 'data': item})
+            'body': json.dumps(_note_result(parsed_data, item))
         }
     except Exception as e:
         return {'statusCode': 500, 'body': json.dumps({'error': 'Failed to save note', 'details': str(e)})}
 
 def handle_transport(parsed_data):
+    import keyword_cache
     dest = parsed_data.get('destination', 'Unknown')
-    encoded_dest = urllib.parse.quote_plus(dest)
+    # Expand shortcuts like "home" into the saved address (REQ-F-083)
+    address = keyword_cache.expand(dest)
+    encoded_dest = urllib.parse.quote_plus(address)
     deeplink = GOOGLE_MAPS_TRANSIT_URL.format(dest=encoded_dest)
     
+    data = {
+        'destination': address,
+        'deeplink': deeplink
+    }
+    if address != dest:
+        data['keyword'] = dest
+    
     return {
         'statusCode': 200,
         'body': json.dumps({
             'type': 'transport',
             'message': 'Directions ready',
             'parsed_data': parsed_data,
-            'data': {
-                'destination': dest,
-                'deeplink': deeplink
-            }
+            'data': data
         })
     }
 
-def dispatch_intent(intent, parsed_data, email=None, timezone=None):
+def prepare_intent(intent):
+    """
+    Called as soon as a streamed LLM response reveals the intent, so storage setup
+    overlaps with the rest of the generation. Runs synchronously on the thread reading
+    the stream and must return quickly: the MongoDB warm-up it starts runs on its own thread.
+    """
+    if intent in ("TODO", "NOTE"):
+        import database
+        database.start_warmup()
+
+def dispatch_intent(intent, parsed_data, email=None, timezone=None, now=None):
     logger.info(f"Dispatching Intent: {intent}")
     
     if intent == "MEETING":
         if not email:
             return {'statusCode': 500, 'body': json.dumps({'error': 'Recipient email not configured'})}
-        return handle_meeting(parsed_data, email, timezone)
+        return handle_meeting(parsed_data, email, timezone, now=now)
     
     if intent == "NOTE":
         return handle_note(parsed_data)
@@ -73,3 +110,66 @@ def dispatch_intent(intent, parsed_data, email=None, timezone=None):
         
     # Default to TODO
     return handle_todo(parsed_data)
+
+def _save_todos_bulk(entries):
+    """entries: [(index, parsed_data)] -> [(index, statusCode, result)] via one insert_many."""
+    import database
+    try:
+        items = database.save_todo_items([(p.get('title', 'Untitled Task'), p.get('priority', 'medium')) for _, p in entries])
+        return [(i, 200, _todo_result(p, item)) for (i, p), item in zip(entries, items)]
+    except Exception as e:
+        return [(i, 500, {'error': 'Failed to save task', 'details': str(e)}) for i, _ in entries]
+
+def _save_notes_bulk(entries):
+    import database
+    try:
+        items = database.save_note_items([p.get('title', '') for _, p in entries])
+        return [(i, 200, _note_result(p, item)) for (i, p), item in zip(entries, items)]
+    except Exception as e:
+        return [(i, 500, {'error': 'Failed to save note', 'details': str(e)}) for i, _ in entries]
+
+def _dispatch_single(index, parsed_data, email, timezone, now):
+    response = dispatch_intent(parsed_data.get('intent', 'TODO'), parsed_data, email=email, timezone=timezone, now=now)
+    return [(index, response['statusCode'], json.loads(response['body']))]
+
+def dispatch_batch(intents, email=None, timezone=None, now=None):
+    """
+    Executes several parsed intents at once: TODOs and NOTEs are written with one
+    insert_many per collection, the remaining intents run concurrently on a thread pool.
+    Results are returned in the order the commands were spoken.
+    """
+    logger.info(f"Dispatching batch of {len(intents)} intents")
+    todos, notes, others = [], [], []
+    for index, parsed_data in enumerate(intents):
+        intent = parsed_data.get('intent', 'TODO')
+        if intent == 'NOTE':
+            notes.append((index, parsed_data))
+        elif intent in ('MEETING', 'TRANSPORT'):
+            others.append((index, parsed_data))
+        else:
+            todos.append((index, parsed_data))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(others) + 2))) as pool:
+        futures = [pool.submit(_dispatch_single, i, p, email, timezone, now) for i, p in others]
+        if todos:
+            futures.append(pool.submit(_save_todos_bulk, todos))
+        if notes:
+            futures.append(pool.submit(_save_notes_bulk, notes))
+        outcomes = sorted((outcome for future in futures for outcome in future.result()), key=lambda o: o[0])
+
+    results = [dict(result, statusCode=status) for _, status, result in outcomes]
+    failures = sum(1 for r in results if r['statusCode'] >= 400)
+    if failures == 0:
+        status = 200
+    elif failures == len(results):
+        status = 500
+    else:
+        status = 207  # Multi-Status: some commands failed
+    return {
+        'statusCode': status,
+        'body': json.dumps({
+            'type': 'batch',
+            'message': f"{len(results) - failures} of {len(results)} commands processed",
+            'results': results
+        })
+    }
@@ -0,0 +1,120 @@
+import json
+import time
+import logging
+import database
+import sync_store
+from utils import tracing
+from utils import response as response_body
+
+logger = logging.getLogger()
+
+# Routes over the stored items beyond plain list/delete: keyset-paginated listing, offline
+# sync and note search. Imported by the handler on first use, like its other route modules.
+
+def handle_list_page(params, item_type):
+    """
+    Keyset-paginated history listing (`?before=<created_at>,<id>&limit=N&fields=a,b`).
+    Items are encoded one at a time as the cursor yields them, when the response is finalized.
+    """
+    try:
+        limit = min(int(params.get('limit') or database.DEFAULT_PAGE_SIZE), database.MAX_PAGE_SIZE)
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid limit'})}
+    if limit < 1:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid limit'})}
+
+    collection_name = database.TODOS_COLLECTION if item_type == 'todo' else database.NOTES_COLLECTION
+    fields = [f for f in (params.get('fields') or '').split(',') if f] or None
+    if fields and any(f not in database.ITEM_FIELDS[collection_name] for f in fields):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid fields'})}
+    cursor = database.iter_items_page(collection_name, before=params.get('before'), limit=limit, fields=fields)
+
+    page = {'count': 0, 'last': None}
+    body = response_body.list_chunks(
+        f'{item_type}_list', _timed_items(cursor, page),
+        # A full page means there may be more; the client passes this back as `before`
+        next_before=lambda: database.page_cursor(page['last']) if page['count'] == limit else None,
+        total_hint=lambda: database.count_items(collection_name)
+    )
+    return {'statusCode': 200, 'body': body}
+
+def _timed_items(cursor, page):
+    """
+    Yields the cursor's items, counting them and keeping the last in `page`. The cursor's
+    round trips happen here, during encoding, not in iter_items_page; their time goes to
+    the same db span so Server-Timing covers the whole read.
+    """
+    rows, waited = iter(cursor), 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            item = next(rows, None)
+            waited += time.perf_counter() - start
+            if item is None:
+                return
+            page['count'] += 1
+            page['last'] = item
+            yield item
+    finally:
+        tracing.record('db.iter_items_page', waited * 1000)
+
+def handle_sync(since, types=None, mutations=None):
+    """
+    Delta sync for the offline cache: applies the client's batched mutations (if any),
+    then returns what changed since the client's token and the token for the next sync.
+    """
+    types = [t for t in (types or '').split(',') if t] or list(sync_store.SYNC_COLLECTIONS)
+    if any(t not in sync_store.SYNC_COLLECTIONS for t in types):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid sync type'})}
+    try:
+        since = sync_store.parse_sync_token(since)
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid sync token'})}
+
+    for index, mutation in enumerate(mutations or []):
+        error = _sync_mutation_error(mutation)
+        if error:
+            return {'statusCode': 400, 'body': json.dumps({'error': error, 'index': index})}
+
+    try:
+        applied = sync_store.apply_sync_mutations(mutations) if mutations else None
+        result = sync_store.get_changes_since(since, types)
+    except Exception as e:
+        logger.error(f"Sync error: {e}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+    result.update(status='success', type='sync')
+    if applied is not None:
+        result['applied'] = applied
+    return {'statusCode': 200, 'body': json.dumps(result)}
+
+def _sync_mutation_error(mutation):
+    if not isinstance(mutation, dict):
+        return 'Invalid mutation'
+    op, item_type = mutation.get('op'), mutation.get('type')
+    if op == 'delete' and item_type in ('todo', 'note'):
+        return None if mutation.get('id') else 'Missing id for deletion'
+    if op == 'delete' and item_type == 'keyword':
+        return None if mutation.get('key') else 'Missing key for keyword deletion'
+    if op == 'upsert' and item_type == 'keyword':
+        return None if mutation.get('key') and mutation.get('value') else 'Missing key or value'
+    return 'Unsupported mutation'
+
+def handle_search(params):
+    """Ranked note search (`?action=search&type=note&q=...&limit=N`) over the server-side index."""
+    # Only search requests load the note index
+    import note_search
+    if params.get('type') != 'note':
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Search supports type=note only'})}
+    query = (params.get('q') or '').strip()
+    if not query:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Missing q'})}
+    try:
+        limit = min(int(params.get('limit') or note_search.DEFAULT_LIMIT), note_search.MAX_LIMIT)
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid limit'})}
+    if limit < 1:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid limit'})}
+
+    result = note_search.search(query, limit)
+    return {'statusCode': 200, 'body': json.dumps(dict(status='success', type='note_search', query=query, **result))}
@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+import database
+
+logger = logging.getLogger()
+
+# How long a warm instance trusts its keyword map before re-reading the version stamp
+# (one tiny find_one). Writes from this instance invalidate immediately.
+CHECK_INTERVAL_SECONDS = float(os.environ.get('KEYWORD_CACHE_CHECK_SECONDS', '30'))
+
+_lock = threading.Lock()
+_state = {'map': None, 'fresh': False, 'version': None, 'checked_at': 0.0, 'generation': 0}
+_watcher = {'thread': None, 'active': False, 'unsupported': False}
+
+def invalidate():
+    # The map is kept as a fallback for a failed reload, but no longer served as current.
+    # Bumping the generation stops a read that started before this from storing its map.
+    with _lock:
+        _state['fresh'] = False
+        _state['generation'] += 1
+
+def get_keyword_map():
+    """
+    Returns the {key: address} map. While a change-stream watcher is running the map is
+    served without touching the DB; otherwise the version document is re-checked at most
+    every CHECK_INTERVAL_SECONDS and the collection is only re-read when it changed.
+    When either read fails the previous map is served and nothing is cached, so the next
+    call tries again instead of trusting an empty map for the check interval.
+    """
+    start_watcher()
+    now = time.monotonic()
+    with _lock:
+        keywords = _state['map']
+        fresh = keywords is not None and _state['fresh']
+        if fresh and (_watcher['active'] or now - _state['checked_at'] < CHECK_INTERVAL_SECONDS):
+            return keywords
+        generation = _state['generation']
+
+    version = database.get_keywords_version()
+    if version is None and keywords is not None:
+        return keywords
+    with _lock:
+        if fresh and version is not None and version == _state['version']:
+            _state['checked_at'] = now
+            return keywords
+
+    loaded = database.get_all_keywords()
+    if loaded is None or version is None:
+        return loaded if loaded is not None else (keywords or {})
+    with _lock:
+        # An invalidate() during the reads may have been for a change they missed
+        if _state['generation'] == generation:
+            _state.update(map=loaded, fresh=True, version=version, checked_at=now)
+    return loaded
+
+def expand(destination):
+    """Resolves a keyword shortcut ("home") to its address; other destinations pass through."""
+    if not destination:
+        return destination
+    return get_keyword_map().get(destination.strip().lower(), destination)
+
+def _watch():
+    try:
+        collection = database.get_keywords_collection()
+        if collection is None:
+            return
+        with collection.watch() as stream:
+            _watcher['active'] = True
+            # Anything loaded before the stream opened may have missed a change
+            invalidate()
+            logger.info("Keyword change stream active")
+            for _ in stream:
+                invalidate()
+    except Exception as e:
+        # Standalone servers do not support change streams; version stamps still apply
+        logger.warning(f"Keyword change stream unavailable, using version stamps: {e}")
+        _watcher['unsupported'] = True
+    finally:
+        _watcher['active'] = False
+        invalidate()
+
+def start_watcher():
+    """Starts the optional change-stream watcher (KEYWORD_CACHE_CHANGE_STREAM=true), once per process."""
+    if os.environ.get('KEYWORD_CACHE_CHANGE_STREAM', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _lock:
+        if _watcher['unsupported']:
+            return None
+        if _watcher['thread'] is None or not _watcher['thread'].is_alive():
+            _watcher['thread'] = threading.Thread(target=_watch, name='keyword-watch', daemon=True)
+            _watcher['thread'].start()
+    return _watcher['thread']
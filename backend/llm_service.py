@@ -1,13 +1,19 @@
 import os
+import re
 import json
 import logging
-import datetime
-import urllib.request
 import urllib.error
+import intent_cache
+import intent_classifier
+from utils import http_pool
+from utils import sse
+from utils import chat_payload
+from utils import upstream
+from utils import time_context
 
 logger = logging.getLogger()
 
-SYSTEM_PROMPT_TEMPLATE = """You are a multilingual Personal Assistant fluent in English and Finnish.
+SYSTEM_PROMPT = """You are a multilingual Personal Assistant fluent in English and Finnish.
 Your goal is to extract structured data from the user's spoken command (which may be in English or Finnish).
 
 MATCH ONE OF THE FOLLOWING INTENTS and output ONLY valid JSON using English keys.
@@ -19,7 +25,7 @@ MATCH ONE OF THE FOLLOWING INTENTS and output ONLY valid JSON using English keys
 {
   "intent": "MEETING",
   "title": "string (concise summary of the meeting, e.g., 'Meeting with John')",
-  "datetime": "string (ISO 8601 format, absolute time calculated relative to {{current_time}})",
+  "datetime": "string (ISO 8601 format, absolute time calculated relative to the current time)",
   "duration": "integer (minutes, default to 60 if not specific)"
 }
 
@@ -52,14 +58,141 @@ MATCH ONE OF THE FOLLOWING INTENTS and output ONLY valid JSON using English keys
 }
 
 ### RULES
-1. **Current Reference**: Today is {{current_time}}. Use this to resolve relative dates like "tomorrow" (huomenna), "next Friday" (ensi perjantaina), "in 2 hours" (kahden tunnin päästä).
+1. **Current Reference**: The user message starts with "Current time: <ISO 8601 timestamp>" followed by the command. Use this time to resolve relative dates like "tomorrow" (huomenna), "next Friday" (ensi perjantaina), "in 2 hours" (kahden tunnin päästä).
 2. **Ambiguity**: If unclear, default to TODO.
 3. **Format**: Output raw JSON only. No Markdown blocks (```json), no explanations.
 """
 
-def analyze_transcript(transcript, timezone="UTC"):
+_INTENT_FIELD = re.compile(r'"intent"\s*:\s*"([A-Z]+)"')
+
+_classifier = intent_classifier.IntentClassifier(SYSTEM_PROMPT)
+_path_counts = {'cache': 0, 'local': 0, 'llm': 0, 'fallback': 0}
+
+# Completions are idempotent, so a call slower than the recent p95 gets a hedged duplicate
+_upstream = upstream.Upstream(
+    'llm',
+    timeout=float(os.environ.get('LLM_TIMEOUT_SECONDS', '10')),
+    retries=int(os.environ.get('LLM_RETRIES', '2')),
+    hedge=os.environ.get('LLM_HEDGE', 'true').lower() in ('1', 'true', 'yes')
+)
+BATCH_PROMPT_SUFFIX = """
+### MULTIPLE COMMANDS
+The user may give several commands in one dictation (e.g. "buy milk, remind me to call mom and note that the door code is 1234").
+Split them and output ONLY a JSON object of the form {"intents": [ ... ]}, with one object per command in the order spoken, each following the matching schema above.
+If there is only one command, output a single-element list.
+"""
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + BATCH_PROMPT_SUFFIX
+
+def analyze_transcript(transcript, timezone="UTC", language=None, on_intent=None, now=None):
     """
-    Sends the transcript to Mistral Small 3.2 to extract intent and entities.
+    Extracts intent and entities from the transcript, serving repeated commands
+    from the intent cache and sending the rest to Mistral Small 3.2.
+
+    With LLM_STREAMING enabled, `on_intent(intent)` is called as soon as the
+    streamed response contains the intent, before the remaining fields arrive.
+    `now` is the request's aware current time (utils/time_context), taken in the
+    user's timezone when omitted.
+    """
+    now = now or time_context.now(timezone)
+
+    cached = intent_cache.lookup(transcript, language, now)
+    if cached is not None:
+        logger.info(f"Intent cache hit for transcript: '{transcript}'")
+        _path_counts['cache'] += 1
+        return cached
+
+    local_data, confidence = _classifier.classify(transcript, timezone, now=now)
+    if local_data is not None and confidence >= intent_classifier.get_threshold():
+        logger.info(f"Local intent {local_data['intent']} (confidence {confidence:.2f})")
+        _path_counts['local'] += 1
+        return local_data
+
+    parsed_data = _request_intent(transcript, now, on_intent)
+    if parsed_data is None:
+        logger.warning("Falling back to generic TODO")
+        _path_counts['fallback'] += 1
+        return _fallback_todo(transcript)
+
+    _path_counts['llm'] += 1
+    intent_cache.store(transcript, language, now, parsed_data)
+    return parsed_data
+
+def analyze_transcript_batch(transcript, timezone="UTC", language=None, now=None):
+    """
+    Extracts every command of a multi-command dictation. Returns a list of parsed intents,
+    falling back to a single generic TODO when the model output is unusable.
+    """
+    now = now or time_context.now(timezone)
+    parsed_data = _request_intent(transcript, now, system_prompt=BATCH_SYSTEM_PROMPT)
+    intents = parsed_data.get('intents') if isinstance(parsed_data, dict) else None
+    if not isinstance(intents, list) or not intents or not all(isinstance(i, dict) for i in intents):
+        logger.warning("Batch LLM output unusable, falling back to generic TODO")
+        _path_counts['fallback'] += 1
+        return [_fallback_todo(transcript)]
+
+    _path_counts['llm'] += 1
+    return intents
+
+def get_path_stats():
+    """Counts of how each analyzed transcript was resolved, to measure the LLM offload rate."""
+    return dict(_path_counts)
+
+def _fallback_todo(transcript):
+    return {
+        "intent": "TODO",
+        "title": transcript,
+        "priority": "medium"
+    }
+
+def _streaming_enabled():
+    return os.environ.get('LLM_STREAMING', '').lower() in ('1', 'true', 'yes')
+
+class _IntentDetector:
+    """
+    Accumulates streamed JSON content and reports the intent as soon as its value is complete.
+    """
+    def __init__(self, on_intent):
+        self.on_intent = on_intent
+        self.intent = None
+        self._parts = []
+        self._scan = ''
+
+    def feed(self, fragment):
+        self._parts.append(fragment)
+        if self.intent is not None:
+            return
+        # Only rescan the tail so long outputs without an early intent stay linear
+        start = max(0, len(self._scan) - 32)
+        self._scan += fragment
+        match = _INTENT_FIELD.search(self._scan, start)
+        if match:
+            self.intent = match.group(1)
+            logger.info(f"LLM stream revealed intent {self.intent}")
+            try:
+                self.on_intent(self.intent)
+            except Exception as e:
+                logger.warning(f"Intent preparation failed: {e}")
+
+    @property
+    def content(self):
+        return ''.join(self._parts)
+
+def _stream_content(api_url, data, headers, on_intent, timeout=10):
+    detector = _IntentDetector(on_intent)
+    with http_pool.stream("POST", api_url, body=data, headers=headers, timeout=timeout) as response:
+        for fragment in sse.iter_chat_deltas(response):
+            detector.feed(fragment)
+    return detector.content
+
+def _user_message(transcript, now):
+    # The only per-request text; kept out of the system prompt so its prefix stays cacheable
+    return f"Current time: {now.isoformat()}\nCommand: {transcript}"
+
+def _request_intent(transcript, now, on_intent=None, system_prompt=SYSTEM_PROMPT):
+    """
+    Sends the transcript to Mistral Small 3.2. Returns None when the model output is not
+    valid JSON, or when the call was skipped because the LLM circuit is open or the
+    request has no time left, so callers fall back to a generic TODO.
     """
     api_key = os.environ.get('LLM_API_KEY')
     # Default to a placeholder standard endpoint, user must configure
@@ -70,42 +203,30 @@ def analyze_transcript(transcript, timezone="UTC"):
         logger.error("LLM_API_KEY not configured")
         raise Exception("LLM configuration missing")
 
-    # Calculate current time in ISO format for the prompt
-    # Note: simple UTC now, ideal would be timezone aware calculation if timezone is valid
-    current_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
-    
-    # Format System Prompt
-    system_prompt = SYSTEM_PROMPT_TEMPLATE.replace("{{current_time}}", current_time)
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": transcript}
-        ],
-        "temperature": 0.1, # Low temperature for deterministic JSON
-        "response_format": {"type": "json_object"} # standard for updated models
-    }
+    headers = chat_payload.auth_headers(api_key)
+    streaming = on_intent is not None and _streaming_enabled()
+    data = chat_payload.chat_body(model, system_prompt, _user_message(transcript, now), stream=streaming)
+
+    def send(timeout):
+        if streaming:
+            return _stream_content(api_url, data, headers, on_intent, timeout)
+        response = http_pool.request("POST", api_url, body=data, headers=headers, timeout=timeout)
+        result = response.json()
+        return result['choices'][0]['message']['content']
 
     try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(api_url, data=data, headers=headers, method="POST")
+        # A stream has already reported its intent by the time a duplicate would be sent
+        content = _upstream.call(send, hedge=None if not streaming else False)
         
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.load(response)
-            content = result['choices'][0]['message']['content']
-            
-            logger.info(f"LLM Raw Response: {content}")
-            
-            # Parse JSON
-            parsed_data = json.loads(content)
-            return parsed_data
+        logger.info(f"LLM Raw Response: {content}")
+        
+        # Parse JSON
+        parsed_data = json.loads(content)
+        return parsed_data
 
+    except upstream.UpstreamUnavailable as e:
+        logger.warning(f"LLM call skipped: {e.reason}")
+        return None
     except urllib.error.HTTPError as e:
         logger.error(f"LLM API Request Failed: {e.code} {e.reason}")
         raise Exception(f"Failed to contact AI service: {e.code}")
@@ -114,12 +235,7 @@ def analyze_transcript(transcript, timezone="UTC"):
         raise Exception(f"Failed to contact AI service: {e.reason}")
     except json.JSONDecodeError as e:
         logger.error(f"LLM JSON Parse Failed. Content: {content if 'content' in locals() else 'unknown'}")
-        logger.warning("Falling back to generic TODO")
-        return {
-            "intent": "TODO",
-            "title": transcript,
-            "priority": "medium"
-        }
+        return None
     except Exception as e:
         logger.error(f"LLM Processing Error: {e}")
         raise e
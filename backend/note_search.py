@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+import database
+import sync_store
+import embedding_store
+from utils import http_pool
+from utils import chat_payload
+from utils import upstream
+from utils.text_index import InvertedIndex
+
+logger = logging.getLogger()
+
+# How long a warm instance searches its in-memory index before catching up on notes written
+# through other instances (one sync-delta query). Writes through this instance apply at once.
+REFRESH_SECONDS = float(os.environ.get('NOTE_SEARCH_REFRESH_SECONDS', '30'))
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Notes without a stored embedding are embedded off the request path, newest first, this many per call
+EMBED_BATCH = 64
+# Reciprocal rank fusion constant for merging the keyword and semantic rankings
+RRF_K = 60
+
+_lock = threading.Lock()
+_index = InvertedIndex()
+_notes = {}
+_state = {'loaded': False, 'token': None, 'checked_at': 0.0}
+_vectors = {'index': None, 'loaded': False}
+_backfill = {'running': False, 'thread': None}
+
+_upstream = upstream.Upstream(
+    'embeddings',
+    timeout=float(os.environ.get('EMBEDDING_TIMEOUT_SECONDS', '5')),
+    retries=1
+)
+
+def _embeddings_enabled():
+    return os.environ.get('NOTE_SEARCH_EMBEDDINGS', '').lower() in ('1', 'true', 'yes')
+
+def _embedding_model():
+    return os.environ.get('EMBEDDING_MODEL', 'bge-multilingual-gemma2')
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def on_notes_changed(saved, deleted):
+    """Called by `database` after note writes. Before the first search there is no index to update."""
+    if deleted and _embeddings_enabled():
+        embedding_store.delete_note_embeddings(deleted)
+    with _lock:
+        if not _state['loaded']:
+            return
+        _apply(saved, deleted)
+    if saved:
+        _start_backfill()
+
+def _apply(saved, deleted):
+    for note in saved:
+        _notes[note['id']] = note
+        _index.add(note['id'], note.get('text'))
+    vectors = _vectors['index']
+    for note_id in deleted:
+        _notes.pop(note_id, None)
+        _index.remove(note_id)
+        if vectors is not None:
+            vectors.remove(note_id)
+
+def _refresh():
+    """
+    Loads every note on first use, then applies the sync delta (changes and tombstones since
+    the last token) at most every REFRESH_SECONDS, so the corpus is never re-read in full.
+    """
+    now = time.monotonic()
+    if _state['loaded'] and now - _state['checked_at'] < REFRESH_SECONDS:
+        return
+    with _lock:
+        if _state['loaded'] and now - _state['checked_at'] < REFRESH_SECONDS:
+            return
+        start = time.perf_counter()
+        delta = sync_store.get_changes_since(_state['token'], types=('note',))
+        if delta['full_resync']:
+            _notes.clear()
+            _index.clear()
+            _vectors.update(index=None, loaded=False)
+        _apply(delta['changes']['note'], [tombstone['id'] for tombstone in delta['deleted']])
+        if delta['full_resync']:
+            logger.info(json.dumps({
+                'event': 'note_search_load',
+                'notes': len(_notes),
+                'ms': round((time.perf_counter() - start) * 1000, 1)
+            }))
+        _state.update(loaded=True, token=delta['token'], checked_at=now)
+    if delta['changes']['note']:
+        _start_backfill()
+
+def search(query, limit=DEFAULT_LIMIT):
+    """
+    Ranks notes against `query` with BM25 over the stemmed inverted index. With
+    NOTE_SEARCH_EMBEDDINGS=true and NumPy available, the embedding similarity ranking is
+    merged in by reciprocal rank fusion. Returns {'mode', 'total', 'data'}, where `total`
+    counts the keyword matches and each note in `data` carries its `score`.
+    """
+    _refresh()
+    hits, total = _index.search(query, limit)
+    mode = 'keyword'
+    if _embeddings_enabled():
+        semantic = _semantic_search(query, limit)
+        if semantic is not None:
+            hits = _fuse([hits, semantic], limit)
+            mode = 'hybrid'
+    data = [dict(_notes[note_id], score=round(score, 4)) for note_id, score in hits if note_id in _notes]
+    return {'mode': mode, 'total': total, 'data': data}
+
+def _fuse(rankings, limit):
+    scores = {}
+    for ranking in rankings:
+        for rank, (note_id, _) in enumerate(ranking):
+            scores[note_id] = scores.get(note_id, 0.0) + 1 / (RRF_K + rank + 1)
+    return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+def _semantic_search(query, limit):
+    """Nearest notes by embedding, or None when semantic search is unavailable (keyword results stand)."""
+    np = _numpy()
+    if np is None:
+        logger.warning("NOTE_SEARCH_EMBEDDINGS is set but NumPy is not installed")
+        return None
+    try:
+        _load_vectors(np)
+        vectors = _vectors['index']
+        if vectors is None:
+            # Nothing embedded yet; the backfill is running
+            return None
+        # Only the query is embedded on the request path
+        return vectors.search(_embed([query])[0], limit)
+    except Exception as e:
+        logger.warning(f"Semantic note search unavailable: {e}")
+        return None
+
+def _load_vectors(np):
+    with _lock:
+        if _vectors['loaded']:
+            return
+        stored = [(note_id, np.frombuffer(vector, dtype=np.float16)) for note_id, vector in embedding_store.get_note_embeddings(_embedding_model())]
+        _vectors['loaded'] = True
+    _add_vectors(np, [(note_id, vector) for note_id, vector in stored if note_id in _notes])
+    _start_backfill()
+
+def _start_backfill():
+    """
+    Embeds notes without a stored vector on a background thread, once the stored vectors are
+    loaded. A failed batch stops the run; the next note write or synced change restarts it.
+    """
+    np = _numpy()
+    if np is None or not _embeddings_enabled():
+        return
+    with _lock:
+        if not _vectors['loaded'] or _backfill['running']:
+            return
+        _backfill['running'] = True
+        thread = _backfill['thread'] = threading.Thread(target=_run_backfill, args=(np,), name='note-embeddings', daemon=True)
+    thread.start()
+
+def _run_backfill(np):
+    try:
+        while True:
+            with _lock:
+                # Decided under the lock, so a write applied after this starts a new run
+                missing = _missing_vectors()
+                if not missing:
+                    _backfill['running'] = False
+                    return
+                texts = [_notes[note_id].get('text') or '' for note_id in missing]
+            _store_vectors(np, list(zip(missing, _embed(texts))))
+    except Exception as e:
+        logger.warning(f"Note embedding backfill stopped: {e}")
+        with _lock:
+            _backfill['running'] = False
+
+def _add_vectors(np, items):
+    if not items:
+        return
+    from utils.vector_index import VectorIndex
+    with _lock:
+        if _vectors['index'] is None:
+            _vectors['index'] = VectorIndex(np, len(items[0][1]))
+    _vectors['index'].add_many(items)
+
+def _missing_vectors():
+    # Called with _lock held
+    vectors = _vectors['index']
+    missing = [note for note_id, note in _notes.items() if vectors is None or note_id not in vectors]
+    return [note['id'] for note in heapq.nlargest(EMBED_BATCH, missing, key=lambda note: note.get('created_at') or '')]
+
+def _store_vectors(np, items):
+    if not items:
+        return
+    items = [(note_id, np.asarray(vector, dtype=np.float16)) for note_id, vector in items]
+    embedding_store.save_note_embeddings(_embedding_model(), [(note_id, vector.tobytes()) for note_id, vector in items])
+    _add_vectors(np, items)
+
+def _embed(texts):
+    """Embeds the texts with one call to the OpenAI-compatible embeddings endpoint."""
+    api_key = os.environ.get('LLM_API_KEY')
+    if not api_key:
+        raise Exception("LLM_API_KEY not configured")
+    api_url = os.environ.get('EMBEDDING_API_URL', 'https://api.scaleway.ai/v1/embeddings')
+    body = json.dumps({'model': _embedding_model(), 'input': texts}).encode('utf-8')
+
+    def send(timeout):
+        return http_pool.request("POST", api_url, body=body, headers=chat_payload.auth_headers(api_key), timeout=timeout).json()
+
+    result = _upstream.call(send)
+    return [item['embedding'] for item in sorted(result['data'], key=lambda item: item['index'])]
+
+def get_stats():
+    vectors = _vectors['index']
+    return {'loaded': _state['loaded'], 'notes': len(_index), 'vectors': len(vectors) if vectors is not None else 0}
+
+def reset():
+    thread = _backfill['thread']
+    if thread is not None:
+        thread.join(timeout=5)
+    with _lock:
+        _backfill.update(running=False, thread=None)
+        _notes.clear()
+        _index.clear()
+        _state.update(loaded=False, token=None, checked_at=0.0)
+        _vectors.update(index=None, loaded=False)
@@ -0,0 +1,123 @@
+import logging
+import pymongo
+from pymongo import IndexModel
+
+logger = logging.getLogger()
+
+TODOS_COLLECTION = 'todos'
+NOTES_COLLECTION = 'notes'
+KEYWORDS_COLLECTION = 'keywords'
+INTENT_CACHE_COLLECTION = 'intent_cache'
+STT_CACHE_COLLECTION = 'stt_cache'
+# {'type', 'id', 'deleted_at', 'expires_at'} per deleted item, read by the sync endpoint
+TOMBSTONES_COLLECTION = 'tombstones'
+# {'id', 'model', 'vector'} per note: float16 embedding bytes for semantic note search
+NOTE_EMBEDDINGS_COLLECTION = 'note_embeddings'
+# Small documents such as {'_id': 'keywords_version', 'version': N}
+META_COLLECTION = 'meta'
+
+def _item_indexes():
+    return [
+        IndexModel([('id', pymongo.ASCENDING)], name='id_unique', unique=True),
+        # Also serves the created_at-only sorts of get_all_*
+        IndexModel([('created_at', pymongo.DESCENDING), ('id', pymongo.DESCENDING)], name='created_at_id_desc'),
+        IndexModel([('updated_at', pymongo.DESCENDING)], name='updated_at_desc'),
+    ]
+
+def _cache_indexes():
+    return [
+        IndexModel([('key', pymongo.ASCENDING)], name='key_unique', unique=True),
+        # Mongo removes documents once expires_at has passed
+        IndexModel([('expires_at', pymongo.ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ]
+
+# Indexes backing the hot queries: delete_*/upserts by id or key, get_all_* sorted by created_at,
+# sync deltas by updated_at (created_at for documents written before updated_at existed)
+INDEX_SPECS = {
+    TODOS_COLLECTION: _item_indexes(),
+    NOTES_COLLECTION: _item_indexes(),
+    KEYWORDS_COLLECTION: [
+        IndexModel([('key', pymongo.ASCENDING)], name='key_unique', unique=True),
+        IndexModel([('id', pymongo.ASCENDING)], name='id_unique', unique=True),
+        IndexModel([('created_at', pymongo.DESCENDING)], name='created_at_desc'),
+        IndexModel([('updated_at', pymongo.DESCENDING)], name='updated_at_desc'),
+    ],
+    INTENT_CACHE_COLLECTION: _cache_indexes(),
+    STT_CACHE_COLLECTION: _cache_indexes(),
+    NOTE_EMBEDDINGS_COLLECTION: [
+        IndexModel([('id', pymongo.ASCENDING), ('model', pymongo.ASCENDING)], name='id_model_unique', unique=True),
+        IndexModel([('model', pymongo.ASCENDING)], name='model_asc'),
+    ],
+    TOMBSTONES_COLLECTION: [
+        IndexModel([('deleted_at', pymongo.ASCENDING)], name='deleted_at_asc'),
+        IndexModel([('expires_at', pymongo.ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
+
+# Collections whose indexes this process has already ensured (warm starts skip the round trip)
+_ensured = set()
+
+def ensure_collection_indexes(collection):
+    """
+    Creates the indexes declared for this collection, once per process. `createIndexes`
+    is a no-op server-side for existing indexes, so repeating it across cold starts is safe.
+    """
+    specs = INDEX_SPECS.get(collection.name)
+    if not specs or collection.name in _ensured:
+        return
+    try:
+        collection.create_indexes(specs)
+    except pymongo.errors.OperationFailure as e:
+        # e.g. duplicate keys in legacy data block a unique index; queries still work
+        logger.error(f"Index creation failed on {collection.name}: {e}")
+    _ensured.add(collection.name)
+
+def ensure_indexes(db):
+    """Bootstraps every declared index; one createIndexes round trip per collection."""
+    for name in INDEX_SPECS:
+        ensure_collection_indexes(db[name])
+
+def hot_queries():
+    """
+    {name: build(db) -> cursor} for the hot queries, built from the same query helpers and
+    sort orders the stores use, so a change to a real query is what gets verified.
+    """
+    # Both import this module, so they are imported here rather than at load time
+    import database
+    import sync_store
+    probe = '2000-01-01T00:00:00.000000'
+    return {
+        'delete_todo_item': lambda db: db[TODOS_COLLECTION].find({'id': 'probe'}),
+        'delete_note_item': lambda db: db[NOTES_COLLECTION].find({'id': 'probe'}),
+        'save_keyword/delete_keyword': lambda db: db[KEYWORDS_COLLECTION].find({'key': 'probe'}),
+        'get_all_todos': lambda db: db[TODOS_COLLECTION].find({}, {'_id': 0}).sort(database.LIST_SORT),
+        'get_all_notes': lambda db: db[NOTES_COLLECTION].find({}, {'_id': 0}).sort(database.LIST_SORT),
+        'iter_items_page': lambda db: db[NOTES_COLLECTION].find(
+            database.page_query(database.page_cursor({'created_at': probe, 'id': 'probe'})), {'_id': 0}
+        ).sort(database.PAGE_SORT).limit(database.DEFAULT_PAGE_SIZE),
+        'get_changes_since': lambda db: db[TODOS_COLLECTION].find(sync_store.changes_query(probe), {'_id': 0}),
+        'get_note_embeddings': lambda db: db[NOTE_EMBEDDINGS_COLLECTION].find({'model': 'probe'}, {'_id': 0}),
+        'get_changes_since/tombstones': lambda db: db[TOMBSTONES_COLLECTION].find(
+            sync_store.tombstones_query(probe, sync_store.SYNC_COLLECTIONS), {'_id': 0}
+        ),
+    }
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+def uses_index(explain):
+    """True when the winning plan of an explain() result scans an index rather than the collection."""
+    planner = explain.get('queryPlanner', explain)
+    stages = set(_stages(planner.get('winningPlan', {})))
+    return 'COLLSCAN' not in stages and bool(stages & {'IXSCAN', 'IDHACK', 'EXPRESS_IXSCAN', 'COUNT_SCAN'})
+
+def verify_query_plans(db):
+    """Returns {query_name: uses_index} for every hot query."""
+    return {name: uses_index(build(db).explain()) for name, build in hot_queries().items()}
@@ -0,0 +1,84 @@
+import os
+import hashlib
+import logging
+import threading
+import contextlib
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger()
+
+STT_CACHE_COLLECTION = 'stt_cache'  # indexes declared in schema.INDEX_SPECS
+# Client retries arrive within seconds to minutes; an hour covers them with room to spare
+CACHE_TTL_SECONDS = int(os.environ.get('STT_CACHE_TTL_SECONDS', '3600'))
+# How long a retry waits for the identical upload that is still being transcribed
+IN_FLIGHT_WAIT_SECONDS = 60
+
+# In-process tier (survives warm invocations); entries are short transcripts
+_memory = TTLCache(max_entries=int(os.environ.get('STT_CACHE_MAX_ENTRIES', '256')), ttl=CACHE_TTL_SECONDS)
+_stats = {'mongo_hits': 0, 'stored': 0, 'waited': 0}
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def _mongo_enabled():
+    return os.environ.get('STT_CACHE_MONGO', '').lower() in ('1', 'true', 'yes')
+
+def cache_key(audio_data, variant):
+    """
+    BLAKE2b digest of the audio bytes plus everything else that shapes the transcript
+    (model, language, preprocessing), hashed straight from the buffer without copying it.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(variant.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(memoryview(audio_data))
+    return digest.hexdigest()
+
+def lookup(key):
+    """Returns the cached transcript for the key, or None on a miss."""
+    transcript = _memory.get(key)
+    if transcript is None and _mongo_enabled():
+        import cache_store
+        transcript = cache_store.get_cache_entry(STT_CACHE_COLLECTION, key)
+        if transcript is not None:
+            _stats['mongo_hits'] += 1
+            _memory.set(key, transcript)
+    return transcript
+
+def store(key, transcript):
+    if transcript is None:
+        return
+    _memory.set(key, transcript)
+    _stats['stored'] += 1
+    if _mongo_enabled():
+        import cache_store
+        cache_store.save_cache_entry(STT_CACHE_COLLECTION, key, transcript, CACHE_TTL_SECONDS)
+
+@contextlib.contextmanager
+def single_flight(key, timeout=IN_FLIGHT_WAIT_SECONDS):
+    """
+    Serializes identical uploads within this instance: the first caller yields True and
+    transcribes; a concurrent retry of the same audio waits for it to finish and yields
+    False, after which `lookup` normally hits.
+    """
+    with _in_flight_lock:
+        done = _in_flight.get(key)
+        owner = done is None
+        if owner:
+            done = _in_flight[key] = threading.Event()
+    if not owner:
+        _stats['waited'] += 1
+        done.wait(timeout)
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        done.set()
+
+def get_stats():
+    return dict(_memory.stats(), **_stats)
+
+def clear():
+    _memory.clear()
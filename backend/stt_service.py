@@ -1,12 +1,33 @@
 import os
 import json
 import logging
-import urllib.request
+import contextvars
 import urllib.error
-from utils.multipart import encode_multipart_formdata
+import stt_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils import http_pool
+from utils import audio
+from utils import upstream
+from utils.multipart import MultipartBody
 
 logger = logging.getLogger()
 
+# Chunked transcription of long recordings (STT_CHUNKING=true): target segment length,
+# concurrent uploads, and per-segment retries for transient upstream failures
+SEGMENT_SECONDS = float(os.environ.get('STT_SEGMENT_SECONDS', '30'))
+PARALLELISM = int(os.environ.get('STT_PARALLELISM', '4'))
+SEGMENT_RETRIES = int(os.environ.get('STT_SEGMENT_RETRIES', '2'))
+SEGMENT_TIMEOUT_SECONDS = float(os.environ.get('STT_SEGMENT_TIMEOUT_SECONDS', '60'))
+SEGMENT_RETRY_BACKOFF_SECONDS = 0.5
+
+# Uploads are not hedged by default: a duplicate of a long recording doubles the upload
+_upstream = upstream.Upstream(
+    'stt',
+    timeout=float(os.environ.get('STT_TIMEOUT_SECONDS', '60')),
+    retries=int(os.environ.get('STT_RETRIES', '1')),
+    hedge=os.environ.get('STT_HEDGE', '').lower() in ('1', 'true', 'yes')
+)
+
 def handle_speech_to_text(audio_data, content_type, is_base64=False):
     """
     Calls Scaleway's Speech-to-Text API (OpenAI compatible) to transcribe audio.
@@ -32,35 +53,48 @@ def handle_speech_to_text(audio_data, content_type, is_base64=False):
 
     logger.info(f"STT: Audio size {len(audio_data)} bytes. Start: {audio_data[:20]!r}")
 
-    # Prepare multipart data
-    fields = {
-        'model': os.environ.get('STT_MODEL', 'whisper-large-v3'),
-        'language': 'fi' # Prioritize Finnish for better accuracy and speed
-    }
-    
-    # Determine extension from content_type
-    ext = _get_extension_from_content_type(content_type)
-    
-    files = {
-        'file': (f'audio.{ext}', audio_data, content_type)
+    # Identical audio (e.g. a client retry after a network blip) is answered from the cache
+    key = stt_cache.cache_key(audio_data, _cache_variant())
+    transcript = stt_cache.lookup(key)
+    if transcript is None:
+        with stt_cache.single_flight(key) as owner:
+            if not owner:
+                transcript = stt_cache.lookup(key)
+            if transcript is None:
+                response = _speech_to_text(audio_data, content_type, api_key, api_url)
+                if response['statusCode'] == 200:
+                    result = json.loads(response['body'])
+                    if not result.get('partial'):
+                        stt_cache.store(key, result['transcript'])
+                return response
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'transcript': transcript, 'cached': True})
     }
 
+def _speech_to_text(audio_data, content_type, api_key, api_url):
     try:
-        body, content_type_header = encode_multipart_formdata(fields, files)
-        
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': content_type_header
+        if _chunking_enabled():
+            # Segments are re-encoded at 16 kHz mono, which covers preprocessing too
+            segments = audio.split_at_silence(audio_data, SEGMENT_SECONDS, codec=_codec())
+            if segments:
+                return _transcribe_segments(segments, api_key, api_url)
+
+        if _preprocess_enabled():
+            audio_data, content_type = _preprocess(audio_data, content_type)
+
+        transcript = _upstream.call(lambda timeout: _transcribe(audio_data, content_type, api_key, api_url, timeout=timeout))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'transcript': transcript, 'cached': False})
+        }
+    except upstream.UpstreamUnavailable as e:
+        logger.warning(f"STT call skipped: {e.reason}")
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': 'STT_UNAVAILABLE', 'details': str(e.reason)})
         }
-        
-        req = urllib.request.Request(api_url, data=body, headers=headers, method="POST")
-        
-        with urllib.request.urlopen(req) as response:
-            result = json.load(response)
-            return {
-                'statusCode': 200,
-                'body': json.dumps({'transcript': result.get('text')})
-            }
     except urllib.error.HTTPError as e:
         error_body = e.read().decode('utf-8')
         logger.error(f"STT API Error: {e.code} {e.reason} Body: {error_body}")
@@ -80,6 +114,107 @@ def handle_speech_to_text(audio_data, content_type, is_base64=False):
             'body': json.dumps({'error': 'STT_UNEXPECTED_ERROR', 'details': str(e)})
         }
 
+def _transcribe(audio_data, content_type, api_key, api_url, timeout=None):
+    """Uploads one clip to the transcription endpoint and returns its text."""
+    fields = {
+        'model': os.environ.get('STT_MODEL', 'whisper-large-v3'),
+        'language': 'fi' # Prioritize Finnish for better accuracy and speed
+    }
+    
+    # Determine extension from content_type
+    ext = _get_extension_from_content_type(content_type)
+    
+    files = {
+        'file': (f'audio.{ext}', audio_data, content_type)
+    }
+
+    # Streamed from the audio buffer in slices rather than assembled into a second copy
+    body = MultipartBody(fields, files)
+    
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': body.content_type,
+        'Content-Length': str(body.content_length)
+    }
+    
+    response = http_pool.request("POST", api_url, body=body, headers=headers, timeout=timeout)
+    return response.json().get('text')
+
+def _cache_variant():
+    # Everything besides the audio that changes what the transcript would be
+    chunking = SEGMENT_SECONDS if _chunking_enabled() else 'off'
+    preprocess = _codec() if _preprocess_enabled() else 'off'
+    return f"{os.environ.get('STT_MODEL', 'whisper-large-v3')}|fi|chunking={chunking}|preprocess={preprocess}"
+
+def _chunking_enabled():
+    return os.environ.get('STT_CHUNKING', '').lower() in ('1', 'true', 'yes')
+
+def _transcribe_segment(wav, api_key, api_url):
+    return _upstream.call(
+        lambda timeout: _transcribe(wav, 'audio/wav', api_key, api_url, timeout=timeout),
+        retries=SEGMENT_RETRIES,
+        backoff=SEGMENT_RETRY_BACKOFF_SECONDS,
+        timeout=SEGMENT_TIMEOUT_SECONDS
+    )
+
+def _transcribe_segments(segments, api_key, api_url):
+    """
+    Transcribes silence-delimited segments concurrently (at most STT_PARALLELISM at a
+    time) and joins the texts in recording order. Segments that still fail after their
+    retries are left out and reported, so one upstream timeout does not lose the note.
+    """
+    texts = [None] * len(segments)
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(PARALLELISM, len(segments))) as executor:
+        # Each segment runs in a copy of the caller's context to keep its deadline and trace
+        futures = {
+            executor.submit(contextvars.copy_context().run, _transcribe_segment, wav, api_key, api_url): index
+            for index, (_, wav) in enumerate(segments)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                texts[index] = future.result()
+            except Exception as e:
+                logger.error(f"STT segment {index} at {segments[index][0]} ms failed: {e}")
+                failed.append(index)
+
+    if len(failed) == len(segments):
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'STT_API_ERROR', 'details': f"All {len(segments)} segments failed"})
+        }
+
+    result = {
+        'transcript': ' '.join(text.strip() for text in texts if text and text.strip()),
+        'segments': len(segments),
+        'cached': False
+    }
+    if failed:
+        result.update(partial=True, failed_segments=sorted(failed))
+    return {'statusCode': 200, 'body': json.dumps(result)}
+
+def _codec():
+    codec = os.environ.get('STT_PREPROCESS_CODEC', 'pcm16')
+    if codec not in audio.CODECS:
+        logger.warning(f"Unknown STT_PREPROCESS_CODEC {codec!r}, using pcm16")
+        return 'pcm16'
+    return codec
+
+def _preprocess_enabled():
+    return os.environ.get('STT_PREPROCESS', '').lower() in ('1', 'true', 'yes')
+
+def _preprocess(audio_data, content_type):
+    """Trims/downmixes/downsamples WAV uploads (STT_PREPROCESS=true), logging the byte savings."""
+    try:
+        audio_data, content_type, stats = audio.preprocess(audio_data, content_type, codec=_codec())
+    except Exception as e:
+        # Never lose a recording to preprocessing; the original is still valid input
+        logger.error(f"Audio preprocessing failed, sending original: {e}", exc_info=True)
+        return audio_data, content_type
+    logger.info(json.dumps(dict(stats, event='stt_preprocess')))
+    return audio_data, content_type
+
 def _get_extension_from_content_type(content_type):
     lower_ct = content_type.lower()
     if 'mpeg' in lower_ct or 'mp3' in lower_ct: return 'mp3'
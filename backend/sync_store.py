@@ -0,0 +1,154 @@
+import os
+import uuid
+import datetime
+import schema
+import database
+from pymongo import DeleteOne, UpdateOne
+from utils import tracing
+from schema import TODOS_COLLECTION, NOTES_COLLECTION, KEYWORDS_COLLECTION, TOMBSTONES_COLLECTION
+
+# Delta sync for the offline cache: what changed since a client's token, the tombstones
+# deletions leave behind, and the client's batched mutations. Built on `database`, whose
+# writes stamp updated_at and record tombstones here.
+
+# Offline sync: item type -> collection, how long deletions are remembered, and how far
+# before the client's token deltas are re-read to tolerate clock skew between instances
+SYNC_COLLECTIONS = {'todo': TODOS_COLLECTION, 'note': NOTES_COLLECTION, 'keyword': KEYWORDS_COLLECTION}
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', '30'))
+SYNC_OVERLAP_SECONDS = 5
+
+
+def _now_iso():
+    # Fixed precision so ISO timestamps compare correctly as strings
+    return datetime.datetime.utcnow().isoformat(timespec='microseconds')
+
+def record_tombstones(db, item_type, ids):
+    """Remembers deletions (by id, or key for keywords) so sync clients can drop their cached copies."""
+    if not ids:
+        return
+    deleted_at = _now_iso()
+    expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=SYNC_TOMBSTONE_DAYS)
+    collection = db[TOMBSTONES_COLLECTION]
+    schema.ensure_collection_indexes(collection)
+    collection.insert_many(
+        [{'type': item_type, 'id': item_id, 'deleted_at': deleted_at, 'expires_at': expires_at} for item_id in ids],
+        ordered=False
+    )
+
+def clear_tombstones(db, item_type, ids):
+    # A re-created keyword must not be deleted again by a client replaying its old tombstone
+    db[TOMBSTONES_COLLECTION].delete_many({'type': item_type, 'id': {'$in': list(ids)}})
+
+def parse_sync_token(token):
+    """Validates a sync token (an opaque server timestamp); raises ValueError when malformed."""
+    if not token:
+        return None
+    datetime.datetime.fromisoformat(token)
+    return token
+
+def changes_query(floor):
+    """The filter for documents created or updated after the `floor` timestamp."""
+    return {'$or': [
+        {'updated_at': {'$gt': floor}},
+        # Documents written before updated_at was introduced
+        {'updated_at': {'$exists': False}, 'created_at': {'$gt': floor}},
+    ]}
+
+def tombstones_query(floor, types):
+    return {'deleted_at': {'$gt': floor}, 'type': {'$in': list(types)}}
+
+@tracing.traced('db')
+def get_changes_since(since=None, types=tuple(SYNC_COLLECTIONS)):
+    """
+    Returns the documents created or updated, and the ids tombstoned, after the `since`
+    token, plus the token to pass next time. Without a token, or with one older than the
+    tombstone retention, everything is returned with `full_resync` set so the client
+    replaces its cache instead of merging into it.
+    """
+    database.flush_writes()
+    db = database.get_db()
+    if db is None:
+        raise Exception("Database connection not configured")
+
+    # Taken before reading so writes racing with this sync are picked up next time
+    token = _now_iso()
+    now = datetime.datetime.utcnow()
+    retention_start = (now - datetime.timedelta(days=SYNC_TOMBSTONE_DAYS)).isoformat(timespec='microseconds')
+    full_resync = not since or since < retention_start
+
+    query = {}
+    if not full_resync:
+        floor = (datetime.datetime.fromisoformat(since) - datetime.timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat(timespec='microseconds')
+        query = changes_query(floor)
+
+    changes = {}
+    for item_type in types:
+        collection = db[SYNC_COLLECTIONS[item_type]]
+        schema.ensure_collection_indexes(collection)
+        changes[item_type] = list(collection.find(query, {'_id': 0}))
+
+    deleted = []
+    if not full_resync:
+        tombstones = db[TOMBSTONES_COLLECTION]
+        schema.ensure_collection_indexes(tombstones)
+        deleted = list(tombstones.find(tombstones_query(floor, types), {'_id': 0, 'expires_at': 0}))
+
+    return {'token': token, 'full_resync': full_resync, 'changes': changes, 'deleted': deleted}
+
+@tracing.traced('db')
+def apply_sync_mutations(mutations):
+    """
+    Applies a batch of client mutations with one bulk_write per touched collection.
+    Each mutation is {'op': 'delete', 'type': 'todo'|'note'|'keyword', 'id'|'key': ...}
+    or {'op': 'upsert', 'type': 'keyword', 'key': ..., 'value': ...}, validated by the caller.
+    Returns {'deleted': n, 'upserted': n}.
+    """
+    database.flush_writes()
+    db = database.get_db()
+    if db is None:
+        raise Exception("Database connection not configured")
+
+    now = _now_iso()
+    ops = {item_type: [] for item_type in SYNC_COLLECTIONS}
+    deleted_ids = {item_type: [] for item_type in SYNC_COLLECTIONS}
+    # Final state per keyword key, as the client may delete and re-create one in a batch
+    keyword_outcome = {}
+    for mutation in mutations:
+        item_type = mutation['type']
+        if item_type != 'keyword':
+            ops[item_type].append(DeleteOne({'id': mutation['id']}))
+            deleted_ids[item_type].append(mutation['id'])
+            continue
+        key = mutation['key'].lower()
+        if mutation['op'] == 'delete':
+            ops['keyword'].append(DeleteOne({'key': key}))
+            keyword_outcome[key] = 'deleted'
+        else:
+            ops['keyword'].append(UpdateOne(
+                {'key': key},
+                {'$set': {'key': key, 'value': mutation['value'], 'updated_at': now},
+                 '$setOnInsert': {'id': str(uuid.uuid4()), 'created_at': now}},
+                upsert=True
+            ))
+            keyword_outcome[key] = 'upserted'
+
+    counts = {'deleted': 0, 'upserted': 0}
+    for item_type, requests in ops.items():
+        if not requests:
+            continue
+        # Keyword deletes and upserts may target the same key, so keep the client's order there
+        result = db[SYNC_COLLECTIONS[item_type]].bulk_write(requests, ordered=item_type == 'keyword')
+        counts['deleted'] += result.deleted_count
+        counts['upserted'] += result.upserted_count + result.matched_count
+
+    # Tombstone every requested delete, even already-missing ones: other devices may still cache them
+    deleted_ids['keyword'] = [key for key, outcome in keyword_outcome.items() if outcome == 'deleted']
+    for item_type, ids in deleted_ids.items():
+        record_tombstones(db, item_type, ids)
+    database.notes_changed(deleted=deleted_ids['note'])
+    upserted_keys = [key for key, outcome in keyword_outcome.items() if outcome == 'upserted']
+    if upserted_keys:
+        clear_tombstones(db, 'keyword', upserted_keys)
+    if keyword_outcome:
+        database.keywords_changed(db)
+    return counts
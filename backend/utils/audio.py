@@ -0,0 +1,251 @@
+import io
+import os
+import wave
+import struct
+import logging
+import warnings
+
+logger = logging.getLogger()
+
+# audioop (C, stdlib up to Python 3.12) is the default DSP backend; NumPy takes over
+# when it is installed or audioop is gone. Without either, audio passes through unchanged.
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        audioop = None
+
+# Whisper resamples everything to 16 kHz mono internally
+TARGET_RATE = 16000
+# 20 ms frames below this RMS (16-bit scale, about -36 dBFS) count as silence
+SILENCE_RMS = int(os.environ.get('STT_SILENCE_RMS', '500'))
+# Kept around the speech so trimming does not clip word onsets
+SILENCE_PAD_MS = 200
+FRAME_MS = 20
+
+CODECS = ('pcm16', 'mulaw')
+_WAVE_FORMAT_MULAW = 7
+_ULAW_SEGMENT_ENDS = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+class _AudioopOps:
+    name = 'audioop'
+
+    def to_mono16(self, frames, width, channels):
+        if channels > 2:
+            return None
+        if width == 1:
+            # 8-bit WAV is unsigned
+            frames = audioop.bias(frames, 1, -128)
+        if width != 2:
+            frames = audioop.lin2lin(frames, width, 2)
+        if channels == 2:
+            frames = audioop.tomono(frames, 2, 0.5, 0.5)
+        return frames
+
+    def resample(self, samples, rate_in, rate_out):
+        return audioop.ratecv(samples, 2, 1, rate_in, rate_out, None)[0]
+
+    def frame_rms(self, samples, frame_len):
+        step = frame_len * 2
+        return [audioop.rms(samples[i:i + step], 2) for i in range(0, len(samples), step)]
+
+    def length(self, samples):
+        return len(samples) // 2
+
+    def slice(self, samples, start, end):
+        return samples[start * 2:end * 2]
+
+    def pcm16(self, samples):
+        return bytes(samples)
+
+    def mulaw(self, samples):
+        return audioop.lin2ulaw(samples, 2)
+
+class _NumpyOps:
+    name = 'numpy'
+
+    def __init__(self, np):
+        self.np = np
+
+    def to_mono16(self, frames, width, channels):
+        np = self.np
+        if width == 1:
+            samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int32) - 128) << 8
+        elif width == 2:
+            samples = np.frombuffer(frames, dtype='<i2').astype(np.int32)
+        elif width == 3:
+            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            # Sign-extend the 24-bit little-endian value, then keep the top 16 bits
+            samples = ((raw[:, 0] << 8) | (raw[:, 1] << 16) | (raw[:, 2] << 24)) >> 16
+        elif width == 4:
+            samples = np.frombuffer(frames, dtype='<i4') >> 16
+        else:
+            return None
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        return samples.astype(np.int16)
+
+    def resample(self, samples, rate_in, rate_out):
+        np = self.np
+        ratio = rate_in / rate_out
+        signal = samples.astype(np.float64)
+        if ratio >= 2:
+            # Box filter as a cheap anti-aliasing low-pass before decimating
+            width = int(round(ratio))
+            signal = np.convolve(signal, np.ones(width) / width, mode='same')
+        positions = np.arange(int(len(signal) / ratio)) * ratio
+        return np.interp(positions, np.arange(len(signal)), signal).astype(np.int16)
+
+    def frame_rms(self, samples, frame_len):
+        np = self.np
+        padded = np.zeros(-(-len(samples) // frame_len) * frame_len, dtype=np.float64)
+        padded[:len(samples)] = samples
+        return list(np.sqrt(np.mean(np.square(padded.reshape(-1, frame_len)), axis=1)))
+
+    def length(self, samples):
+        return len(samples)
+
+    def slice(self, samples, start, end):
+        return samples[start:end]
+
+    def pcm16(self, samples):
+        return samples.astype('<i2').tobytes()
+
+    def mulaw(self, samples):
+        # G.711 mu-law on 14-bit input, bit-compatible with audioop.lin2ulaw
+        np = self.np
+        x = samples.astype(np.int32) >> 2
+        mask = np.where(x < 0, 0x7F, 0xFF)
+        x = np.minimum(np.abs(x), 8159) + 0x21
+        segment = np.searchsorted(_ULAW_SEGMENT_ENDS, x)
+        value = np.where(segment >= 8, 0x7F, (segment << 4) | ((x >> (segment + 1)) & 0x0F))
+        return (value ^ mask).astype(np.uint8).tobytes()
+
+def _ops():
+    if audioop is not None:
+        return _AudioopOps()
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return _NumpyOps(numpy)
+
+def is_wav(data):
+    return len(data) >= 12 and bytes(data[:4]) == b'RIFF' and bytes(data[8:12]) == b'WAVE'
+
+def _trim_silence(ops, samples, rate):
+    frame_len = rate * FRAME_MS // 1000
+    voiced = [i for i, rms in enumerate(ops.frame_rms(samples, frame_len)) if rms >= SILENCE_RMS]
+    if not voiced:
+        # Nothing above the threshold: possibly quiet speech, leave it to the STT
+        return samples
+    pad = SILENCE_PAD_MS // FRAME_MS
+    start = max(voiced[0] - pad, 0) * frame_len
+    end = min((voiced[-1] + 1 + pad) * frame_len, ops.length(samples))
+    return ops.slice(samples, start, end)
+
+def _write_wav(ops, samples, rate, codec):
+    if codec == 'mulaw':
+        data = ops.mulaw(samples)
+        # Non-PCM WAV: 18-byte fmt chunk (cbSize 0) plus the mandatory fact chunk
+        fmt = struct.pack('<HHIIHHH', _WAVE_FORMAT_MULAW, 1, rate, rate, 1, 8, 0)
+        pad = b'\x00' if len(data) % 2 else b''
+        chunks = (
+            b'fmt ' + struct.pack('<I', len(fmt)) + fmt
+            + b'fact' + struct.pack('<II', 4, len(data))
+            + b'data' + struct.pack('<I', len(data))
+        )
+        return b'RIFF' + struct.pack('<I', 4 + len(chunks) + len(data) + len(pad)) + b'WAVE' + chunks + data + pad
+
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(ops.pcm16(samples))
+    return out.getvalue()
+
+def _decode(data, target_rate):
+    """
+    Reads a PCM WAV into mono 16-bit samples at no more than `target_rate`.
+    Returns (ops, samples, rate, info), or None when the input cannot be processed.
+    """
+    ops = _ops()
+    if ops is None or not is_wav(data):
+        return None
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as reader:
+            channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+            frames = reader.readframes(reader.getnframes())
+    except (wave.Error, EOFError) as e:
+        logger.warning(f"Audio preprocessing skipped, unreadable WAV: {e}")
+        return None
+
+    samples = ops.to_mono16(frames, width, channels)
+    if samples is None:
+        return None
+    info = {'backend': ops.name, 'rate_in': rate, 'channels_in': channels, 'ms_in': len(frames) * 1000 // (rate * width * channels)}
+    if rate > target_rate:
+        samples = ops.resample(samples, rate, target_rate)
+        rate = target_rate
+    return ops, samples, rate, info
+
+def preprocess(data, content_type, codec='pcm16', target_rate=TARGET_RATE, trim=True):
+    """
+    Shrinks a WAV upload to what Whisper actually uses: leading/trailing silence trimmed,
+    downmixed to mono, downsampled to `target_rate` and re-encoded as 16-bit PCM or
+    8-bit mu-law WAV. Returns (data, content_type, stats); input that is not PCM WAV,
+    or would not get smaller, is returned unchanged with stats['applied'] False.
+    Compressed uploads (AAC/M4A) need a decoder binary and always pass through.
+    """
+    stats = {'applied': False, 'bytes_in': len(data), 'bytes_out': len(data)}
+    decoded = _decode(data, target_rate)
+    if decoded is None:
+        return data, content_type, stats
+    ops, samples, rate, info = decoded
+    stats.update(info)
+
+    if trim:
+        samples = _trim_silence(ops, samples, rate)
+
+    encoded = _write_wav(ops, samples, rate, codec)
+    stats['ms_out'] = ops.length(samples) * 1000 // rate
+    if len(encoded) >= len(data):
+        return data, content_type, stats
+
+    stats.update(applied=True, bytes_out=len(encoded), codec=codec)
+    return encoded, 'audio/wav', stats
+
+def split_at_silence(data, segment_seconds, codec='pcm16', target_rate=TARGET_RATE):
+    """
+    Cuts a WAV recording into segments of roughly `segment_seconds`, each cut placed at
+    the quietest 20 ms frame within a quarter segment of the nominal boundary so words
+    are not split. Returns [(offset_ms, wav_bytes)] in order, or None when the input
+    cannot be decoded or is too short to need splitting.
+    """
+    decoded = _decode(data, target_rate)
+    if decoded is None:
+        return None
+    ops, samples, rate, _ = decoded
+
+    frame_len = rate * FRAME_MS // 1000
+    rms = ops.frame_rms(samples, frame_len)
+    segment_frames = max(int(segment_seconds * 1000 // FRAME_MS), 1)
+    window = segment_frames // 4
+    if len(rms) <= segment_frames + window:
+        return None
+
+    cuts = [0]
+    while len(rms) - cuts[-1] > segment_frames + window:
+        target = cuts[-1] + segment_frames
+        candidates = range(target - window, min(target + window, len(rms) - 1) + 1)
+        # Quietest frame wins; among equally quiet ones, the closest to the nominal boundary
+        cuts.append(min(candidates, key=lambda i: (rms[i], abs(i - target))))
+    cuts.append(len(rms))
+
+    total = ops.length(samples)
+    return [
+        (start * FRAME_MS, _write_wav(ops, ops.slice(samples, start * frame_len, min(end * frame_len, total)), rate, codec))
+        for start, end in zip(cuts, cuts[1:])
+    ]
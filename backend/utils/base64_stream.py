@@ -0,0 +1,40 @@
+import binascii
+
+# Input characters decoded per step; a multiple of 4 keeps quanta aligned
+CHUNK_SIZE = 64 * 1024
+
+# Same leniency as base64.b64decode: anything outside the alphabet (e.g. the line breaks
+# Android's Base64.DEFAULT inserts every 76 characters) is discarded
+_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='
+_NON_ALPHABET = bytes(b for b in range(256) if b not in _ALPHABET)
+
+def decode(data, chunk_size=CHUNK_SIZE):
+    """
+    Decodes base64 `data` (str or bytes-like) into a single bytearray, chunk by chunk.
+
+    base64.b64decode first encodes a str payload to ASCII (a full copy of the input)
+    and returns a new bytes object; here only one output buffer is allocated and the
+    input is walked in `chunk_size` slices. Raises binascii.Error on malformed input.
+    """
+    if isinstance(data, str) and not data.isascii():
+        raise ValueError('string argument should contain only ASCII characters')
+    view = data if isinstance(data, str) else memoryview(data).cast('B')
+
+    out = bytearray(len(view) * 3 // 4 + 3)
+    pos = 0
+    carry = b''
+    for start in range(0, len(view), chunk_size):
+        chunk = view[start:start + chunk_size]
+        chunk = chunk.encode('ascii') if isinstance(chunk, str) else bytes(chunk)
+        chunk = carry + chunk.translate(None, _NON_ALPHABET)
+        usable = len(chunk) - len(chunk) % 4
+        carry = chunk[usable:]
+        if usable:
+            decoded = binascii.a2b_base64(chunk[:usable])
+            out[pos:pos + len(decoded)] = decoded
+            pos += len(decoded)
+
+    if carry:
+        raise binascii.Error('Incorrect padding')
+    del out[pos:]
+    return out
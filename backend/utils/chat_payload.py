@@ -0,0 +1,40 @@
+import json
+import functools
+
+# Placeholder for the user message while the static parts of the payload are serialized
+_USER_SLOT = json.dumps('\x00user\x00')
+
+@functools.lru_cache(maxsize=16)
+def _frame(model, system_prompt, stream, response_format):
+    """
+    JSON-encodes everything except the user message once per process and returns the
+    bytes before and after it. The system prompt comes first and never changes, so the
+    upstream sees an identical prompt prefix on every request and can reuse its KV cache.
+    """
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": '\x00user\x00'}
+        ],
+        "temperature": 0.1, # Low temperature for deterministic JSON
+    }
+    if response_format:
+        payload["response_format"] = {"type": response_format}
+    if stream:
+        payload["stream"] = True
+    head, tail = json.dumps(payload).split(_USER_SLOT)
+    return head.encode('utf-8'), tail.encode('utf-8')
+
+def chat_body(model, system_prompt, user_content, stream=False, response_format='json_object'):
+    """Chat-completions request body: the cached frame with only the user message encoded per call."""
+    head, tail = _frame(model, system_prompt, stream, response_format)
+    return head + json.dumps(user_content).encode('utf-8') + tail
+
+@functools.lru_cache(maxsize=4)
+def auth_headers(api_key):
+    """Request headers, built once per key. Shared between calls: do not mutate."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
@@ -0,0 +1,18 @@
+import time
+import contextvars
+
+# Absolute time.monotonic() by which the invocation must have answered. asyncio.to_thread
+# copies the context, so worker threads see the deadline of the request they serve.
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+def begin(seconds):
+    """Gives the current context `seconds` of budget (None: unbounded); returns the token for `end`."""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+def end(token):
+    _deadline.reset(token)
+
+def remaining():
+    """Seconds left before the deadline, or None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
@@ -0,0 +1,230 @@
+import os
+import io
+import json
+import time
+import logging
+import contextlib
+import threading
+import http.client
+import urllib.parse
+import urllib.error
+from utils import deadline
+
+logger = logging.getLogger()
+
+# Errors raised when a kept-alive socket was silently closed by the upstream
+# (idle timeout, load balancer recycling). Safe to retry once on a fresh connection.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+class PooledResponse:
+    """
+    Fully read upstream response. The connection has already been returned to the pool.
+    """
+    def __init__(self, status, reason, headers, data):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.data = data
+
+    def json(self):
+        return json.loads(self.data)
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections, keyed by (scheme, host, port).
+
+    Lives at module level so warm function instances reuse TCP/TLS sessions
+    across invocations instead of paying DNS + handshakes on every upstream call.
+    """
+    def __init__(self, max_per_host=4, idle_timeout=50.0):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self._stats = {'hits': 0, 'misses': 0, 'stale_retries': 0, 'errors': 0, 'slot_timeouts': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            return self._slots[key]
+
+    def _acquire(self, key, timeout):
+        """
+        Takes one of the host's connection slots, waiting no longer than the call timeout
+        or the request deadline. Raises URLError (a timeout, as for a connect) when none frees up.
+        """
+        wait = timeout
+        left = deadline.remaining()
+        if left is not None:
+            wait = max(0.0, left if wait is None else min(wait, left))
+        slot = self._slot(key)
+        if not slot.acquire(timeout=wait):
+            self._count('slot_timeouts')
+            raise urllib.error.URLError(TimeoutError(f"no free connection to {key[1]} within {wait:.2f} s"))
+        return slot
+
+    def _checkout(self, key, timeout):
+        """Returns (connection, reused). Expired idle connections are closed and skipped."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    self._stats['hits'] += 1
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._connect(key, timeout), False
+
+    def _connect(self, key, timeout):
+        self._count('misses')
+        scheme, host, port = key
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return conn_class(host, port, timeout=timeout)
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def _target(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme or 'https'
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        path = parsed.path or '/'
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        return (scheme, parsed.hostname, port), path
+
+    def _open(self, key, method, path, body, headers, timeout):
+        """Sends the request and returns (connection, response) with the body still unread."""
+        conn, reused = self._checkout(key, timeout)
+        try:
+            try:
+                return conn, self._send(conn, method, path, body, headers)
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # Upstream closed the idle socket; retry once on a fresh connection.
+                logger.info(f"Stale pooled connection to {key[1]}, reconnecting")
+                conn.close()
+                self._count('stale_retries')
+                conn = self._connect(key, timeout)
+                return conn, self._send(conn, method, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._count('errors')
+            raise urllib.error.URLError(e)
+
+    def _read(self, conn, response):
+        try:
+            return response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._count('errors')
+            raise urllib.error.URLError(e)
+
+    def _release(self, key, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Performs a request over a pooled connection. `body` may be bytes or a re-iterable
+        of bytes-like chunks (e.g. utils.multipart.MultipartBody), sent as they are when a
+        Content-Length header is given and with chunked transfer encoding otherwise.
+
+        Mirrors urllib.request.urlopen error semantics so callers can keep their
+        existing handlers: HTTP status >= 400 raises urllib.error.HTTPError and
+        connection failures raise urllib.error.URLError.
+        """
+        key, path = self._target(url)
+        slot = self._acquire(key, timeout)
+        try:
+            conn, response = self._open(key, method, path, body, headers, timeout)
+            data = self._read(conn, response)
+            self._release(key, conn, response)
+        finally:
+            slot.release()
+
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(data))
+
+        return PooledResponse(response.status, response.reason, response.headers, data)
+
+    @contextlib.contextmanager
+    def stream(self, method, url, body=None, headers=None, timeout=None):
+        """
+        Like `request`, but yields the live http.client response so the body can be
+        consumed incrementally (e.g. server-sent events). The connection goes back to
+        the pool once the block exits and the remaining body has been drained.
+        """
+        key, path = self._target(url)
+        slot = self._acquire(key, timeout)
+        try:
+            conn, response = self._open(key, method, path, body, headers, timeout)
+            if response.status >= 400:
+                data = self._read(conn, response)
+                self._release(key, conn, response)
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(data))
+            try:
+                yield response
+                self._read(conn, response)
+            except BaseException:
+                conn.close()
+                raise
+            self._release(key, conn, response)
+        finally:
+            slot.release()
+
+    def _send(self, conn, method, path, body, headers):
+        conn.request(method, path, body=body, headers=headers or {})
+        return conn.getresponse()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = sum(len(v) for v in self._idle.values())
+        return stats
+
+    def clear(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+# Shared across LLM and STT calls and across warm invocations
+_pool = ConnectionPool(
+    max_per_host=int(os.environ.get('HTTP_POOL_MAX_PER_HOST', '4')),
+    idle_timeout=float(os.environ.get('HTTP_POOL_IDLE_TIMEOUT', '50'))
+)
+
+def request(method, url, body=None, headers=None, timeout=None):
+    return _pool.request(method, url, body=body, headers=headers, timeout=timeout)
+
+def get_stats():
+    return _pool.stats()
+
+def stream(method, url, body=None, headers=None, timeout=None):
+    return _pool.stream(method, url, body=body, headers=headers, timeout=timeout)
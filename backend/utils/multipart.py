@@ -1,28 +1,58 @@
 import uuid
 
+# Size of the slices the audio payload is handed to the socket in
+CHUNK_SIZE = 64 * 1024
+
+class MultipartBody:
+    """
+    multipart/form-data body that is never assembled in memory: iterating yields the
+    small encoded headers as bytes and the file contents as memoryview slices of the
+    caller's buffer, so sending a clip does not copy it.
+
+    Iterable more than once (a pooled request retried on a stale connection re-sends it).
+    """
+    def __init__(self, fields, files, boundary=None, chunk_size=CHUNK_SIZE):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self._parts = []
+
+        boundary_line = b'--' + self.boundary.encode('utf-8') + b'\r\n'
+        preamble = bytearray()
+        for name, value in fields.items():
+            preamble.extend(boundary_line)
+            preamble.extend(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode('utf-8'))
+            preamble.extend(str(value).encode('utf-8'))
+            preamble.extend(b'\r\n')
+
+        for name, (filename, content, content_type) in files.items():
+            preamble.extend(boundary_line)
+            preamble.extend(f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode('utf-8'))
+            if content_type:
+                preamble.extend(f'Content-Type: {content_type}\r\n'.encode('utf-8'))
+            preamble.extend(b'\r\n')
+            self._parts.append(bytes(preamble))
+            self._parts.append(memoryview(content).cast('B'))
+            preamble = bytearray(b'\r\n')
+
+        preamble.extend(b'--' + self.boundary.encode('utf-8') + b'--\r\n')
+        self._parts.append(bytes(preamble))
+        self.content_length = sum(part.nbytes if isinstance(part, memoryview) else len(part) for part in self._parts)
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            for start in range(0, part.nbytes, self.chunk_size):
+                yield part[start:start + self.chunk_size]
+
+    def __len__(self):
+        return self.content_length
+
 def encode_multipart_formdata(fields, files):
     """
     Manually encodes multipart/form-data for use with urllib.
     """
-    boundary = uuid.uuid4().hex.encode('utf-8')
-    body = bytearray()
-    
-    for name, value in fields.items():
-        body.extend(b'--' + boundary + b'\r\n')
-        body.extend(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode('utf-8'))
-        body.extend(str(value).encode('utf-8'))
-        body.extend(b'\r\n')
-        
-    for name, (filename, content, content_type) in files.items():
-        body.extend(b'--' + boundary + b'\r\n')
-        body.extend(f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode('utf-8'))
-        if content_type:
-            body.extend(f'Content-Type: {content_type}\r\n'.encode('utf-8'))
-        body.extend(b'\r\n')
-        body.extend(content)
-        body.extend(b'\r\n')
-        
-    body.extend(b'--' + boundary + b'--\r\n')
-    
-    content_type_header = f'multipart/form-data; boundary={boundary.decode("utf-8")}'
-    return bytes(body), content_type_header
+    body = MultipartBody(fields, files)
+    return b''.join(body), body.content_type
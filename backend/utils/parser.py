@@ -1,15 +1,15 @@
-import parsedatetime
 import datetime
 import re
-import pytz
+from utils import time_context
 
-def extract_meeting_details(transcript, user_timezone='UTC'):
+def extract_meeting_details(transcript, user_timezone='UTC', now=None):
     """
     Parses the transcript to find meeting details.
     
     Args:
         transcript (str): The spoken text.
         user_timezone (str): The timezone of the user (e.g., 'America/New_York').
+        now (datetime.datetime): The request's aware current time; taken in user_timezone if omitted.
         
     Returns:
         dict: {
@@ -18,7 +18,7 @@ def extract_meeting_details(transcript, user_timezone='UTC'):
             'end_time': datetime.datetime (timezone aware)
         }
     """
-    cal = parsedatetime.Calendar()
+    cal = time_context.calendar()
     
     # 1. Identify Duration
     duration_minutes = 60 # Default REQ-B-004
@@ -35,12 +35,8 @@ def extract_meeting_details(transcript, user_timezone='UTC'):
     
     # 2. Identify Start Date/Time
     # Default: Tomorrow at 9:00 AM (REQ-B-003)
-    try:
-        tz = pytz.timezone(user_timezone)
-    except pytz.UnknownTimeZoneError:
-        tz = pytz.UTC
-        
-    now_local = datetime.datetime.now(tz)
+    tz = time_context.get_timezone(user_timezone)
+    now_local = now.astimezone(tz) if now is not None else time_context.now(user_timezone)
     source_time = now_local.replace(tzinfo=None)
     
     start_dt_naive = None
@@ -0,0 +1,114 @@
+import os
+import json
+import zlib
+import base64
+import functools
+
+# Bodies below this size are sent as they are: compressing them would not pay for the
+# base64 encoding the gateway needs for binary bodies
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '4096'))
+
+# Shared encoder; produces exactly what json.dumps does with default arguments
+_encode = json.JSONEncoder().encode
+
+@functools.lru_cache(maxsize=32)
+def _envelope_prefix(type_name):
+    return '{"status": "success", "type": ' + _encode(type_name) + ', "data": ['
+
+def list_chunks(type_name, items, **extra):
+    """
+    Yields `{"status": "success", "type": type_name, "data": [items...], **extra}` as JSON,
+    one item per chunk, so a cursor is never materialized as a list. The constant envelope
+    prefix is encoded once per type. `extra` values may be callables, evaluated after the
+    last item (e.g. a next-page cursor that depends on the items).
+    """
+    yield _envelope_prefix(type_name)
+    separator = ''
+    for item in items:
+        yield separator + _encode(item)
+        separator = ', '
+    yield ']' + ''.join(
+        f', {_encode(key)}: {_encode(value() if callable(value) else value)}' for key, value in extra.items()
+    ) + '}'
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def negotiate(accept_encoding):
+    """Picks 'br' (when the brotli package is installed) or 'gzip' from an Accept-Encoding header, or None."""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name.strip():
+            offered[name.strip().lower()] = quality
+    for coding in ('br', 'gzip'):
+        if offered.get(coding, offered.get('*', 0)) > 0 and (coding != 'br' or _brotli() is not None):
+            return coding
+    return None
+
+class _Compressor:
+    def __init__(self, coding):
+        self.coding = coding
+        if coding == 'br':
+            self._impl = _brotli().Compressor(quality=5)
+            self._feed, self._finish = self._impl.process, self._impl.finish
+        else:
+            # wbits=31: gzip container, as Content-Encoding: gzip expects
+            self._impl = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self._feed, self._finish = self._impl.compress, self._impl.flush
+        self._parts = []
+
+    def feed(self, data):
+        self._parts.append(self._feed(data))
+
+    def finish(self):
+        self._parts.append(self._finish())
+        return b''.join(self._parts)
+
+def finalize(response, accept_encoding=None):
+    """
+    Turns the body into the string the gateway returns. Chunked bodies (`list_chunks`) are
+    joined, or, once past COMPRESS_MIN_BYTES and with a coding the client accepts, fed to
+    the compressor chunk by chunk. A compressed body is base64-encoded with
+    `isBase64Encoded` set, as the gateway requires for binary responses.
+    """
+    body = response.get('body')
+    if body is None or response.get('isBase64Encoded'):
+        return response
+    coding = negotiate(accept_encoding)
+    if isinstance(body, str) and (coding is None or len(body) < COMPRESS_MIN_BYTES):
+        return response
+
+    buffered, size, compressor = [], 0, None
+    for chunk in ([body] if isinstance(body, str) else body):
+        if compressor is not None:
+            compressor.feed(chunk.encode('utf-8'))
+            continue
+        buffered.append(chunk)
+        size += len(chunk)
+        if coding is not None and size >= COMPRESS_MIN_BYTES:
+            compressor = _Compressor(coding)
+            compressor.feed(''.join(buffered).encode('utf-8'))
+            buffered = None
+
+    if compressor is None:
+        response['body'] = ''.join(buffered)
+        return response
+
+    headers = response.setdefault('headers', {})
+    headers['Content-Encoding'] = coding
+    headers['Vary'] = 'Accept-Encoding'
+    response['body'] = base64.b64encode(compressor.finish()).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
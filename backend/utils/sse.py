@@ -0,0 +1,23 @@
+import json
+
+def iter_sse_data(response):
+    """
+    Yields the decoded JSON payload of each `data:` event of a server-sent events
+    stream, stopping at the OpenAI-style `data: [DONE]` sentinel.
+    """
+    for raw in response:
+        line = raw.decode('utf-8').strip()
+        if not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return
+        yield json.loads(data)
+
+def iter_chat_deltas(response):
+    """Yields the content fragments of a streamed chat completion."""
+    for chunk in iter_sse_data(response):
+        choices = chunk.get('choices') or [{}]
+        content = (choices[0].get('delta') or {}).get('content')
+        if content:
+            yield content
@@ -0,0 +1,139 @@
+import re
+import math
+import heapq
+import threading
+
+# Words, including Finnish letters; digits are kept so door codes and years are searchable
+_WORD = re.compile(r"[0-9a-zåäöéü]+")
+
+STOPWORDS = frozenset(
+    # English
+    "a an and are as at be but by for from has have i in is it its me my of on or so that "
+    "the this to was were will with".split()
+    # Finnish
+    + "ei ette eivät en et ja jos kuin mutta myös ne niin nyt oli olla on ovat se sen siitä "
+      "sitä tai tämä että joka mikä minä mä sinä hän me te he".split()
+)
+
+# Finnish clitics and possessive suffixes, stripped before the case endings they follow
+_FI_CLITICS = ('kaan', 'kään', 'kin', 'han', 'hän', 'nsa', 'nsä', 'mme', 'nne', 'ni')
+# Finnish case endings, longest first (inessive, elative, adessive, ablative, allative,
+# translative, illative, essive, abessive, genitive/plural forms)
+_FI_CASES = (
+    'issa', 'issä', 'ista', 'istä', 'illa', 'illä', 'ilta', 'iltä', 'ille', 'iksi', 'ihin', 'ina', 'inä',
+    'ssa', 'ssä', 'sta', 'stä', 'lla', 'llä', 'lta', 'ltä', 'lle', 'ksi', 'tta', 'ttä', 'een', 'seen',
+    'den', 'ten', 'jen', 'na', 'nä', 'an', 'än', 'en', 'in', 'on', 'un', 'yn', 'ön', 'a', 'ä', 't', 'n'
+)
+_VOWELS = 'aeiouyäöå'
+MIN_STEM = 3
+
+def _strip(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+def stem(word):
+    """
+    Light stemmer for mixed Finnish/English text, applied identically to notes and queries.
+    Strips English inflection (-ies, -es, -s, -ing, -ed), then Finnish clitics, possessives
+    and case endings, then trailing vowels and a final doubled consonant, so that e.g. "kauppa",
+    "kaupassa" and "kauppaan" share the stem "kaup". Compound words are not split.
+    """
+    if len(word) <= MIN_STEM or word.isdigit():
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = _strip(word, ('es', 's'))
+    if word.isascii():
+        word = _strip(word, ('ing', 'ed'))
+    # Harmless on English: the same cut is made at index and at query time
+    word = _strip(_strip(word, _FI_CLITICS), _FI_CASES)
+    while len(word) > MIN_STEM and word[-1] in _VOWELS:
+        word = word[:-1]
+    if len(word) > MIN_STEM and word[-1] == word[-2] and word[-1] not in _VOWELS:
+        # Consonant gradation (kauppa/kaupan) and English doubling (shopping/shop)
+        word = word[:-1]
+    return word
+
+def tokenize(text):
+    """Lower-cased stems of the words in `text`, stopwords removed, in order."""
+    return [stem(word) for word in _WORD.findall((text or '').lower()) if word not in STOPWORDS]
+
+class InvertedIndex:
+    """
+    Thread-safe in-memory inverted index with BM25 ranking. Documents are added, replaced
+    and removed one at a time, so the index is maintained incrementally as notes change.
+    """
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # term -> {doc_id: term frequency}
+        self._postings = {}
+        # doc_id -> {term: term frequency}, to unindex a document without rescanning
+        self._docs = {}
+        self._lengths = {}
+        self._total_length = 0
+
+    def add(self, doc_id, text):
+        terms = {}
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + 1
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._docs[doc_id] = terms
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._docs.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def search(self, query, limit=20):
+        """Returns ([(doc_id, score)] best first, number of matching documents)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._docs)
+            if not terms or not count:
+                return [], 0
+            avg_length = self._total_length / count
+            scores = {}
+            # Only the postings of the query terms are touched, never the whole corpus
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1]), len(scores)
@@ -0,0 +1,48 @@
+import logging
+import datetime
+import threading
+import functools
+
+logger = logging.getLogger()
+
+# One place to resolve the user's timezone and "now". Timezone objects are cached for the
+# life of the instance, and each worker thread keeps its own parsedatetime Calendar
+# (building one loads its locale tables; it keeps parse state, so it is not shared).
+
+_local = threading.local()
+
+def get_timezone(name):
+    """The pytz timezone for an IANA name, or UTC when the name is empty, unknown or not a string."""
+    if not isinstance(name, str):
+        # Client-supplied; a JSON object or number would not even be hashable for the cache
+        if name is not None:
+            logger.warning(f"Invalid timezone {name!r}, using UTC")
+        name = ''
+    return _timezone(name)
+
+@functools.lru_cache(maxsize=128)
+def _timezone(name):
+    import pytz
+    if not name:
+        return pytz.UTC
+    try:
+        return pytz.timezone(name)
+    except pytz.UnknownTimeZoneError:
+        logger.warning(f"Unknown timezone '{name}', using UTC")
+        return pytz.UTC
+
+def now(timezone='UTC'):
+    """The current time as an aware datetime in the user's timezone. Take it once per request and pass it on."""
+    return datetime.datetime.now(get_timezone(timezone))
+
+def localize(naive, timezone='UTC'):
+    """Attaches the user's timezone to a naive wall-clock datetime (DST-correct, unlike replace())."""
+    return get_timezone(timezone).localize(naive)
+
+def calendar():
+    """This thread's parsedatetime Calendar."""
+    cal = getattr(_local, 'calendar', None)
+    if cal is None:
+        import parsedatetime
+        cal = _local.calendar = parsedatetime.Calendar()
+    return cal
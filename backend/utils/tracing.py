@@ -0,0 +1,87 @@
+import time
+import functools
+import threading
+import contextlib
+import contextvars
+
+# The trace of the invocation being served. asyncio.to_thread copies the context, so
+# spans recorded on worker threads land in the same trace; background threads
+# (warm-up, index bootstrap) have no trace and record nothing.
+_current = contextvars.ContextVar('trace', default=None)
+
+class Trace:
+    """Per-invocation span totals: {name: [total_ms, count]}, plus request metadata."""
+    def __init__(self, cold=False, bytes_in=0):
+        self.start = time.perf_counter()
+        self.cold = cold
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+        self._spans = {}
+
+    def add(self, name, ms):
+        with self._lock:
+            span = self._spans.setdefault(name, [0.0, 0])
+            span[0] += ms
+            span[1] += 1
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def spans(self):
+        with self._lock:
+            return {name: {'ms': round(ms, 1), 'count': count} for name, (ms, count) in self._spans.items()}
+
+    def server_timing(self):
+        """Value for the Server-Timing response header."""
+        metrics = [f"{name};dur={span['ms']}" for name, span in self.spans().items()]
+        metrics.append(f"total;dur={round(self.total_ms(), 1)}")
+        if self.cold:
+            metrics.append('cold')
+        return ', '.join(metrics)
+
+    def summary(self):
+        return {
+            'cold': self.cold,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'total_ms': round(self.total_ms(), 1),
+            'spans': self.spans()
+        }
+
+def activate(trace):
+    """Makes `trace` current for this context; returns the token for `deactivate`."""
+    return _current.set(trace)
+
+def deactivate(token):
+    _current.reset(token)
+
+def current():
+    return _current.get()
+
+def record(name, ms):
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, ms)
+
+@contextlib.contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+def wrap(name, func):
+    """Returns `func` instrumented as span `name`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def traced(prefix):
+    """Decorator recording each call as span `<prefix>.<function name>`."""
+    def decorator(func):
+        return wrap(f"{prefix}.{func.__name__}", func)
+    return decorator
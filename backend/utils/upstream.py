@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+import urllib.error
+from collections import deque
+from utils import deadline
+
+logger = logging.getLogger()
+
+# Consecutive failed calls (after their retries) that open a breaker, and how long it
+# stays open before a single probe call is let through
+BREAKER_FAILURES = int(os.environ.get('UPSTREAM_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('UPSTREAM_BREAKER_RESET_SECONDS', '30'))
+# A duplicate request is only sent once enough latencies are known to estimate the p95
+HEDGE_MIN_SAMPLES = int(os.environ.get('UPSTREAM_HEDGE_MIN_SAMPLES', '20'))
+LATENCY_WINDOW = 200
+# Not worth starting (or retrying) an attempt with less time than this left
+MIN_ATTEMPT_SECONDS = 0.5
+
+class UpstreamUnavailable(urllib.error.URLError):
+    """The call was not attempted: breaker open or no time budget left."""
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+def retryable(error):
+    """Throttling, server errors and connection failures/timeouts are worth another attempt."""
+    if isinstance(error, UpstreamUnavailable):
+        return False
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (urllib.error.URLError, TimeoutError, ConnectionError))
+
+def _retry_after(error):
+    headers = getattr(error, 'headers', None) if isinstance(error, urllib.error.HTTPError) else None
+    try:
+        return float(headers.get('Retry-After')) if headers else None
+    except (TypeError, ValueError):
+        # HTTP-date form; fall back to the jittered backoff
+        return None
+
+# Every Upstream by name, for get_stats
+_registry = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='upstream')
+        return _executor
+
+class Upstream:
+    """
+    Call policy for one upstream service (LLM, STT), shared by all calls to it from
+    this instance: per-attempt timeouts capped by the request deadline, retries with
+    full-jitter backoff on 429/5xx/connection errors, an optional hedged duplicate once
+    an attempt outlives the observed p95, and a circuit breaker that fails fast with
+    CircuitOpenError while the service keeps failing.
+    """
+    def __init__(self, name, timeout, retries=2, backoff=0.25, max_backoff=4.0, hedge=False):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._stats = {'calls': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'failures': 0, 'short_circuits': 0}
+        _registry[name] = self
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def call(self, func, retries=None, backoff=None, timeout=None, hedge=None):
+        """
+        Runs `func(timeout)` (one request, returning its result) under the policy.
+        Per-call arguments override the upstream's defaults. Raises the last error when
+        every attempt failed, CircuitOpenError/DeadlineExceeded when none was made.
+        """
+        retries = self.retries if retries is None else retries
+        backoff = self.backoff if backoff is None else backoff
+        timeout = self.timeout if timeout is None else timeout
+        hedge = self.hedge if hedge is None else hedge
+
+        attempt_timeout = self._attempt_timeout(timeout)
+        self._admit()
+        self._count('calls')
+        # Recorded in `finally`, so every way out of an admitted call (including a deadline
+        # hit between retries) reports to the breaker and a half-open probe never sticks
+        healthy = False
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    result = self._attempt(func, attempt_timeout, hedge)
+                except Exception as e:
+                    if not retryable(e):
+                        # The service answered; a bad request says nothing about its health
+                        healthy = True
+                        raise
+                    delay = self._backoff(attempt, backoff, e)
+                    left = deadline.remaining()
+                    if attempt == retries or (left is not None and left < delay + MIN_ATTEMPT_SECONDS):
+                        raise
+                    logger.warning(f"{self.name} attempt {attempt + 1} failed, retrying in {delay:.2f} s: {e}")
+                    self._count('retries')
+                    time.sleep(delay)
+                    attempt_timeout = self._attempt_timeout(timeout)
+                    continue
+                healthy = True
+                return result
+        finally:
+            if healthy:
+                self._on_success()
+            else:
+                self._on_failure()
+
+    def _attempt_timeout(self, timeout):
+        left = deadline.remaining()
+        if left is None:
+            return timeout
+        if left < MIN_ATTEMPT_SECONDS:
+            raise DeadlineExceeded(f"{self.name}: {max(left, 0):.2f} s left of the request budget")
+        return left if timeout is None else min(timeout, left)
+
+    def _backoff(self, attempt, backoff, error):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # Full jitter: concurrent callers hitting the same outage do not retry in lockstep
+        return random.uniform(0, min(self.max_backoff, backoff * (2 ** attempt)))
+
+    def _timed(self, func, timeout):
+        start = time.monotonic()
+        result = func(timeout)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def hedge_delay(self):
+        """The p95 attempt latency, or None until HEDGE_MIN_SAMPLES calls have completed."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def _attempt(self, func, timeout, hedge):
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return self._timed(func, timeout)
+
+        from concurrent.futures import wait, FIRST_COMPLETED
+        executor = _get_executor()
+        first = executor.submit(contextvars.copy_context().run, self._timed, func, timeout)
+        done, _ = wait([first], timeout=delay)
+        left = deadline.remaining()
+        if done or (left is not None and left < MIN_ATTEMPT_SECONDS):
+            return first.result()
+
+        # Slower than 95% of recent calls: race a duplicate, first success wins. The loser
+        # finishes in the background and its connection goes back to the pool.
+        self._count('hedges')
+        second_timeout = timeout if left is None else min(timeout or left, left)
+        second = executor.submit(contextvars.copy_context().run, self._timed, func, second_timeout)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _admit(self):
+        with self._lock:
+            if self._state == 'closed':
+                return
+            if self._state == 'open' and time.monotonic() - self._opened_at >= BREAKER_RESET_SECONDS:
+                # Let one probe through; everyone else keeps failing fast until it returns
+                self._state = 'half_open'
+                return
+            self._stats['short_circuits'] += 1
+        raise CircuitOpenError(f"{self.name} circuit open")
+
+    def _on_success(self):
+        with self._lock:
+            previous = self._state
+            self._state = 'closed'
+            self._failures = 0
+        if previous != 'closed':
+            self._log_state('closed')
+
+    def _on_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            opened = self._state == 'half_open' or (self._state == 'closed' and self._failures >= BREAKER_FAILURES)
+            if opened:
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+        if opened:
+            self._log_state('open')
+
+    def _log_state(self, state):
+        logger.warning(json.dumps({'event': 'upstream_breaker', 'upstream': self.name, 'state': state}))
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def stats(self):
+        delay = self.hedge_delay()
+        with self._lock:
+            return dict(self._stats, state=self._state, p95_ms=None if delay is None else round(delay * 1000, 1))
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._state = 'closed'
+            self._failures = 0
+            self._stats = dict.fromkeys(self._stats, 0)
+
+def get_stats():
+    return {name: upstream.stats() for name, upstream in _registry.items()}
+
+def reset():
+    for upstream in _registry.values():
+        upstream.reset()
@@ -0,0 +1,136 @@
+import threading
+
+# Converting float16 rows for the dot product dominates a scan, so past this many rows only
+# the rows of the nearest IVF lists are scanned
+IVF_MIN_ROWS = 2048
+IVF_PROBES = 8
+KMEANS_ITERATIONS = 5
+SCAN_BLOCK_ROWS = 1024
+
+class VectorIndex:
+    """
+    Cosine-similarity index over L2-normalized embeddings stored as float16 (NumPy is passed
+    in, being optional for the backend). Small indexes are scanned in full. Larger ones are
+    partitioned into sqrt(n) k-means lists (IVF), retrained whenever the index has doubled,
+    and a query only scans the IVF_PROBES lists whose centroids are closest to it.
+    """
+    def __init__(self, np, dims, probes=IVF_PROBES, ivf_min_rows=IVF_MIN_ROWS):
+        self.np = np
+        self.dims = dims
+        self.probes = probes
+        self.ivf_min_rows = ivf_min_rows
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((64, dims), dtype=np.float16)
+        # IVF list of each row; meaningless until centroids exist
+        self._lists = np.zeros(64, dtype=np.int32)
+        self._size = 0
+        self._ids = []
+        self._rows = {}
+        self._centroids = None
+        self._trained_size = 0
+
+    def _normalize(self, vectors):
+        np = self.np
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dims)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _grow(self, size):
+        np = self.np
+        capacity = len(self._matrix)
+        while capacity < size:
+            capacity *= 2
+        if capacity != len(self._matrix):
+            matrix = np.zeros((capacity, self.dims), dtype=np.float16)
+            matrix[:self._size] = self._matrix[:self._size]
+            lists = np.zeros(capacity, dtype=np.int32)
+            lists[:self._size] = self._lists[:self._size]
+            self._matrix, self._lists = matrix, lists
+
+    def add_many(self, items):
+        """Adds or replaces [(doc_id, vector)]."""
+        items = list(items)
+        if not items:
+            return
+        rows = self._normalize([vector for _, vector in items])
+        with self._lock:
+            positions = []
+            for doc_id, _ in items:
+                if doc_id not in self._rows:
+                    self._rows[doc_id] = len(self._ids)
+                    self._ids.append(doc_id)
+                positions.append(self._rows[doc_id])
+            self._grow(len(self._ids))
+            self._matrix[positions] = rows
+            if self._centroids is not None:
+                self._lists[positions] = self._assign(rows)
+            self._size = len(self._ids)
+            if self._size >= self.ivf_min_rows and self._size >= 2 * self._trained_size:
+                self._train()
+
+    def remove(self, doc_id):
+        with self._lock:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                return
+            # Move the last row into the gap so the rows stay dense
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._lists[row] = self._lists[last]
+                self._ids[row] = self._ids[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._size = last
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, doc_id):
+        return doc_id in self._rows
+
+    def _assign(self, rows):
+        return self.np.argmax(rows @ self._centroids.T, axis=1).astype(self.np.int32)
+
+    def _train(self):
+        np = self.np
+        rng = np.random.default_rng(0)
+        count = int(np.sqrt(self._size))
+        sample_rows = rng.choice(self._size, size=min(self._size, count * 32), replace=False)
+        sample = self._matrix[sample_rows].astype(np.float32)
+        centroids = sample[rng.choice(len(sample), size=count, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assigned = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, sample)
+            # Empty lists keep their previous centroid
+            filled = np.bincount(assigned, minlength=count) > 0
+            centroids[filled] = self._normalize(sums[filled])
+        self._centroids = centroids
+        for start in range(0, self._size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, self._size)
+            self._lists[start:end] = self._assign(self._matrix[start:end].astype(np.float32))
+        self._trained_size = self._size
+
+    def search(self, vector, limit=20):
+        """Returns [(doc_id, cosine similarity)] best first."""
+        np = self.np
+        query = self._normalize(vector)[0]
+        with self._lock:
+            if not self._size:
+                return []
+            if self._centroids is None:
+                candidates = np.arange(self._size)
+            else:
+                probes = np.argsort(-(self._centroids @ query))[:self.probes]
+                candidates = np.flatnonzero(np.isin(self._lists[:self._size], probes))
+            scores = np.empty(len(candidates), dtype=np.float32)
+            for start in range(0, len(candidates), SCAN_BLOCK_ROWS):
+                block = candidates[start:start + SCAN_BLOCK_ROWS]
+                scores[start:start + len(block)] = self._matrix[block].astype(np.float32) @ query
+            ids = [self._ids[i] for i in candidates] if self._centroids is not None else list(self._ids)
+        if not len(scores):
+            return []
+        top = np.argpartition(-scores, min(limit, len(scores)) - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
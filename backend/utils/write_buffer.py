@@ -0,0 +1,172 @@
+import json
+import time
+import atexit
+import signal
+import logging
+import threading
+
+logger = logging.getLogger()
+
+class WriteBuffer:
+    """
+    Write-behind queue: items are grouped per target (e.g. collection name) and handed to
+    `flush_fn(target, items)` in batches of up to `max_batch`, at most `max_delay` seconds
+    after the first item of a batch was queued. Writes from concurrent requests on a warm
+    instance share a batch.
+
+    `flush_fn` returns the items that failed for good (or raises to have the whole batch
+    retried up to `retries` times); those are logged as `write_behind_dropped` lines with
+    their content, so nothing disappears silently. Pending items are flushed at interpreter
+    exit, and on SIGTERM once `install_shutdown_hooks` has been called.
+    """
+    def __init__(self, flush_fn, max_batch=50, max_delay=0.05, retries=2, retry_delay=0.2):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._first_queued_at = None
+        # Batches taken off the queue but not yet written, so flush() can wait for them
+        self._in_flight = 0
+        self._thread = None
+        self._stats = {'queued': 0, 'flushed': 0, 'failed': 0, 'batches': 0}
+
+    def put(self, target, items):
+        with self._cond:
+            self._pending.setdefault(target, []).extend(items)
+            self._stats['queued'] += len(items)
+            if self._first_queued_at is None:
+                self._first_queued_at = time.monotonic()
+            self._start()
+            self._cond.notify_all()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            _register_shutdown(self)
+
+    def _full(self):
+        return any(len(items) >= self.max_batch for items in self._pending.values())
+
+    def _take(self):
+        batches = []
+        for target, items in self._pending.items():
+            for start in range(0, len(items), self.max_batch):
+                batches.append((target, items[start:start + self.max_batch]))
+        self._pending = {}
+        self._first_queued_at = None
+        self._in_flight += len(batches)
+        return batches
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Collect writes until a batch is full or the oldest one is due. A flush()
+                # on another thread may empty the queue meanwhile, so re-check each time.
+                while True:
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    wait = self._first_queued_at + self.max_delay - time.monotonic()
+                    if wait <= 0 or self._full():
+                        break
+                    self._cond.wait(wait)
+                batches = self._take()
+            for target, items in batches:
+                self._write(target, items)
+
+    def _write(self, target, items):
+        start = time.perf_counter()
+        failed = items
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    failed = list(self.flush_fn(target, items) or [])
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        logger.error(f"Write-behind flush to {target} failed: {e}")
+                        failed = items
+                        break
+                    logger.warning(f"Write-behind flush to {target} attempt {attempt + 1} failed, retrying: {e}")
+                    time.sleep(self.retry_delay * (2 ** attempt))
+            for item in failed:
+                logger.error(json.dumps({'event': 'write_behind_dropped', 'target': target, 'item': item}, default=str))
+            logger.info(json.dumps({
+                'event': 'write_behind_flush',
+                'target': target,
+                'items': len(items),
+                'failed': len(failed),
+                'ms': round((time.perf_counter() - start) * 1000, 1)
+            }, default=str))
+        finally:
+            with self._cond:
+                self._stats['batches'] += 1
+                self._stats['flushed'] += len(items) - len(failed)
+                self._stats['failed'] += len(failed)
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Writes everything queued so far on the calling thread and waits for batches the
+        background thread is still writing. Returns False if `timeout` ran out first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            batches = self._take() if self._pending else []
+        for target, items in batches:
+            self._write(target, items)
+        with self._cond:
+            while self._in_flight:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=sum(len(items) for items in self._pending.values()))
+
+# Every started buffer, flushed at interpreter exit and (once installed) on SIGTERM
+_buffers = []
+_hooks = {'atexit': False, 'sigterm': False}
+_hooks_lock = threading.Lock()
+
+def _register_shutdown(buffer):
+    with _hooks_lock:
+        if buffer not in _buffers:
+            _buffers.append(buffer)
+        if not _hooks['atexit']:
+            atexit.register(flush_all)
+            _hooks['atexit'] = True
+
+def install_shutdown_hooks():
+    """
+    Flushes all buffers when the runtime sends SIGTERM before stopping the instance, then
+    hands the signal on. Must be called from the main thread (e.g. at handler import).
+    """
+    with _hooks_lock:
+        if _hooks['sigterm']:
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def _on_sigterm(signum, frame):
+            flush_all()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.raise_signal(signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, _on_sigterm)
+        _hooks['sigterm'] = True
+
+def flush_all(timeout=5.0):
+    for buffer in list(_buffers):
+        if not buffer.flush(timeout):
+            logger.error(json.dumps(dict(buffer.stats(), event='write_behind_shutdown_timeout')))
@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+import base64
+import binascii
+import tracemalloc
+
+# usage: python3 bench_audio_upload.py [seconds_of_audio ...]
+# Compares the old upload path (b64decode + bytes multipart body) with the streaming one
+# (incremental base64 decode + memoryview multipart chunks) for 16 kHz 16-bit mono WAV.
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from utils import base64_stream
+from utils.multipart import MultipartBody
+
+BYTES_PER_SECOND = 16000 * 2
+FIELDS = {'model': 'whisper-large-v3', 'language': 'fi'}
+
+def _legacy_encode(fields, files):
+    # utils/multipart.encode_multipart_formdata as it was before the streaming body
+    boundary = b'0123456789abcdef'
+    body = bytearray()
+    for name, value in fields.items():
+        body.extend(b'--' + boundary + b'\r\n')
+        body.extend(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode('utf-8'))
+        body.extend(str(value).encode('utf-8') + b'\r\n')
+    for name, (filename, content, content_type) in files.items():
+        body.extend(b'--' + boundary + b'\r\n')
+        body.extend(f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode('utf-8'))
+        body.extend(f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8'))
+        body.extend(content)
+        body.extend(b'\r\n')
+    body.extend(b'--' + boundary + b'--\r\n')
+    return bytes(body)
+
+def legacy_pipeline(payload):
+    audio = base64.b64decode(payload)
+    body = _legacy_encode(FIELDS, {'file': ('audio.wav', audio, 'audio/wav')})
+    # What http.client hands to the socket
+    return [body]
+
+def streaming_pipeline(payload):
+    audio = base64_stream.decode(payload)
+    return MultipartBody(FIELDS, {'file': ('audio.wav', audio, 'audio/wav')})
+
+def measure(pipeline, payload):
+    tracemalloc.start()
+    start = time.perf_counter()
+    sent = 0
+    # Chunks the socket receives as fresh bytes objects (memoryviews alias the audio buffer)
+    copied_chunks = 0
+    for chunk in pipeline(payload):
+        sent += len(chunk)
+        if not isinstance(chunk, memoryview):
+            copied_chunks += len(chunk)
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'sent': sent, 'peak': peak, 'copied_chunks': copied_chunks, 'ms': elapsed}
+
+def main():
+    durations = [int(arg) for arg in sys.argv[1:]] or [10, 60]
+    print(f"{'audio':>8} {'pipeline':>10} {'peak MB/MB':>11} {'body copy MB/MB':>16} {'ms':>8}")
+    for seconds in durations:
+        audio = os.urandom(seconds * BYTES_PER_SECOND)
+        payload = base64.b64encode(audio).decode('ascii')
+        for name, pipeline in (('legacy', legacy_pipeline), ('streaming', streaming_pipeline)):
+            result = measure(pipeline, payload)
+            print(
+                f"{seconds:>6} s {name:>10} {result['peak'] / len(audio):>11.2f} "
+                f"{result['copied_chunks'] / len(audio):>16.2f} {result['ms']:>8.1f}"
+            )
+        if bytes(base64_stream.decode(payload)) != audio:
+            raise binascii.Error("streaming decode mismatch")
+
+if __name__ == '__main__':
+    main()
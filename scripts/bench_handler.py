@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import random
+import struct
+import logging
+import atexit
+import argparse
+import datetime
+import subprocess
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# usage: python3 bench_handler.py [--services inprocess|wire] [--requests N] [--concurrency N]
+#                                 [--llm-ms MS] [--stt-ms MS] [--mongo-ms MS]
+#                                 [--routes a,b] [--cold-runs N] [--save-baseline] [--tolerance F]
+# Drives handler.handler with the event mix of bench_events.json against LLM, STT and MongoDB
+# stand-ins with injected latency: in-process (bench_standins.py) by default, or with
+# --services wire the local servers of fake_services, which adds the pymongo and HTTP
+# serialization and socket work. Reports throughput and per-route p50/p95/p99 (warm), cold
+# invocation time (fresh interpreter: import + first call) and per-request allocation peak
+# and retained blocks. Compares against the stored baseline and exits 1 on a regression;
+# --save-baseline records the current run instead.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, '../backend'))
+sys.path.append(BACKEND_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+
+import bench_standins
+
+EVENTS_FILE = os.path.join(SCRIPTS_DIR, 'bench_events.json')
+BASELINE_FILES = {
+    'inprocess': os.path.join(SCRIPTS_DIR, 'bench_baseline.json'),
+    'wire': os.path.join(SCRIPTS_DIR, 'bench_baseline_wire.json'),
+}
+JITTER = 0.1
+DB_NAME = 'bench'
+# Regressions smaller than these are noise whatever the tolerance
+SLACK = {'ms': 2.0, 'cold_ms': 50.0, 'kb': 32.0}
+# Tail latencies and cold starts vary more between runs, so they get a multiple of --tolerance
+TOLERANCE_SCALE = {'p95_ms': 2, 'p99_ms': 2, 'cold_ms': 2}
+# Tail percentiles of routes with fewer samples are their slowest few requests, too noisy to compare
+MIN_REQUESTS = {'p95_ms': 50, 'p99_ms': 100}
+
+def _configure(args):
+    """
+    Prepares this process to invoke the handler. In-process stand-ins are installed and
+    seeded here; returns a function describing their call counts. The wire-level servers are
+    started once by the parent (`_start_services`) and reached through the environment.
+    """
+    os.environ.setdefault('LLM_API_KEY', 'bench')
+    os.environ.setdefault('SCALEWAY_API_KEY', 'bench')
+    os.environ['MONGO_DB_NAME'] = DB_NAME
+    # The handler logs every invocation; keep the cost, drop the output
+    root = logging.getLogger()
+    root.handlers = [logging.NullHandler()]
+    root.setLevel(logging.INFO)
+    if args.services == 'wire':
+        return None
+    pool, client = bench_standins.install(bench_standins.Latency(args.llm_ms, args.stt_ms, args.mongo_ms, JITTER))
+    _seed(lambda name, docs: client[DB_NAME][name].seed(docs), args.seed_items)
+    return lambda: f"upstream calls: {pool.stats()}, mongo operations: {client.operations}"
+
+def _start_services(args):
+    """
+    Runs the fake mongod and OpenAI-compatible servers in their own process, so they do not
+    compete with the handler for the GIL, seeds them, and points the backend (and the
+    cold-start children) at them. Returns a function describing their call counts.
+    """
+    command = [
+        sys.executable, '-m', 'fake_services', '--mongo-ms', str(args.mongo_ms), '--llm-ms', str(args.llm_ms),
+        '--stt-ms', str(args.stt_ms), '--embedding-ms', str(args.llm_ms / 4), '--jitter', str(JITTER)
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join([BACKEND_DIR, SCRIPTS_DIR])))
+    atexit.register(process.terminate)
+    os.environ.update(json.loads(process.stdout.readline()))
+
+    import pymongo
+    client = pymongo.MongoClient(os.environ['MONGO_URI'])
+    _seed(lambda name, docs: client[DB_NAME][name].insert_many(docs), args.seed_items)
+    stats_url = urllib.parse.urljoin(os.environ['LLM_API_URL'], '/stats')
+
+    def stats():
+        with urllib.request.urlopen(stats_url) as response:
+            calls = json.load(response)['calls']
+        return f"upstream calls: {calls}, mongo commands: {client.admin.command('fakeStats')['commands']}"
+    return stats
+
+def _seed(insert, count):
+    """History of `count` todos and notes (bench-todo-<n>, bench-note-<n>), newest first by n."""
+    start = datetime.datetime(2026, 1, 1)
+    for item_type, text in (('todo', 'Buy milk and coffee'), ('note', 'The door code is')):
+        docs = []
+        for i in range(count):
+            created_at = (start - datetime.timedelta(minutes=i)).isoformat()
+            doc = {'id': f'bench-{item_type}-{i}', 'text': f'{text} {i}', 'created_at': created_at, 'updated_at': created_at}
+            if item_type == 'todo':
+                doc.update(priority='medium', status='pending')
+            docs.append(doc)
+        insert(f'{item_type}s', docs)
+    insert('keywords', [{'id': 'bench-keyword', 'key': 'home', 'value': 'Mannerheimintie 1, Helsinki'}])
+
+def _wav_base64(seconds, seed):
+    import base64
+    pcm = random.Random(seed).randbytes(seconds * 16000 * 2)
+    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(pcm), b'WAVE', b'fmt ', 16, 1, 1, 16000, 32000, 2, 16, b'data', len(pcm))
+    return base64.b64encode(header + pcm).decode('ascii')
+
+def load_routes(path, names=None):
+    with open(path) as f:
+        spec = json.load(f)
+    routes = spec['routes']
+    if names:
+        unknown = set(names) - set(routes)
+        if unknown:
+            raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}")
+        routes = {name: routes[name] for name in names}
+    return routes, spec.get('audio_seconds', 3)
+
+def render(name, template, n, since, audio_seconds):
+    """Fills the placeholders of an event template; each request gets its own audio clip."""
+    text = json.dumps(template).replace('{n}', str(n)).replace('{since}', since)
+    if '{audio}' in text:
+        text = text.replace('{audio}', _wav_base64(audio_seconds, f'{name}-{n}'))
+    event = json.loads(text)
+    if isinstance(event.get('body'), dict):
+        event['body'] = json.dumps(event['body'])
+    return event
+
+def _invoke(handler, event):
+    start = time.perf_counter()
+    response = handler.handler(event, None)
+    return (time.perf_counter() - start) * 1000, response.get('statusCode')
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+def run_warm(args, routes, audio_seconds):
+    import handler
+    since = datetime.datetime.utcnow().isoformat(timespec='microseconds')
+    counters = {name: 0 for name in routes}
+
+    def next_event(name):
+        counters[name] += 1
+        return render(name, routes[name]['event'], counters[name], since, audio_seconds)
+
+    # One untimed pass so every route's imports, indexes and caches are warm
+    for name in routes:
+        _invoke(handler, next_event(name))
+
+    rng = random.Random(args.seed)
+    names = list(routes)
+    schedule = rng.choices(names, weights=[routes[name]['weight'] for name in names], k=args.requests)
+    events = [(name, next_event(name)) for name in schedule]
+
+    results = {name: {'ms': [], 'errors': 0} for name in routes}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        timings = list(executor.map(lambda item: (item[0],) + _invoke(handler, item[1]), events))
+    wall = time.perf_counter() - start
+    for name, ms, status in timings:
+        results[name]['ms'].append(ms)
+        if status is None or status >= 400:
+            results[name]['errors'] += 1
+
+    # Allocation pass, sequential and untimed: tracemalloc slows every allocation down
+    tracemalloc.start()
+    for name in routes:
+        peaks, blocks = [], []
+        for _ in range(args.alloc_requests):
+            event = next_event(name)
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            allocated = sys.getallocatedblocks()
+            handler.handler(event, None)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            blocks.append(sys.getallocatedblocks() - allocated)
+        results[name]['peak_kb'] = percentile(peaks, 50) / 1024
+        results[name]['retained_blocks'] = sum(blocks) / len(blocks)
+    tracemalloc.stop()
+    return results, args.requests / wall
+
+def cold_child(args):
+    """Runs in a fresh interpreter: times `import handler` plus its first invocation."""
+    _configure(args)
+    routes, audio_seconds = load_routes(args.events, [args.cold_child])
+    event = render(args.cold_child, routes[args.cold_child]['event'], 1, datetime.datetime.utcnow().isoformat(), audio_seconds)
+    start = time.perf_counter()
+    import handler
+    imported = time.perf_counter()
+    handler.handler(event, None)
+    done = time.perf_counter()
+    print(json.dumps({'import_ms': (imported - start) * 1000, 'first_ms': (done - imported) * 1000}))
+
+def run_cold(args, routes):
+    results = {}
+    for name in routes:
+        samples = []
+        for _ in range(args.cold_runs):
+            command = [
+                sys.executable, os.path.abspath(__file__), '--cold-child', name, '--events', args.events, '--services', args.services,
+                '--llm-ms', str(args.llm_ms), '--stt-ms', str(args.stt_ms), '--mongo-ms', str(args.mongo_ms),
+                '--seed-items', str(args.seed_items)
+            ]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            samples.append(sample['import_ms'] + sample['first_ms'])
+        results[name] = percentile(samples, 50)
+    return results
+
+def summarize(results, throughput, cold):
+    routes = {}
+    for name, result in results.items():
+        ms = result['ms']
+        routes[name] = {
+            'requests': len(ms),
+            'errors': result['errors'],
+            'p50_ms': _round(percentile(ms, 50) if ms else None),
+            'p95_ms': _round(percentile(ms, 95) if ms else None),
+            'p99_ms': _round(percentile(ms, 99) if ms else None),
+            'cold_ms': _round(cold.get(name)),
+            'peak_kb': _round(result['peak_kb']),
+            'retained_blocks': _round(result['retained_blocks']),
+        }
+    return {'throughput_rps': _round(throughput), 'routes': routes}
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+def print_report(summary):
+    columns = ('requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'cold_ms', 'peak_kb', 'retained_blocks')
+    print(f"{'route':<18}" + ''.join(f"{column:>16}" for column in columns))
+    for name, route in summary['routes'].items():
+        cells = []
+        for column in columns:
+            value = route[column]
+            cells.append(f"{'-' if value is None else (f'{value:.1f}' if isinstance(value, float) else value):>16}")
+        print(f"{name:<18}" + ''.join(cells))
+    print(f"throughput: {summary['throughput_rps']:.1f} requests/s")
+
+def _regressed(current, baseline, tolerance, slack):
+    return current is not None and baseline is not None and current > baseline * (1 + tolerance) + slack
+
+def compare(summary, baseline, tolerance):
+    """Returns a list of regressions against the baseline run."""
+    failures = []
+    for name, route in summary['routes'].items():
+        base = baseline['routes'].get(name)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'cold_ms', 'peak_kb'):
+            if route['requests'] < MIN_REQUESTS.get(metric, 0):
+                continue
+            slack = SLACK['kb'] if metric.endswith('_kb') else SLACK.get(metric, SLACK['ms'])
+            if _regressed(route[metric], base.get(metric), tolerance * TOLERANCE_SCALE.get(metric, 1), slack):
+                failures.append(f"{name} {metric}: {route[metric]:.1f} vs baseline {base[metric]:.1f}")
+        if route['errors'] > base.get('errors', 0):
+            failures.append(f"{name} errors: {route['errors']} vs baseline {base.get('errors', 0)}")
+    if summary['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        failures.append(f"throughput: {summary['throughput_rps']:.1f} vs baseline {baseline['throughput_rps']:.1f} requests/s")
+    return failures
+
+def _config(args):
+    return {
+        'services': args.services, 'llm_ms': args.llm_ms, 'stt_ms': args.stt_ms, 'mongo_ms': args.mongo_ms, 'jitter': JITTER,
+        'requests': args.requests, 'concurrency': args.concurrency, 'seed_items': args.seed_items
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test for handler.handler against local stand-ins')
+    parser.add_argument('--services', choices=('inprocess', 'wire'), default='inprocess')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--llm-ms', type=float, default=40.0)
+    parser.add_argument('--stt-ms', type=float, default=80.0)
+    parser.add_argument('--mongo-ms', type=float, default=2.0)
+    parser.add_argument('--seed-items', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--routes', help='comma-separated subset of the routes in the events file')
+    parser.add_argument('--events', default=EVENTS_FILE)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--alloc-requests', type=int, default=10)
+    parser.add_argument('--baseline', help='baseline file (default: bench_baseline.json, bench_baseline_wire.json with --services wire)')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression (default 0.25)')
+    parser.add_argument('--cold-child', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cold_child:
+        cold_child(args)
+        return 0
+
+    args.baseline = args.baseline or BASELINE_FILES[args.services]
+    routes, audio_seconds = load_routes(args.events, args.routes.split(',') if args.routes else None)
+    services_stats = _start_services(args) if args.services == 'wire' else None
+    cold = run_cold(args, routes) if args.cold_runs > 0 else {}
+    services_stats = _configure(args) or services_stats
+    results, throughput = run_warm(args, routes, audio_seconds)
+    summary = summarize(results, throughput, cold)
+    print_report(summary)
+    print(services_stats())
+
+    config = _config(args)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(summary, config=config), f, indent=2)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print(f"Baseline was recorded with {baseline.get('config')}, not compared")
+        return 0
+    failures = compare(summary, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if not failures:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import io
+import sys
+import json
+import time
+import random
+import contextlib
+import threading
+import importlib.abc
+import importlib.machinery
+
+from fake_services import openai_stub
+from fake_services import store
+
+# In-process stand-ins for the LLM, STT and MongoDB used by bench_handler.py.
+# They replace `utils.http_pool._pool` and `database.client`, so everything above those
+# (handler routing, tracing, services, database functions, response encoding) runs for real,
+# and sleep for a configurable, jittered latency instead of calling the network. Answers and
+# query semantics are those of fake_services, whose wire-level servers cover the layers below.
+
+class Latency:
+    """Injected per-call latency in milliseconds, +/- `jitter` (a fraction of it)."""
+    def __init__(self, llm_ms=40.0, stt_ms=80.0, mongo_ms=2.0, jitter=0.1):
+        self.llm_ms = llm_ms
+        self.stt_ms = stt_ms
+        self.mongo_ms = mongo_ms
+        self.jitter = jitter
+
+    def sleep(self, ms):
+        if ms > 0:
+            time.sleep(ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+# --- LLM / STT ---
+
+class _Response:
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.reason = 'OK'
+        self.headers = {}
+        self.data = json.dumps(payload).encode('utf-8')
+
+    def json(self):
+        return json.loads(self.data)
+
+class StandInPool:
+    """Answers `utils.http_pool` requests for the chat, transcription and embeddings endpoints."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {'chat': 0, 'transcriptions': 0, 'embeddings': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        if 'transcriptions' in url:
+            self._count('transcriptions')
+            # Consume the multipart body the way the socket would
+            for _ in body:
+                pass
+            self.latency.sleep(self.latency.stt_ms)
+            # Distinct per clip, as real dictations are, so the intent cache does not serve them all
+            return _Response({'text': f"{openai_stub.STT_TRANSCRIPT} {self.calls['transcriptions']}"})
+        if 'embeddings' in url:
+            self._count('embeddings')
+            texts = json.loads(body)['input']
+            self.latency.sleep(self.latency.llm_ms / 4)
+            return _Response({'data': [{'index': i, 'embedding': openai_stub.embedding(text)} for i, text in enumerate(texts)]})
+        self._count('chat')
+        content = openai_stub.chat_content(json.loads(body))
+        self.latency.sleep(self.latency.llm_ms)
+        return _Response({'choices': [{'message': {'content': content}}]})
+
+    @contextlib.contextmanager
+    def stream(self, method, url, body=None, headers=None, timeout=None):
+        self._count('chat')
+        content = openai_stub.chat_content(json.loads(body))
+        self.latency.sleep(self.latency.llm_ms)
+        events = [
+            b'data: ' + json.dumps({'choices': [{'delta': {'content': piece}}]}).encode('utf-8') + b'\n\n'
+            for piece in openai_stub.tokens(content)
+        ]
+        yield io.BytesIO(b''.join(events) + b'data: [DONE]\n\n')
+
+    def stats(self):
+        return dict(self.calls)
+
+# --- MongoDB ---
+
+class _Result:
+    def __init__(self, inserted=0, deleted=0, matched=0, upserted=0):
+        self.inserted_count = inserted
+        self.deleted_count = deleted
+        self.matched_count = matched
+        self.modified_count = matched
+        self.upserted_count = upserted
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        # pymongo takes one key and direction, or a list of (key, direction) pairs
+        self._sort = list(key) if isinstance(key, (list, tuple)) else [(key, direction)]
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        self._collection._op()
+        return iter(self._collection.documents.find(self._query, self._projection, sort=self._sort, limit=self._limit))
+
+class FakeCollection:
+    """The pymongo Collection methods `database.py` calls, over a `fake_services.store` collection."""
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = store.Collection(name)
+
+    def _op(self):
+        # One round trip per operation
+        self.database.client.operation()
+
+    def seed(self, docs):
+        """Loads documents without the injected latency."""
+        self.documents.insert(docs)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def create_indexes(self, specs):
+        self._op()
+
+    def insert_one(self, doc):
+        return self.insert_many([doc])
+
+    def insert_many(self, docs, ordered=True):
+        self._op()
+        # pymongo sets _id on the caller's documents
+        for doc, doc_id in zip(docs, self.documents.insert(docs)):
+            doc['_id'] = doc_id
+        return _Result(inserted=len(docs))
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, query, projection)
+
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query, projection).limit(1)), None)
+
+    def delete_one(self, query):
+        self._op()
+        return _Result(deleted=self.documents.delete(query))
+
+    def delete_many(self, query):
+        self._op()
+        return _Result(deleted=self.documents.delete(query, many=True))
+
+    def update_one(self, query, update, upsert=False):
+        self._op()
+        matched, upserted_id = self.documents.update(query, update, upsert)
+        return _Result(matched=matched, upserted=int(upserted_id is not None))
+
+    def bulk_write(self, requests, ordered=True):
+        self._op()
+        counts = {'deleted': 0, 'matched': 0, 'upserted': 0}
+        for request in requests:
+            if hasattr(request, '_doc'):
+                matched, upserted_id = self.documents.update(request._filter, request._doc, request._upsert)
+                counts['matched'] += matched
+                counts['upserted'] += int(upserted_id is not None)
+            else:
+                counts['deleted'] += self.documents.delete(request._filter)
+        return _Result(**counts)
+
+    def estimated_document_count(self):
+        self._op()
+        return len(self.documents)
+
+    def count_documents(self, query):
+        self._op()
+        return self.documents.count(query)
+
+class FakeDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        with self.client.lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def command(self, name, *args, **kwargs):
+        self.client.operation()
+        return {'ok': 1.0}
+
+class FakeClient:
+    """Stands in for `pymongo.MongoClient`; every operation waits `latency.mongo_ms`."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.operations = 0
+        self._databases = {}
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self._databases:
+                self._databases[name] = FakeDatabase(self, name)
+            return self._databases[name]
+
+    def operation(self):
+        from utils import tracing
+        with self.lock:
+            self.operations += 1
+        start = time.perf_counter()
+        self.latency.sleep(self.latency.mongo_ms)
+        # What the real CommandListener reports as server time
+        tracing.record('mongo', (time.perf_counter() - start) * 1000)
+
+# --- Installation ---
+
+class _PatchOnImport(importlib.abc.MetaPathFinder):
+    """Applies a patch right after a module is first imported, so lazy imports stay lazy."""
+    def __init__(self, patches):
+        self.patches = patches
+
+    def find_spec(self, name, path, target=None):
+        if name not in self.patches:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec is None:
+            return None
+        exec_module = spec.loader.exec_module
+        patch = self.patches[name]
+
+        def exec_and_patch(module):
+            exec_module(module)
+            patch(module)
+
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+def install(latency):
+    """
+    Routes upstream HTTP calls and MongoDB operations to the stand-ins. Modules that are
+    already imported are patched now, the rest when the handler first imports them.
+    Returns (pool, client) for their call counters.
+    """
+    pool = StandInPool(latency)
+    client = FakeClient(latency)
+
+    def patch_pool(module):
+        module._pool = pool
+
+    def patch_database(module):
+        module.client = client
+
+    patches = {'utils.http_pool': patch_pool, 'database': patch_database}
+    for name, patch in list(patches.items()):
+        if name in sys.modules:
+            patch(sys.modules[name])
+            del patches[name]
+    if patches:
+        sys.meta_path.insert(0, _PatchOnImport(patches))
+    return pool, client
@@ -0,0 +1,4 @@
+# Local stand-ins for the backend's external services, for tests and benchmarks that should
+# exercise the real client code paths: `mongod.FakeMongod` (MongoDB wire protocol) and
+# `openai_stub.FakeOpenAI` (chat completions, transcriptions, embeddings over HTTP).
+# Needs backend/ on the path for the vendored bson/pymongo.
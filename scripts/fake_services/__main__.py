@@ -0,0 +1,44 @@
+import sys
+import json
+import signal
+import argparse
+
+from fake_services.mongod import FakeMongod
+from fake_services.openai_stub import FakeOpenAI
+
+# usage: PYTHONPATH=backend:scripts python3 -m fake_services [--mongo-port P] [--openai-port P]
+#                                   [--mongo-ms MS] [--llm-ms MS] [--token-ms MS] [--stt-ms MS]
+# Runs the fake mongod and the OpenAI-compatible stub until interrupted. The first line of
+# output is a JSON object of the environment variables that point the backend at them.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local MongoDB and LLM/STT stand-ins')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--mongo-port', type=int, default=0)
+    parser.add_argument('--openai-port', type=int, default=0)
+    parser.add_argument('--mongo-ms', type=float, default=0.0)
+    parser.add_argument('--llm-ms', type=float, default=40.0)
+    parser.add_argument('--token-ms', type=float, default=0.0)
+    parser.add_argument('--stt-ms', type=float, default=80.0)
+    parser.add_argument('--embedding-ms', type=float, default=10.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    mongod = FakeMongod(args.host, args.mongo_port, latency_ms=args.mongo_ms, jitter=args.jitter).start()
+    openai = FakeOpenAI(
+        args.host, args.openai_port, chat_ms=args.llm_ms, token_ms=args.token_ms,
+        stt_ms=args.stt_ms, embedding_ms=args.embedding_ms, jitter=args.jitter
+    ).start()
+    print(json.dumps(dict(mongod.environ(), **openai.environ())), flush=True)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        signal.pause()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        mongod.stop()
+        openai.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+import time
+import struct
+import random
+import datetime
+import threading
+import socketserver
+
+import bson
+from bson import CodecOptions
+from bson.int64 import Int64
+from pymongo import message
+
+from fake_services.store import Store, matches
+
+# Wire-protocol fake of a standalone mongod: speaks OP_MSG (and the legacy OP_QUERY/OP_REPLY
+# pymongo uses for the first hello on each connection) with the message structures of the
+# vendored pymongo/message.py, and serves the commands `database.py` issues from the
+# in-memory store. A real pymongo client therefore does its full serialization, connection
+# pool and server monitoring work against it.
+
+OP_QUERY = 2004
+_HEADER = struct.Struct('<iiii')
+_INT32 = struct.Struct('<i')
+_OP_QUERY_PREFIX = struct.Struct('<i')
+_OP_QUERY_COUNTS = struct.Struct('<ii')
+_OP_MSG_FLAGS = struct.Struct('<I')
+# responseFlags, cursorID, startingFrom, numberReturned: what _OpReply unpacks
+_OP_REPLY_FIELDS = struct.Struct('<iqii')
+
+_CODEC_OPTIONS = CodecOptions()
+# Commands that are not charged the injected latency (topology monitoring and handshakes)
+_UNTIMED = {'hello', 'ismaster', 'ping', 'endsessions'}
+
+class CommandError(Exception):
+    def __init__(self, code, code_name, errmsg):
+        super().__init__(errmsg)
+        self.code = code
+        self.code_name = code_name
+
+def _c_string(data, offset):
+    end = data.index(b'\x00', offset)
+    return data[offset:end].decode('utf-8'), end + 1
+
+def parse_op_msg(body):
+    """Returns (flags, command) with each type-1 document sequence merged into the command."""
+    flags = _OP_MSG_FLAGS.unpack_from(body)[0]
+    end = len(body) - (4 if flags & message._OpMsg.CHECKSUM_PRESENT else 0)
+    offset = _OP_MSG_FLAGS.size
+    command, sequences = None, {}
+    while offset < end:
+        kind = body[offset]
+        offset += 1
+        size = _INT32.unpack_from(body, offset)[0]
+        if kind == 0:
+            command = bson.decode(body[offset:offset + size], _CODEC_OPTIONS)
+        elif kind == 1:
+            identifier, docs_offset = _c_string(body, offset + 4)
+            sequences[identifier] = bson.decode_all(body[docs_offset:offset + size], _CODEC_OPTIONS)
+        else:
+            raise CommandError(2, 'BadValue', f'Unknown OP_MSG section kind {kind}')
+        offset += size
+    command.update(sequences)
+    return flags, command
+
+def parse_op_query(body):
+    """Returns (database name, command) of a legacy `<db>.$cmd` query."""
+    offset = _OP_QUERY_PREFIX.size
+    namespace, offset = _c_string(body, offset)
+    offset += _OP_QUERY_COUNTS.size
+    size = _INT32.unpack_from(body, offset)[0]
+    command = bson.decode(body[offset:offset + size], _CODEC_OPTIONS)
+    # Commands may come wrapped for read preferences
+    command = command.get('$query', command)
+    return namespace.split('.', 1)[0], command
+
+def op_msg_reply(response_to, document):
+    data, _, _ = message._op_msg_no_header(0, document, '', None, _CODEC_OPTIONS)
+    return _HEADER.pack(_HEADER.size + len(data), random.randint(0, 2 ** 31 - 1), response_to, message._OpMsg.OP_CODE) + data
+
+def op_reply(response_to, document):
+    data = _OP_REPLY_FIELDS.pack(0, 0, 0, 1) + bson.encode(document, codec_options=_CODEC_OPTIONS)
+    return _HEADER.pack(_HEADER.size + len(data), random.randint(0, 2 ** 31 - 1), response_to, message._OpReply.OP_CODE) + data
+
+class _Connection(socketserver.BaseRequestHandler):
+    def _recv(self, size):
+        chunks, remaining = [], size
+        while remaining:
+            chunk = self.request.recv(remaining)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def handle(self):
+        mongod = self.server.mongod
+        connection_id = mongod._next_connection_id()
+        while True:
+            header = self._recv(_HEADER.size)
+            if header is None:
+                return
+            length, request_id, _, op_code = _HEADER.unpack(header)
+            body = self._recv(length - _HEADER.size)
+            if body is None:
+                return
+            if op_code == message._OpMsg.OP_CODE:
+                flags, command = parse_op_msg(body)
+                reply = mongod.run_command(command.get('$db', 'admin'), command, connection_id)
+                if flags & message._OpMsg.MORE_TO_COME:
+                    # Unacknowledged write: the client expects no answer
+                    continue
+                self.request.sendall(op_msg_reply(request_id, reply))
+            elif op_code == OP_QUERY:
+                db_name, command = parse_op_query(body)
+                self.request.sendall(op_reply(request_id, mongod.run_command(db_name, command, connection_id)))
+            else:
+                # OP_COMPRESSED and the removed legacy opcodes are not negotiated by the fake
+                return
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class FakeMongod:
+    """
+    Local wire-level mongod on `port` (0 picks a free one), backed by an in-memory Store.
+    Every command except handshakes and pings waits `latency_ms` (+/- `jitter`) before its
+    reply. Indexes are accepted but not enforced. Point the backend at it with `environ()`.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter=0.0, store=None):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.store = store or Store(id_factory=bson.ObjectId)
+        self._server = _Server((host, port), _Connection)
+        self._server.mongod = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._commands = {}
+        self._indexes = {}
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    @property
+    def uri(self):
+        host, port = self.address
+        return f'mongodb://{host}:{port}/?directConnection=true'
+
+    def environ(self):
+        return {'MONGO_URI': self.uri}
+
+    def _next_connection_id(self):
+        with self._lock:
+            self._connections += 1
+            return self._connections
+
+    def stats(self):
+        with self._lock:
+            return {'connections': self._connections, 'commands': dict(self._commands)}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-mongod', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def run_command(self, db_name, command, connection_id=0):
+        name = next(iter(command))
+        with self._lock:
+            self._commands[name] = self._commands.get(name, 0) + 1
+        if name.lower() not in _UNTIMED and self.latency_ms > 0:
+            time.sleep(self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+        handler = getattr(self, f'_cmd_{name.lower()}', None)
+        if handler is None:
+            return {'ok': 0.0, 'errmsg': f"no such command: '{name}'", 'code': 59, 'codeName': 'CommandNotFound'}
+        try:
+            return dict(handler(db_name, command, connection_id), ok=1.0)
+        except CommandError as e:
+            return {'ok': 0.0, 'errmsg': str(e), 'code': e.code, 'codeName': e.code_name}
+
+    def _collection(self, db_name, command, name_field):
+        return self.store.collection(db_name, command[name_field])
+
+    @staticmethod
+    def _cursor(db_name, collection_name, docs):
+        # Every result fits the first batch, so no cursor is left open
+        return {'cursor': {'firstBatch': docs, 'id': Int64(0), 'ns': f'{db_name}.{collection_name}'}}
+
+    # --- Handshake and administration ---
+
+    def _cmd_hello(self, db_name, command, connection_id):
+        # No topologyVersion: the client then polls instead of streaming (awaitable) hellos
+        return {
+            'helloOk': True,
+            'ismaster': True,
+            'isWritablePrimary': True,
+            'maxBsonObjectSize': 16 * 1024 * 1024,
+            'maxMessageSizeBytes': 48000000,
+            'maxWriteBatchSize': 100000,
+            'localTime': datetime.datetime.now(datetime.timezone.utc),
+            'logicalSessionTimeoutMinutes': 30,
+            'connectionId': connection_id,
+            'minWireVersion': 0,
+            'maxWireVersion': 17,
+            'readOnly': False,
+        }
+
+    _cmd_ismaster = _cmd_hello
+
+    def _cmd_fakestats(self, db_name, command, connection_id):
+        # Lets a client in another process read the command counts
+        return self.stats()
+
+    def _cmd_ping(self, db_name, command, connection_id):
+        return {}
+
+    def _cmd_buildinfo(self, db_name, command, connection_id):
+        return {'version': '6.0.0', 'versionArray': [6, 0, 0, 0]}
+
+    def _cmd_endsessions(self, db_name, command, connection_id):
+        return {}
+
+    def _cmd_killcursors(self, db_name, command, connection_id):
+        return {'cursorsKilled': [], 'cursorsNotFound': command.get('cursors', []), 'cursorsAlive': [], 'cursorsUnknown': []}
+
+    def _cmd_getmore(self, db_name, command, connection_id):
+        raise CommandError(43, 'CursorNotFound', f"cursor id {command['getMore']} not found")
+
+    def _cmd_createindexes(self, db_name, command, connection_id):
+        with self._lock:
+            indexes = self._indexes.setdefault((db_name, command['createIndexes']), {})
+            before = len(indexes) + 1
+            for index in command['indexes']:
+                indexes[index['name']] = index
+            after = len(indexes) + 1
+        return {'numIndexesBefore': before, 'numIndexesAfter': after, 'createdCollectionAutomatically': False}
+
+    def _cmd_listindexes(self, db_name, command, connection_id):
+        with self._lock:
+            indexes = list(self._indexes.get((db_name, command['listIndexes']), {}).values())
+        docs = [{'v': 2, 'key': {'_id': 1}, 'name': '_id_'}] + [dict(index, v=2) for index in indexes]
+        return self._cursor(db_name, command['listIndexes'], docs)
+
+    def _cmd_listcollections(self, db_name, command, connection_id):
+        docs = [{'name': name, 'type': 'collection'} for name in self.store.collection_names(db_name)]
+        return self._cursor(db_name, '$cmd.listCollections', docs)
+
+    # --- CRUD ---
+
+    def _cmd_find(self, db_name, command, connection_id):
+        collection = self._collection(db_name, command, 'find')
+        docs = collection.find(
+            command.get('filter'),
+            command.get('projection'),
+            sort=list((command.get('sort') or {}).items()),
+            skip=command.get('skip', 0),
+            limit=command.get('limit', 0)
+        )
+        return self._cursor(db_name, command['find'], docs)
+
+    def _cmd_insert(self, db_name, command, connection_id):
+        collection = self._collection(db_name, command, 'insert')
+        return {'n': len(collection.insert(command.get('documents', [])))}
+
+    def _cmd_delete(self, db_name, command, connection_id):
+        collection = self._collection(db_name, command, 'delete')
+        return {'n': sum(collection.delete(spec['q'], many=spec.get('limit', 0) == 0) for spec in command.get('deletes', []))}
+
+    def _cmd_update(self, db_name, command, connection_id):
+        collection = self._collection(db_name, command, 'update')
+        matched, upserted = 0, []
+        for index, spec in enumerate(command.get('updates', [])):
+            count, upserted_id = collection.update(spec['q'], spec['u'], upsert=spec.get('upsert', False), many=spec.get('multi', False))
+            matched += count
+            if upserted_id is not None:
+                upserted.append({'index': index, '_id': upserted_id})
+        reply = {'n': matched + len(upserted), 'nModified': matched}
+        if upserted:
+            reply['upserted'] = upserted
+        return reply
+
+    def _cmd_count(self, db_name, command, connection_id):
+        return {'n': self._collection(db_name, command, 'count').count(command.get('query'))}
+
+    def _cmd_aggregate(self, db_name, command, connection_id):
+        # Enough for count_documents: $match, $skip, $limit and a counting $group
+        collection = self._collection(db_name, command, 'aggregate')
+        docs = collection.find()
+        for stage in command['pipeline']:
+            (operator, spec), = stage.items()
+            if operator == '$match':
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif operator == '$skip':
+                docs = docs[spec:]
+            elif operator == '$limit':
+                docs = docs[:spec]
+            elif operator == '$group' and all(value == {'$sum': 1} for key, value in spec.items() if key != '_id'):
+                docs = [dict({'_id': spec['_id']}, **{key: len(docs) for key in spec if key != '_id'})] if docs else []
+            else:
+                raise CommandError(2, 'BadValue', f'Unsupported aggregation stage {operator}')
+        return self._cursor(db_name, command['aggregate'], docs)
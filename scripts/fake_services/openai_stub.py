@@ -0,0 +1,177 @@
+import re
+import json
+import time
+import random
+import threading
+import http.server
+
+# OpenAI-compatible HTTP stub for the chat completions (JSON or server-sent events),
+# audio transcriptions and embeddings endpoints the backend calls through utils/http_pool.
+# Keep-alive HTTP/1.1, so the connection pool is exercised as against the real API.
+
+STT_TRANSCRIPT = "Todo buy oat milk and coffee tomorrow"
+
+_NOTE_WORDS = re.compile(r'\b(note|muistiinpano|muista että)\b', re.IGNORECASE)
+_SPLIT = re.compile(r',\s*|\s+and then\s+|\s+ja sitten\s+', re.IGNORECASE)
+
+def _intent_for(command):
+    title = re.sub(r'^(todo|note)\s+', '', command.strip(), flags=re.IGNORECASE)
+    if _NOTE_WORDS.search(command):
+        return {'intent': 'NOTE', 'title': title}
+    return {'intent': 'TODO', 'title': title, 'priority': 'high' if 'high priority' in command.lower() else 'medium'}
+
+def chat_content(body):
+    """The model output for a chat completion request: one intent, or {"intents": [...]} for batch prompts."""
+    messages = body['messages']
+    command = messages[-1]['content'].rsplit('Command: ', 1)[-1]
+    if '"intents"' in messages[0]['content']:
+        return json.dumps({'intents': [_intent_for(part) for part in _SPLIT.split(command) if part.strip()]})
+    return json.dumps(_intent_for(command))
+
+def embedding(text, dims=32):
+    rng = random.Random(text)
+    return [rng.uniform(-1, 1) for _ in range(dims)]
+
+def tokens(content, size=4):
+    """Roughly token-sized pieces of the content, as a streamed completion delivers it."""
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+def _sleep_ms(ms, jitter):
+    if ms > 0:
+        time.sleep(ms * random.uniform(1 - jitter, 1 + jitter) / 1000)
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self._send_json(self.server.stub.stats())
+        self._send_json({'error': {'message': f'unknown path {self.path}'}}, 404)
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self._read_body()
+        stub._count(self.path, len(body))
+        if stub.status != 200:
+            # Fault injection: every call fails with this status
+            return self._send_json({'error': {'message': 'injected failure'}}, stub.status)
+        if self.path.endswith('/audio/transcriptions'):
+            if b'name="file"' not in body:
+                return self._send_json({'error': {'message': 'file is required'}}, 400)
+            _sleep_ms(stub.stt_ms, stub.jitter)
+            return self._send_json({'text': stub.transcript})
+        if self.path.endswith('/embeddings'):
+            texts = json.loads(body)['input']
+            _sleep_ms(stub.embedding_ms, stub.jitter)
+            return self._send_json({'data': [{'index': i, 'embedding': embedding(text)} for i, text in enumerate(texts)]})
+        if self.path.endswith('/chat/completions'):
+            request = json.loads(body)
+            content = stub.chat(request)
+            _sleep_ms(stub.chat_ms, stub.jitter)
+            if request.get('stream'):
+                return self._stream(content)
+            return self._send_json({'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}]})
+        self._send_json({'error': {'message': f'unknown path {self.path}'}}, 404)
+
+    def _stream(self, content):
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, piece in enumerate(tokens(content)):
+            if index:
+                _sleep_ms(stub.token_ms, stub.jitter)
+            self._write_chunk(b'data: ' + json.dumps({'choices': [{'index': 0, 'delta': {'content': piece}}]}).encode('utf-8') + b'\n\n')
+        self._write_chunk(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+class FakeOpenAI:
+    """
+    Serves /v1/chat/completions, /v1/audio/transcriptions and /v1/embeddings on a local
+    port. Each call waits `chat_ms` / `stt_ms` / `embedding_ms` (+/- `jitter`), and a streamed
+    completion then sends one delta per ~4 characters every `token_ms`. The chat answer
+    comes from `chat(request_body)`, by default an intent guessed from the command.
+    Setting `status` makes every call fail with that HTTP status. GET /stats returns the
+    call counts.
+    """
+    def __init__(self, host='127.0.0.1', port=0, chat_ms=40.0, token_ms=0.0, stt_ms=80.0, embedding_ms=10.0,
+                 jitter=0.0, transcript=STT_TRANSCRIPT, chat=chat_content):
+        self.chat_ms = chat_ms
+        self.token_ms = token_ms
+        self.stt_ms = stt_ms
+        self.embedding_ms = embedding_ms
+        self.jitter = jitter
+        self.transcript = transcript
+        self.chat = chat
+        self.status = 200
+        self._server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'calls': {}, 'bytes_in': 0}
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def environ(self):
+        """Environment variables pointing the backend's LLM, STT and embedding calls here."""
+        return {
+            'LLM_API_URL': f'{self.base_url}/chat/completions',
+            'SCALEWAY_API_URL': f'{self.base_url}/audio/transcriptions',
+            'EMBEDDING_API_URL': f'{self.base_url}/embeddings',
+        }
+
+    def _count(self, path, size):
+        with self._lock:
+            self._stats['calls'][path] = self._stats['calls'].get(path, 0) + 1
+            self._stats['bytes_in'] += size
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self._stats['calls']), 'bytes_in': self._stats['bytes_in']}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
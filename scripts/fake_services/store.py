@@ -0,0 +1,161 @@
+import itertools
+import threading
+
+# In-memory document store behind the fake mongod and the bench's in-process MongoDB
+# stand-in. Implements the subset of MongoDB query and update semantics `database.py` uses.
+# Indexes are accepted but not built or enforced (no unique-key errors).
+
+_MISSING = object()
+
+def _compare(value, operator, operand):
+    if operator == '$exists':
+        return (value is not _MISSING) == bool(operand)
+    if operator == '$in':
+        return value in operand
+    if operator == '$ne':
+        return value != operand
+    if value is _MISSING or value is None:
+        return False
+    if operator == '$lt':
+        return value < operand
+    if operator == '$lte':
+        return value <= operand
+    if operator == '$gt':
+        return value > operand
+    if operator == '$gte':
+        return value >= operand
+    raise NotImplementedError(f"Fake MongoDB does not support {operator}")
+
+def matches(doc, query):
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+            continue
+        if key == '$and':
+            if not all(matches(doc, branch) for branch in condition):
+                return False
+            continue
+        value = doc.get(key, _MISSING)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+def project(doc, projection):
+    if not projection:
+        return dict(doc)
+    included = [key for key, flag in projection.items() if flag and key != '_id']
+    if included:
+        result = {key: doc[key] for key in included if key in doc}
+        if projection.get('_id', 1) and '_id' in doc:
+            result['_id'] = doc['_id']
+        return result
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+def _apply_update(doc, update):
+    if not any(key.startswith('$') for key in update):
+        # Replacement document
+        replaced = {'_id': doc['_id']} if '_id' in doc else {}
+        replaced.update(update)
+        doc.clear()
+        doc.update(replaced)
+        return
+    doc.update(update.get('$set', {}))
+    for key, amount in update.get('$inc', {}).items():
+        doc[key] = doc.get(key, 0) + amount
+    for key in update.get('$unset', {}):
+        doc.pop(key, None)
+
+def _sort_key(value):
+    # Missing and null values sort first, as in MongoDB
+    return (0, 0) if value is None else (1, value)
+
+class Collection:
+    def __init__(self, name, id_factory=None):
+        self.name = name
+        self._docs = []
+        self._lock = threading.Lock()
+        self._new_id = id_factory or itertools.count(1).__next__
+
+    def __len__(self):
+        return len(self._docs)
+
+    def insert(self, docs):
+        """Stores copies of `docs`, giving each an _id if it has none. Returns their _ids."""
+        ids = []
+        with self._lock:
+            for doc in docs:
+                doc = dict(doc)
+                doc.setdefault('_id', self._new_id())
+                self._docs.append(doc)
+                ids.append(doc['_id'])
+        return ids
+
+    def find(self, query=None, projection=None, sort=None, skip=0, limit=0):
+        """Matching documents (copies), `sort` being [(field, 1 | -1), ...]."""
+        with self._lock:
+            docs = [doc for doc in self._docs if matches(doc, query)]
+        # Stable sorts from the last key to the first give the compound order
+        for key, direction in reversed(list(sort or [])):
+            docs.sort(key=lambda doc: _sort_key(doc.get(key)), reverse=direction < 0)
+        docs = docs[skip:]
+        if limit:
+            docs = docs[:abs(limit)]
+        return [project(doc, projection) for doc in docs]
+
+    def count(self, query=None):
+        if not query:
+            return len(self._docs)
+        with self._lock:
+            return sum(1 for doc in self._docs if matches(doc, query))
+
+    def delete(self, query, many=False):
+        """Deletes the first match, or every match with `many`. Returns the number deleted."""
+        with self._lock:
+            kept, deleted = [], 0
+            for doc in self._docs:
+                if (many or not deleted) and matches(doc, query):
+                    deleted += 1
+                else:
+                    kept.append(doc)
+            self._docs = kept
+        return deleted
+
+    def update(self, query, update, upsert=False, many=False):
+        """Returns (matched, upserted _id or None)."""
+        with self._lock:
+            targets = [doc for doc in self._docs if matches(doc, query)]
+            if not many:
+                targets = targets[:1]
+            for doc in targets:
+                _apply_update(doc, update)
+            if targets or not upsert:
+                return len(targets), None
+            # Upsert: equality fields of the query, then the update
+            doc = {key: value for key, value in query.items() if not key.startswith('$') and not isinstance(value, dict)}
+            doc.setdefault('_id', self._new_id())
+            doc.update(update.get('$setOnInsert', {}))
+            _apply_update(doc, update)
+            self._docs.append(doc)
+            return 0, doc['_id']
+
+class Store:
+    """Databases of collections, created on first use."""
+    def __init__(self, id_factory=None):
+        self._id_factory = id_factory
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def collection(self, db_name, name):
+        with self._lock:
+            key = (db_name, name)
+            if key not in self._collections:
+                self._collections[key] = Collection(name, self._id_factory)
+            return self._collections[key]
+
+    def collection_names(self, db_name):
+        with self._lock:
+            return [name for db, name in self._collections if db == db_name]
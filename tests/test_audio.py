@@ -0,0 +1,157 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import io
+import math
+import wave
+import struct
+import array
+import json
+import threading
+import urllib.error
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils import audio
+import stt_cache
+import stt_service
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _wav(rate=48000, channels=2, silence_s=1.0, tone_s=2.0, bursts=1):
+    """`bursts` 440 Hz tones of rising loudness, each surrounded by silence; 16-bit PCM."""
+    silence = [0] * int(rate * silence_s)
+    mono = list(silence)
+    for burst in range(bursts):
+        amplitude = 8000 + 1000 * burst
+        mono += [int(amplitude * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(rate * tone_s))] + silence
+    samples = array.array('h', [s for s in mono for _ in range(channels)])
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(samples.tobytes())
+    return out.getvalue()
+
+class TestAudioPreprocess(unittest.TestCase):
+
+    def setUp(self):
+        stt_cache.clear()
+
+    def test_downmixes_downsamples_and_trims(self):
+        data = _wav()
+        out, content_type, stats = audio.preprocess(data, 'audio/wav')
+
+        self.assertTrue(stats['applied'])
+        self.assertEqual(stats['bytes_out'], len(out))
+        self.assertEqual(content_type, 'audio/wav')
+        with wave.open(io.BytesIO(out)) as reader:
+            self.assertEqual((reader.getnchannels(), reader.getsampwidth(), reader.getframerate()), (1, 2, 16000))
+            # 2 s of tone plus the padding kept on both sides
+            self.assertEqual(reader.getnframes(), int(16000 * (2.0 + 2 * audio.SILENCE_PAD_MS / 1000)))
+        self.assertLess(len(out), len(data) / 8)
+
+    def test_mulaw_header(self):
+        out, _, stats = audio.preprocess(_wav(), 'audio/wav', codec='mulaw')
+        fmt_tag, channels, rate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', out[20:36])
+        self.assertEqual((fmt_tag, channels, rate, byte_rate, block_align, bits), (7, 1, 16000, 16000, 1, 8))
+        self.assertEqual(struct.unpack('<I', out[4:8])[0], len(out) - 8)
+        self.assertEqual(stats['codec'], 'mulaw')
+
+    def test_compressed_and_already_compact_audio_pass_through(self):
+        m4a = b'\x00\x00\x00\x20ftypM4A ' + b'\x00' * 64
+        self.assertEqual(audio.preprocess(m4a, 'audio/m4a'), (m4a, 'audio/m4a', {'applied': False, 'bytes_in': 76, 'bytes_out': 76}))
+
+        compact = _wav(rate=16000, channels=1, silence_s=0)
+        out, _, stats = audio.preprocess(compact, 'audio/wav')
+        self.assertIs(out, compact)
+        self.assertFalse(stats['applied'])
+
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_numpy_backend_matches_audioop(self):
+        data = _wav()
+        with patch('utils.audio._ops', return_value=audio._NumpyOps(numpy)):
+            out, _, stats = audio.preprocess(data, 'audio/wav', codec='mulaw')
+        self.assertEqual(stats['backend'], 'numpy')
+        reference, _, _ = audio.preprocess(data, 'audio/wav', codec='mulaw')
+        self.assertEqual(len(out), len(reference))
+
+        samples = numpy.arange(-32768, 32768, dtype=numpy.int32).astype(numpy.int16)
+        self.assertEqual(audio._NumpyOps(numpy).mulaw(samples), audio._AudioopOps().mulaw(samples.tobytes()))
+
+    @patch.dict(os.environ, {'SCALEWAY_API_KEY': 'test', 'STT_PREPROCESS': 'true'})
+    @patch('stt_service.http_pool.request')
+    def test_stt_uploads_preprocessed_audio(self, mock_request):
+        mock_request.return_value.json.return_value = {'text': 'hello'}
+        data = _wav()
+
+        response = stt_service.handle_speech_to_text(data, 'audio/wav')
+
+        self.assertEqual(response['statusCode'], 200)
+        headers = mock_request.call_args[1]['headers']
+        self.assertLess(int(headers['Content-Length']), len(data) / 8)
+
+class TestChunkedTranscription(unittest.TestCase):
+
+    def setUp(self):
+        stt_cache.clear()
+
+    def test_split_cuts_in_silence(self):
+        # 4 x (1 s silence + 5 s tone) + 1 s silence = 25 s
+        data = _wav(rate=16000, channels=1, tone_s=5.0, bursts=4)
+        segments = audio.split_at_silence(data, segment_seconds=6)
+
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(segments[0][0], 0)
+        for offset_ms, _ in segments[1:]:
+            # Every cut falls inside a silent gap (the 1 s gaps start 6 s apart)
+            self.assertLess(offset_ms % 6000, 1000)
+        self.assertIsNone(audio.split_at_silence(_wav(rate=16000, channels=1), segment_seconds=30))
+
+    @patch.dict(os.environ, {'SCALEWAY_API_KEY': 'test', 'STT_CHUNKING': 'true'})
+    @patch('stt_service.SEGMENT_SECONDS', 6)
+    @patch('stt_service.SEGMENT_RETRY_BACKOFF_SECONDS', 0)
+    @patch('stt_service._transcribe')
+    def test_segments_transcribed_concurrently_with_partial_results(self, mock_transcribe):
+        data = _wav(rate=16000, channels=1, tone_s=5.0, bursts=4)
+        order = {wav: index for index, (_, wav) in enumerate(audio.split_at_silence(data, 6))}
+        attempts = {}
+        in_flight = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def transcribe(wav, content_type, api_key, api_url, timeout=None):
+            index = order[wav]
+            with lock:
+                attempts[index] = attempts.get(index, 0) + 1
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            threading.Event().wait(0.05)
+            with lock:
+                in_flight['now'] -= 1
+            if index == 1 and attempts[index] == 1:
+                raise urllib.error.URLError('timed out')
+            if index == 2:
+                raise urllib.error.HTTPError(api_url, 503, 'Unavailable', {}, None)
+            return f" part {index} "
+        mock_transcribe.side_effect = transcribe
+
+        response = stt_service.handle_speech_to_text(data, 'audio/wav')
+
+        body = json.loads(response['body'])
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(body['transcript'], 'part 0 part 1 part 3')
+        self.assertEqual(body['segments'], 4)
+        self.assertTrue(body['partial'])
+        self.assertEqual(body['failed_segments'], [2])
+        self.assertEqual(attempts[1], 2)
+        self.assertEqual(attempts[2], stt_service.SEGMENT_RETRIES + 1)
+        self.assertGreater(in_flight['max'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
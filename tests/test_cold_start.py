@@ -0,0 +1,61 @@
+import unittest
+import json
+import subprocess
+
+# Add backend to python path for testing
+import sys
+import os
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Budget for `import handler` in a fresh interpreter (NFR-001). Override on slow CI machines.
+COLD_IMPORT_BUDGET_MS = float(os.environ.get('COLD_IMPORT_BUDGET_MS', '250'))
+
+HEAVY_MODULES = ('pymongo', 'bson', 'dns', 'pytz', 'parsedatetime', 'icalendar', 'smtplib', 'database', 'llm_service', 'stt_service')
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    env.pop('SCALEWAY_API_KEY', None)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=BACKEND_DIR, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+class TestColdStart(unittest.TestCase):
+
+    def test_handler_import_time_within_budget(self):
+        code = (
+            "import time, sys, json\n"
+            "start = time.perf_counter()\n"
+            "import handler\n"
+            "elapsed = (time.perf_counter() - start) * 1000\n"
+            f"print(json.dumps({{'ms': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+        )
+        # Best of three to smooth out scheduler noise
+        runs = [_run(code) for _ in range(3)]
+        best = min(run['ms'] for run in runs)
+
+        self.assertEqual(runs[0]['loaded'], [])
+        self.assertLess(best, COLD_IMPORT_BUDGET_MS, f"Cold import of handler took {best:.1f} ms")
+
+    def test_audio_route_does_not_load_database(self):
+        code = (
+            "import sys, json, handler\n"
+            "handler.handler({'httpMethod': 'POST', 'headers': {'Content-Type': 'audio/wav'}, 'body': 'RIFF'}, None)\n"
+            "print(json.dumps({'loaded': [m for m in ('pymongo', 'llm_service', 'stt_service') if m in sys.modules]}))\n"
+        )
+        self.assertEqual(_run(code)['loaded'], ['stt_service'])
+
+    def test_first_request_waits_for_warmup_import(self):
+        # The warm-up thread imports `database` at handler import; a DB route right after
+        # must not see the partially initialised module
+        code = (
+            "import os, json\n"
+            "os.environ['MONGO_WARMUP'] = 'true'\n"
+            "import handler\n"
+            "result = handler.handler({'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'todo'}}, None)\n"
+            "print(json.dumps({'status': result['statusCode'], 'body': result['body']}))\n"
+        )
+        for _ in range(3):
+            result = _run(code)
+            self.assertEqual(result['status'], 200, result['body'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import json
+import threading
+import pymongo
+from concurrent.futures import ThreadPoolExecutor
+import database
+from utils import write_buffer
+from utils.write_buffer import WriteBuffer
+import keyword_cache
+import intent_handlers
+
+class TestDatabaseWarmup(unittest.TestCase):
+
+    def setUp(self):
+        database.client = None
+        database._warmup_thread = None
+
+    def tearDown(self):
+        database.client = None
+        database._warmup_thread = None
+
+    @patch.dict(os.environ, {'MONGO_HOST': 'cluster.example.net', 'MONGO_USERNAME': 'u', 'MONGO_PASSWORD': 'p'})
+    @patch('database.pymongo.MongoClient')
+    def test_background_warmup_pings_once_and_shares_client(self, mock_client_cls):
+        mock_client = MagicMock()
+        mock_client_cls.return_value = mock_client
+
+        thread = database.start_warmup()
+        self.assertIs(database.start_warmup(), thread)
+        thread.join(timeout=5)
+
+        mock_client_cls.assert_called_once()
+        mock_client.__getitem__.return_value.command.assert_called_once_with('ping')
+        # Later DB calls reuse the warmed client
+        database._get_db()
+        mock_client_cls.assert_called_once()
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_warmup_without_configuration_is_harmless(self):
+        timings = database.warm_up()
+        self.assertIn('client_init_ms', timings)
+        self.assertNotIn('ping_ms', timings)
+
+class TestKeywordCache(unittest.TestCase):
+
+    def setUp(self):
+        keyword_cache.invalidate()
+
+    @patch('database.get_all_keywords')
+    @patch('database.get_keywords_version')
+    def test_map_is_reused_until_version_changes(self, mock_version, mock_all):
+        mock_version.return_value = 3
+        mock_all.return_value = {'home': 'Mannerheimintie 1'}
+
+        self.assertEqual(keyword_cache.expand('Home '), 'Mannerheimintie 1')
+        self.assertEqual(keyword_cache.expand('Airport'), 'Airport')
+        mock_all.assert_called_once()
+
+        # Past the check interval, an unchanged version keeps the map without re-reading it
+        with patch('keyword_cache.CHECK_INTERVAL_SECONDS', 0):
+            keyword_cache.get_keyword_map()
+            mock_all.assert_called_once()
+
+            mock_version.return_value = 4
+            mock_all.return_value = {'home': 'Kalevankatu 2'}
+            self.assertEqual(keyword_cache.expand('home'), 'Kalevankatu 2')
+
+    @patch('database.get_all_keywords')
+    @patch('database.get_keywords_version')
+    def test_failed_read_keeps_the_previous_map(self, mock_version, mock_all):
+        mock_version.return_value = 3
+        mock_all.return_value = {'home': 'Mannerheimintie 1'}
+        keyword_cache.get_keyword_map()
+
+        with patch('keyword_cache.CHECK_INTERVAL_SECONDS', 0):
+            # Version read failed
+            mock_version.return_value = None
+            self.assertEqual(keyword_cache.expand('home'), 'Mannerheimintie 1')
+            mock_all.assert_called_once()
+
+            # Reload failed after a version change
+            mock_version.return_value = 4
+            mock_all.return_value = None
+            self.assertEqual(keyword_cache.expand('home'), 'Mannerheimintie 1')
+
+            # Neither failure was cached, so the next call reloads
+            mock_all.return_value = {'home': 'Kalevankatu 2'}
+            self.assertEqual(keyword_cache.expand('home'), 'Kalevankatu 2')
+
+        # Nothing loaded yet and the reload fails: an empty map, not cached
+        keyword_cache.invalidate()
+        keyword_cache._state['map'] = None
+        mock_all.return_value = None
+        self.assertEqual(keyword_cache.get_keyword_map(), {})
+        mock_all.return_value = {'home': 'Kalevankatu 2'}
+        self.assertEqual(keyword_cache.get_keyword_map(), {'home': 'Kalevankatu 2'})
+
+    @patch('database.get_all_keywords')
+    @patch('database.get_keywords_version', return_value=3)
+    def test_invalidate_during_a_read_keeps_its_map_out(self, _version, mock_all):
+        def read_then_change():
+            # A local write (or change-stream event) lands while this reader is in the DB
+            keyword_cache.invalidate()
+            return {'home': 'Mannerheimintie 1'}
+        mock_all.side_effect = read_then_change
+
+        self.assertEqual(keyword_cache.get_keyword_map(), {'home': 'Mannerheimintie 1'})
+
+        mock_all.side_effect = None
+        mock_all.return_value = {'home': 'Kalevankatu 2'}
+        self.assertEqual(keyword_cache.get_keyword_map(), {'home': 'Kalevankatu 2'})
+
+    @patch('keyword_cache.expand')
+    def test_transport_expands_keyword(self, mock_expand):
+        mock_expand.return_value = 'Mannerheimintie 1'
+        response = intent_handlers.handle_transport({'intent': 'TRANSPORT', 'destination': 'home'})
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['data']['destination'], 'Mannerheimintie 1')
+        self.assertEqual(body['data']['keyword'], 'home')
+        self.assertIn('Mannerheimintie+1', body['data']['deeplink'])
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.collections = {}
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: self.collections.setdefault(name, self._collection(name))
+        self.buffer = WriteBuffer(database._insert_batch, max_batch=50, max_delay=0.2)
+
+    def _collection(self, name):
+        collection = MagicMock()
+        collection.name = name
+        return collection
+
+    def _written(self, name):
+        inserts = self.collections[name].with_options.return_value.insert_many.call_args_list
+        return [[doc['id'] for doc in call[0][0]] for call in inserts]
+
+    @patch.dict(os.environ, {'WRITE_DURABILITY': 'journaled-async'})
+    def test_concurrent_saves_coalesce_into_one_journaled_batch(self):
+        with patch('database._get_db', return_value=self.db), patch('database._write_buffer', self.buffer):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                items = list(pool.map(lambda i: database.save_todo_item(f"task {i}", 'medium'), range(4)))
+            # Returned immediately, nothing written yet
+            self.collections['todos'].insert_one.assert_not_called()
+            self.assertEqual(database.get_write_stats()['pending'], 4)
+
+            # A read on this instance sees its own queued writes
+            database.get_all_todos()
+
+            written = self._written('todos')
+            self.assertEqual(len(written), 1)
+            self.assertEqual(sorted(written[0]), sorted(item['id'] for item in items))
+            self.assertTrue(self.collections['todos'].with_options.call_args[1]['write_concern'].document['j'])
+            self.assertNotIn('_id', items[0])
+            stats = database.get_write_stats()
+            self.assertEqual((stats['queued'], stats['flushed'], stats['failed'], stats['pending']), (4, 4, 0, 0))
+
+    @patch.dict(os.environ, {'WRITE_DURABILITY': 'journaled-async'})
+    def test_batch_flushes_by_time_and_reports_failed_items(self):
+        self.buffer.max_delay = 0.01
+        errors = {'writeErrors': [{'index': 0, 'code': 11000}, {'index': 1, 'code': 121}], 'writeConcernErrors': []}
+        with patch('database._get_db', return_value=self.db), patch('database._write_buffer', self.buffer):
+            self.db['notes'].with_options.return_value.insert_many.side_effect = pymongo.errors.BulkWriteError(errors)
+            with self.assertLogs(level='ERROR') as logs:
+                database.save_note_items(['landed before a retry', 'fails validation', 'fine'])
+                for _ in range(100):
+                    if not self.buffer.stats()['queued'] - self.buffer.stats()['flushed'] - self.buffer.stats()['failed']:
+                        break
+                    threading.Event().wait(0.01)
+
+        stats = self.buffer.stats()
+        self.assertEqual((stats['flushed'], stats['failed']), (2, 1))
+        self.assertIn('write_behind_dropped', logs.output[0])
+        self.assertIn('fails validation', logs.output[0])
+
+    @patch.dict(os.environ, {'WRITE_DURABILITY': 'journaled-async'})
+    def test_count_includes_this_instances_queued_writes(self):
+        self.buffer.max_delay = 60
+        with patch('database._get_db', return_value=self.db), patch('database._write_buffer', self.buffer):
+            database.save_note_item('queued')
+            self.assertEqual(self._written('notes'), [])
+
+            database.count_items('notes')
+
+        self.assertEqual(len(self._written('notes')), 1)
+        self.collections['notes'].estimated_document_count.assert_called_once()
+
+    def test_ack_mode_inserts_synchronously(self):
+        with patch('database._get_db', return_value=self.db), patch('database._write_buffer', self.buffer):
+            database.save_note_item('written now')
+        self.collections['notes'].insert_one.assert_called_once()
+        self.assertEqual(self.buffer.stats()['queued'], 0)
+
+    def test_shutdown_flushes_pending_items(self):
+        written = []
+        buffer = WriteBuffer(lambda target, items: written.extend(items), max_delay=60)
+        buffer.put('todos', [{'id': 'a'}, {'id': 'b'}])
+
+        write_buffer.flush_all(timeout=1)
+
+        self.assertEqual(written, [{'id': 'a'}, {'id': 'b'}])
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
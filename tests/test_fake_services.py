@@ -0,0 +1,129 @@
+import unittest
+import json
+import datetime
+from unittest.mock import patch
+
+# Add backend and scripts to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../scripts')))
+
+import database
+import sync_store
+import llm_service
+import stt_service
+import stt_cache
+import handler
+from utils import upstream
+from fake_services.mongod import FakeMongod
+from fake_services.openai_stub import FakeOpenAI
+import bench_standins
+
+class TestFakeServices(unittest.TestCase):
+    """The backend's real pymongo and HTTP client paths against the local fakes."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mongod = FakeMongod().start()
+        cls.openai = FakeOpenAI(chat_ms=0, stt_ms=0, embedding_ms=0).start()
+        cls.env = patch.dict(os.environ, dict(
+            cls.mongod.environ(), **cls.openai.environ(),
+            MONGO_DB_NAME='fake_services_test', LLM_API_KEY='k', SCALEWAY_API_KEY='k'
+        ))
+        cls.env.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.mongod.stop()
+        cls.openai.stop()
+
+    def setUp(self):
+        database.client = None
+
+    def tearDown(self):
+        if database.client is not None:
+            database.client.close()
+        database.client = None
+        self.openai.status = 200
+        upstream.reset()
+        stt_cache.clear()
+
+    def test_database_round_trip_over_the_wire(self):
+        saved = database.save_todo_item('Buy oat milk', 'high')
+        database.save_note_item('The door code is 1234')
+
+        todos = database.get_all_todos()
+        self.assertIn(saved['id'], [todo['id'] for todo in todos])
+        self.assertEqual(database.count_items('notes'), 1)
+
+        changes = sync_store.get_changes_since(None)
+        self.assertTrue(changes['token'])
+        self.assertEqual(len(changes['changes']['note']), 1)
+
+        self.assertTrue(database.delete_todo_item(saved['id']))
+        self.assertNotIn(saved['id'], [todo['id'] for todo in database.get_all_todos()])
+        self.assertGreater(self.mongod.stats()['commands']['insert'], 0)
+
+    def test_pages_split_inside_a_batch_lose_nothing(self):
+        # One batch insert gives every note the same created_at
+        saved = database.save_note_items([f'batch note {i}' for i in range(5)])
+        self.assertEqual(len({item['created_at'] for item in saved}), 1)
+
+        listed, before = [], None
+        for _ in range(10):
+            page = list(database.iter_items_page('notes', before=before, limit=2, fields=['text']))
+            listed += [item['id'] for item in page]
+            if len(page) < 2:
+                break
+            before = database.page_cursor(page[-1])
+
+        self.assertEqual(len(listed), len(set(listed)))
+        self.assertLessEqual({item['id'] for item in saved}, set(listed))
+
+    def test_llm_request_intent_json_and_streamed(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.assertEqual(llm_service._request_intent('Todo buy coffee', now)['title'], 'buy coffee')
+
+        seen = []
+        with patch.dict(os.environ, {'LLM_STREAMING': 'true'}):
+            parsed = llm_service._request_intent('Note that the sauna is booked', now, on_intent=seen.append)
+        self.assertEqual(parsed['intent'], 'NOTE')
+        self.assertEqual(seen, ['NOTE'])
+
+    def test_speech_to_text_and_injected_failure(self):
+        result = stt_service.handle_speech_to_text(b'RIFF fake wav clip', 'audio/wav')
+        self.assertEqual(result['statusCode'], 200)
+        self.assertEqual(json.loads(result['body'])['transcript'], self.openai.transcript)
+
+        self.openai.status = 503
+        with patch('utils.upstream.time.sleep'):
+            result = stt_service.handle_speech_to_text(b'RIFF another clip', 'audio/wav')
+        self.assertNotEqual(result['statusCode'], 200)
+
+    def test_handler_saves_llm_intent(self):
+        event = {'httpMethod': 'POST', 'headers': {}, 'body': json.dumps({'transcript': 'Can you make sure I remember to call the plumber about the sink'})}
+        result = handler.handler(event, None)
+
+        self.assertEqual(result['statusCode'], 200)
+        self.assertGreater(self.openai.stats()['calls'].get('/v1/chat/completions', 0), 0)
+
+class TestBenchStandIns(unittest.TestCase):
+    """The bench's in-process MongoDB stand-in."""
+
+    def test_compound_sort_like_pymongo(self):
+        client = bench_standins.FakeClient(bench_standins.Latency(mongo_ms=0))
+        notes = client['bench']['notes']
+        notes.seed([
+            {'id': 'a', 'created_at': '2023-10-30T10:00:00'},
+            {'id': 'c', 'created_at': '2023-10-30T10:00:00'},
+            {'id': 'b', 'created_at': '2023-10-31T10:00:00'},
+        ])
+        with patch.object(database, 'client', client), patch.dict(os.environ, {'MONGO_DB_NAME': 'bench'}):
+            page = list(database.iter_items_page('notes', limit=3, fields=['text']))
+        self.assertEqual([item['id'] for item in page], ['b', 'c', 'a'])
+        self.assertEqual([doc['id'] for doc in notes.find({}, {'_id': 0}).sort('id', -1)], ['c', 'b', 'a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import json
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils import deadline
+from utils.http_pool import ConnectionPool
+from utils.multipart import MultipartBody
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set by tests: close the socket after responding without announcing it
+    drop_after_response = False
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length)
+        status = 500 if self.path == '/fail' else 200
+        body = json.dumps({'echo': payload.decode('utf-8'), 'port': self.client_address[1]}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if _Handler.drop_after_response:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+class TestHttpPool(unittest.TestCase):
+
+    def setUp(self):
+        _Handler.drop_after_response = False
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pool = ConnectionPool(max_per_host=2)
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_keep_alive_connection(self):
+        first = self.pool.request('POST', self.url + '/v1', body=b'one').json()
+        second = self.pool.request('POST', self.url + '/v1', body=b'two').json()
+
+        self.assertEqual(second['echo'], 'two')
+        self.assertEqual(first['port'], second['port'])
+        stats = self.pool.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_recovers_from_stale_socket(self):
+        _Handler.drop_after_response = True
+        self.pool.request('POST', self.url + '/v1', body=b'one')
+        response = self.pool.request('POST', self.url + '/v1', body=b'two')
+
+        self.assertEqual(response.json()['echo'], 'two')
+        self.assertEqual(self.pool.stats()['stale_retries'], 1)
+
+    def test_http_error_mirrors_urlopen(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self.pool.request('POST', self.url + '/fail', body=b'{}')
+        self.assertEqual(ctx.exception.code, 500)
+        self.assertIn('echo', ctx.exception.read().decode('utf-8'))
+
+    def test_streams_iterable_body_with_content_length(self):
+        body = MultipartBody({'language': 'fi'}, {'file': ('a.txt', bytearray(b'x' * 200_000), 'text/plain')}, chunk_size=4096)
+        headers = {'Content-Type': body.content_type, 'Content-Length': str(body.content_length)}
+
+        first = self.pool.request('POST', self.url + '/v1', body=body, headers=headers).json()
+        second = self.pool.request('POST', self.url + '/v1', body=body, headers=headers).json()
+
+        self.assertEqual(first['echo'].encode('utf-8'), b''.join(body))
+        self.assertEqual(first['port'], second['port'])
+
+    def test_saturated_slots_give_up_at_the_timeout_or_deadline(self):
+        with self.pool.stream('POST', self.url + '/v1', body=b'one'), self.pool.stream('POST', self.url + '/v1', body=b'two'):
+            with self.assertRaises(urllib.error.URLError):
+                self.pool.request('POST', self.url + '/v1', body=b'three', timeout=0.1)
+
+            token = deadline.begin(0.1)
+            try:
+                with self.assertRaises(urllib.error.URLError):
+                    self.pool.request('POST', self.url + '/v1', body=b'four', timeout=30)
+            finally:
+                deadline.end(token)
+
+        self.assertEqual(self.pool.stats()['slot_timeouts'], 2)
+        self.assertEqual(self.pool.request('POST', self.url + '/v1', body=b'five').json()['echo'], 'five')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+import datetime
+import pytz
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import intent_cache
+import llm_service
+
+class TestIntentCache(unittest.TestCase):
+
+    def setUp(self):
+        intent_cache.clear()
+
+    @patch('llm_service._request_intent')
+    def test_repeat_command_skips_llm(self, mock_request):
+        mock_request.return_value = {"intent": "TODO", "title": "Pick up the dry cleaning", "priority": "medium"}
+
+        first = llm_service.analyze_transcript("Pick up the dry cleaning!")
+        second = llm_service.analyze_transcript("  pick up the   DRY cleaning ")
+
+        self.assertEqual(first, second)
+        mock_request.assert_called_once()
+
+    @patch('llm_service._request_intent')
+    def test_fallback_is_not_cached(self, mock_request):
+        mock_request.return_value = None
+
+        self.assertEqual(llm_service.analyze_transcript("mumble")['intent'], 'TODO')
+        llm_service.analyze_transcript("mumble")
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_relative_meeting_is_recomputed(self):
+        monday = datetime.datetime(2026, 10, 12, 8, 30, tzinfo=datetime.timezone.utc)
+        parsed = {"intent": "MEETING", "title": "Sync", "datetime": "2026-10-13T14:00:00+00:00", "duration": 60}
+        intent_cache.store("Sync tomorrow at 2 PM", None, monday, parsed)
+
+        next_monday = monday + datetime.timedelta(days=7, hours=3)
+        hit = intent_cache.lookup("sync tomorrow at 2 pm", None, next_monday)
+        self.assertEqual(hit['datetime'], "2026-10-20T14:00:00+00:00")
+
+        # A different weekday may resolve "next Friday" differently, so it is a miss
+        self.assertIsNone(intent_cache.lookup("sync tomorrow at 2 pm", None, monday + datetime.timedelta(days=1)))
+
+    def test_meeting_replays_in_the_callers_timezone(self):
+        helsinki, new_york = pytz.timezone('Europe/Helsinki'), pytz.timezone('America/New_York')
+        monday = helsinki.localize(datetime.datetime(2026, 10, 19, 8, 30))
+        parsed = {"intent": "MEETING", "title": "Sync", "datetime": "2026-10-20T10:00:00+03:00", "duration": 60}
+        intent_cache.store("Sync tomorrow at 10", None, monday, parsed)
+
+        # Another user's zone: the same wall-clock time there
+        hit = intent_cache.lookup("sync tomorrow at 10", None, new_york.localize(datetime.datetime(2026, 10, 19, 9, 0)))
+        self.assertEqual(hit['datetime'], "2026-10-20T10:00:00-04:00")
+
+        # The same user a week later, after Helsinki's switch to winter time on October 25
+        hit = intent_cache.lookup("sync tomorrow at 10", None, helsinki.localize(datetime.datetime(2026, 10, 26, 8, 30)))
+        self.assertEqual(hit['datetime'], "2026-10-27T10:00:00+02:00")
+
+    def test_meeting_on_an_explicit_date_is_not_rebased(self):
+        monday = datetime.datetime(2026, 10, 12, 8, 30, tzinfo=datetime.timezone.utc)
+        parsed = {"intent": "MEETING", "title": "Dentist", "datetime": "2026-10-20T14:00:00+00:00", "duration": 60}
+        for transcript in ("Meeting with dentist on October 20 at 2pm", "Hammaslääkäri 20.10. kello 14", "Dentist on the 20th at 2pm"):
+            intent_cache.store(transcript, None, monday, parsed)
+            self.assertIsNone(intent_cache.lookup(transcript, None, monday + datetime.timedelta(days=7)))
+
+    def test_sub_day_relative_time_is_not_cached(self):
+        now = datetime.datetime(2026, 10, 12, 8, 30, tzinfo=datetime.timezone.utc)
+        parsed = {"intent": "MEETING", "title": "Call", "datetime": "2026-10-12T10:30:00+00:00", "duration": 30}
+        intent_cache.store("Call Anna in 2 hours", None, now, parsed)
+
+        self.assertIsNone(intent_cache.lookup("Call Anna in 2 hours", None, now))
+
+if __name__ == '__main__':
+    unittest.main()
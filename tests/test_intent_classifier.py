@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import intent_cache
+import intent_classifier
+import llm_service
+
+class TestIntentClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = intent_classifier.IntentClassifier(llm_service.SYSTEM_PROMPT)
+        intent_cache.clear()
+
+    def test_finnish_triggers_seeded_from_prompt(self):
+        triggers = intent_classifier.load_prompt_triggers(llm_service.SYSTEM_PROMPT)
+        self.assertIn('muista ostaa', triggers['TODO'])
+        self.assertIn('miten pääsen', triggers['TRANSPORT'])
+
+    def test_high_confidence_commands(self):
+        parsed, confidence = self.classifier.classify("Muista ostaa maitoa")
+        self.assertEqual(parsed, {'intent': 'TODO', 'title': 'Ostaa maitoa', 'priority': 'medium'})
+        self.assertGreaterEqual(confidence, intent_classifier.DEFAULT_THRESHOLD)
+
+        parsed, _ = self.classifier.classify("How do I get to Helsinki-Vantaa Airport by train?")
+        self.assertEqual(parsed, {'intent': 'TRANSPORT', 'destination': 'Helsinki-Vantaa Airport'})
+
+        parsed, _ = self.classifier.classify("Take a note that the door code is 1234")
+        self.assertEqual(parsed, {'intent': 'NOTE', 'title': 'the door code is 1234'})
+
+    def test_bare_trigger_is_left_to_the_llm(self):
+        self.assertEqual(self.classifier.classify("Remind me to"), (None, 0.0))
+        self.assertEqual(self.classifier.classify("remind me to."), (None, 0.0))
+
+    def test_ambiguous_commands_are_low_confidence(self):
+        _, confidence = self.classifier.classify("Remind me to book a meeting with John")
+        self.assertLess(confidence, intent_classifier.DEFAULT_THRESHOLD)
+        self.assertEqual(self.classifier.classify("Varaa kalenterista huomenna"), (None, 0.0))
+
+    @patch('llm_service._request_intent')
+    def test_local_path_skips_llm_and_is_counted(self, mock_request):
+        before = llm_service.get_path_stats()
+        result = llm_service.analyze_transcript("Remind me to call mom")
+
+        self.assertEqual(result['title'], 'Call mom')
+        mock_request.assert_not_called()
+        self.assertEqual(llm_service.get_path_stats()['local'], before['local'] + 1)
+
+    @patch.dict(os.environ, {'LOCAL_INTENT_THRESHOLD': '1.1'})
+    @patch('llm_service._request_intent')
+    def test_threshold_above_one_disables_local_path(self, mock_request):
+        mock_request.return_value = {"intent": "TODO", "title": "Call mom", "priority": "medium"}
+        llm_service.analyze_transcript("Remind me to call mom")
+        mock_request.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import intent_cache
+import llm_service
+from utils import chat_payload
+
+CONTENT = '{"intent": "NOTE", "title": "the sauna is 80 degrees and the door code is 1234"}'
+
+class _StreamingChatHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        _StreamingChatHandler.requests.append(payload)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        # Small fragments, as a real model would emit tokens
+        fragments = [CONTENT[i:i + 7] for i in range(0, len(CONTENT), 7)]
+        for fragment in fragments:
+            event = json.dumps({'choices': [{'delta': {'content': fragment}}]})
+            self._chunk(f"data: {event}\n\n".encode('utf-8'))
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def log_message(self, *args):
+        pass
+
+class TestLlmStreaming(unittest.TestCase):
+
+    def setUp(self):
+        intent_cache.clear()
+        _StreamingChatHandler.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StreamingChatHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        self.env = patch.dict(os.environ, {'LLM_API_KEY': 'test', 'LLM_API_URL': url, 'LLM_STREAMING': 'true'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_intent_reported_before_stream_completes(self):
+        seen = []
+        on_intent = MagicMock(side_effect=lambda intent: seen.append(intent))
+
+        parsed = llm_service.analyze_transcript("Saunan lämpö ja ovikoodi", on_intent=on_intent)
+
+        self.assertEqual(parsed, json.loads(CONTENT))
+        on_intent.assert_called_once_with('NOTE')
+        self.assertTrue(_StreamingChatHandler.requests[0]['stream'])
+
+    def test_detector_fires_once_intent_value_is_complete(self):
+        on_intent = MagicMock()
+        detector = llm_service._IntentDetector(on_intent)
+        detector.feed('{"inte')
+        detector.feed('nt": "TRANS')
+        on_intent.assert_not_called()
+        detector.feed('PORT", "destination": "Kamppi"}')
+        on_intent.assert_called_once_with('TRANSPORT')
+
+    def test_static_system_prompt_and_timestamp_in_user_message(self):
+        llm_service.analyze_transcript("Saunan lämpö ja ovikoodi", on_intent=MagicMock())
+        llm_service.analyze_transcript("Saunan lämpö ja uusi ovikoodi", on_intent=MagicMock())
+
+        first, second = _StreamingChatHandler.requests
+        self.assertEqual(first['messages'][0], {'role': 'system', 'content': llm_service.SYSTEM_PROMPT})
+        self.assertEqual(first['messages'][0], second['messages'][0])
+        self.assertNotIn('{{', llm_service.SYSTEM_PROMPT)
+        self.assertRegex(first['messages'][1]['content'], r'^Current time: \d{4}-\d\d-\d\dT.*\nCommand: Saunan lämpö ja ovikoodi$')
+
+    def test_chat_body_matches_plain_serialization(self):
+        body = chat_payload.chat_body('m', 'system "quoted"', 'user ä\n', stream=True)
+        self.assertEqual(json.loads(body), {
+            'model': 'm',
+            'messages': [{'role': 'system', 'content': 'system "quoted"'}, {'role': 'user', 'content': 'user ä\n'}],
+            'temperature': 0.1,
+            'response_format': {'type': 'json_object'},
+            'stream': True
+        })
+        chat_payload.chat_body('m', 'system "quoted"', 'other', stream=True)
+        self.assertGreaterEqual(chat_payload._frame.cache_info().hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
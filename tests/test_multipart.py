@@ -0,0 +1,58 @@
+import unittest
+import base64
+import binascii
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from utils import base64_stream
+from utils.multipart import MultipartBody, encode_multipart_formdata
+
+class TestMultipartBody(unittest.TestCase):
+
+    def test_stream_matches_encoded_body_and_slices_audio_buffer(self):
+        audio = bytearray(os.urandom(200_000))
+        fields = {'model': 'whisper-large-v3', 'language': 'fi'}
+        body = MultipartBody(fields, {'file': ('audio.wav', audio, 'audio/wav')}, boundary='b0undary', chunk_size=65536)
+
+        chunks = list(body)
+        joined = b''.join(chunks)
+        self.assertEqual(len(joined), body.content_length)
+        self.assertIn(b'Content-Type: audio/wav\r\n\r\n' + bytes(audio) + b'\r\n--b0undary--\r\n', joined)
+
+        # The audio is handed over as views of the caller's buffer, never copied
+        views = [chunk for chunk in chunks if isinstance(chunk, memoryview)]
+        self.assertEqual(sum(view.nbytes for view in views), len(audio))
+        self.assertTrue(all(view.obj is audio for view in views))
+
+        # Re-iterable for retries
+        self.assertEqual(b''.join(body), joined)
+
+    def test_legacy_encoder_still_returns_bytes(self):
+        body, content_type = encode_multipart_formdata({'a': 1}, {'file': ('x.wav', b'RIFF', 'audio/wav')})
+        self.assertIsInstance(body, bytes)
+        self.assertTrue(content_type.startswith('multipart/form-data; boundary='))
+        self.assertIn(b'RIFF\r\n', body)
+
+class TestBase64Stream(unittest.TestCase):
+
+    def test_matches_b64decode_across_chunk_boundaries(self):
+        raw = os.urandom(10_001)
+        encoded = base64.b64encode(raw).decode('ascii')
+        # Android's Base64.DEFAULT wraps lines at 76 characters
+        wrapped = '\n'.join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+
+        self.assertEqual(base64_stream.decode(encoded, chunk_size=1000), raw)
+        self.assertEqual(base64_stream.decode(wrapped, chunk_size=1001), raw)
+        self.assertEqual(base64_stream.decode(wrapped.encode('ascii')), raw)
+
+    def test_rejects_truncated_input(self):
+        with self.assertRaises(binascii.Error):
+            base64_stream.decode('UklGRg=')
+        with self.assertRaises(ValueError):
+            base64_stream.decode('UklGRg==ä')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ import unittest
 from unittest.mock import patch, MagicMock
 import json
 import base64
+import asyncio
+import threading
 
 # Add backend to python path for testing
 import sys
@@ -109,5 +111,249 @@ class TestNewFeatures(unittest.TestCase):
         self.assertTrue(body['success'])
         mock_delete_note.assert_called_once_with('test-note-id')
 
+    @patch('llm_service.analyze_transcript')
+    @patch('database.save_todo_item')
+    @patch('stt_service.handle_speech_to_text')
+    def test_execute_audio_single_round_trip(self, mock_stt, mock_save, mock_analyze):
+        mock_stt.return_value = {'statusCode': 200, 'body': json.dumps({'transcript': 'Buy milk'})}
+        mock_analyze.return_value = {"intent": "TODO", "title": "Buy milk", "priority": "medium"}
+        mock_save.return_value = {"id": "todo-1", "text": "Buy milk", "priority": "medium"}
+
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'audio/wav', 'Prefer': 'execute'},
+            'queryStringParameters': {'timezone': 'Europe/Helsinki'},
+            'isBase64Encoded': True,
+            'body': base64.b64encode(b'RIFFfakeaudio').decode('utf-8')
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 200)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['transcript'], 'Buy milk')
+        self.assertEqual(body['type'], 'todo')
+        self.assertEqual(body['data']['id'], 'todo-1')
+        mock_stt.assert_called_once_with(b'RIFFfakeaudio', 'audio/wav')
+        mock_analyze.assert_called_once()
+
+    @patch('llm_service.analyze_transcript')
+    @patch('stt_service.handle_speech_to_text')
+    def test_execute_returns_stt_error(self, mock_stt, mock_analyze):
+        mock_stt.return_value = {'statusCode': 500, 'body': json.dumps({'error': 'STT_API_ERROR'})}
+
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'audio_base64': base64.b64encode(b'RIFF').decode('utf-8'), 'execute': True})
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 500)
+        mock_analyze.assert_not_called()
+
+    @patch('database.count_items')
+    @patch('database.iter_items_page')
+    def test_list_notes_page(self, mock_page, mock_count):
+        mock_page.return_value = iter([
+            {'id': 'n2', 'text': 'second', 'created_at': '2023-10-31T10:00:00'},
+            {'id': 'n1', 'text': 'first', 'created_at': '2023-10-30T10:00:00'}
+        ])
+        mock_count.return_value = 1200
+
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {'action': 'list', 'type': 'note', 'limit': '2', 'before': '2023-11-01T00:00:00', 'fields': 'id,text'}
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 200)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['type'], 'note_list')
+        self.assertEqual([item['id'] for item in body['data']], ['n2', 'n1'])
+        self.assertEqual(body['next_before'], '2023-10-30T10:00:00,n1')
+        self.assertEqual(body['total_hint'], 1200)
+        mock_page.assert_called_once_with('notes', before='2023-11-01T00:00:00', limit=2, fields=['id', 'text'])
+
+    @patch('database.iter_items_page')
+    def test_list_page_rejects_unknown_fields(self, mock_page):
+        for fields in ('_id', 'id,secret', 'text.length', 'priority'):
+            event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'note', 'fields': fields}}
+            self.assertEqual(handler.handler(event, None)['statusCode'], 400, fields)
+        mock_page.assert_not_called()
+
+    @patch('database.iter_items_page')
+    def test_list_page_rejects_invalid_limit(self, mock_page):
+        event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'todo', 'limit': 'many'}}
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 400)
+        mock_page.assert_not_called()
+
+    @patch('llm_service.analyze_transcript_batch')
+    @patch('database.save_note_items')
+    @patch('database.save_todo_items')
+    def test_batch_commands_use_bulk_writes(self, mock_save_todos, mock_save_notes, mock_analyze):
+        mock_analyze.return_value = [
+            {"intent": "TODO", "title": "Buy milk", "priority": "medium"},
+            {"intent": "TRANSPORT", "destination": "Kamppi"},
+            {"intent": "TODO", "title": "Call mom", "priority": "high"},
+            {"intent": "NOTE", "title": "the door code is 1234"}
+        ]
+        mock_save_todos.return_value = [{"id": "t1", "text": "Buy milk"}, {"id": "t2", "text": "Call mom"}]
+        mock_save_notes.return_value = [{"id": "n1", "text": "the door code is 1234"}]
+
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'transcript': 'Buy milk, how do I get to Kamppi, remind me to call mom and note that the door code is 1234', 'batch': True})
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 200)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['type'], 'batch')
+        self.assertEqual([r['type'] for r in body['results']], ['todo', 'transport', 'todo', 'note'])
+        self.assertEqual(body['results'][2]['data']['id'], 't2')
+        mock_save_todos.assert_called_once_with([('Buy milk', 'medium'), ('Call mom', 'high')])
+        mock_save_notes.assert_called_once_with(['the door code is 1234'])
+
+    @patch('llm_service.analyze_transcript_batch')
+    @patch('database.save_todo_items')
+    def test_batch_partial_failure_is_multi_status(self, mock_save_todos, mock_analyze):
+        mock_analyze.return_value = [
+            {"intent": "TODO", "title": "Buy milk", "priority": "medium"},
+            {"intent": "TRANSPORT", "destination": "Kamppi"}
+        ]
+        mock_save_todos.side_effect = Exception("db down")
+
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'transcript': 'Buy milk and how do I get to Kamppi', 'batch': True})
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 207)
+        results = json.loads(response['body'])['results']
+        self.assertEqual(results[0]['error'], 'Failed to save task')
+        self.assertEqual(results[1]['type'], 'transport')
+
+    @patch('sync_store.get_changes_since')
+    def test_sync_returns_delta_and_next_token(self, mock_changes):
+        mock_changes.return_value = {
+            'token': '2023-11-01T12:00:00.000000',
+            'full_resync': False,
+            'changes': {'note': [{'id': 'n3', 'text': 'new', 'created_at': '2023-11-01T11:00:00', 'updated_at': '2023-11-01T11:00:00'}]},
+            'deleted': [{'type': 'note', 'id': 'n1', 'deleted_at': '2023-11-01T11:30:00.000000'}]
+        }
+        event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'sync', 'since': '2023-11-01T10:00:00.000000', 'type': 'note'}}
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 200)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['type'], 'sync')
+        self.assertEqual(body['token'], '2023-11-01T12:00:00.000000')
+        self.assertEqual(body['deleted'][0]['id'], 'n1')
+        self.assertNotIn('applied', body)
+        mock_changes.assert_called_once_with('2023-11-01T10:00:00.000000', ['note'])
+
+    @patch('sync_store.get_changes_since')
+    @patch('sync_store.apply_sync_mutations')
+    def test_sync_applies_batched_mutations(self, mock_apply, mock_changes):
+        mock_apply.return_value = {'deleted': 2, 'upserted': 1}
+        mock_changes.return_value = {'token': 't', 'full_resync': True, 'changes': {}, 'deleted': []}
+        mutations = [
+            {'op': 'delete', 'type': 'todo', 'id': 't1'},
+            {'op': 'delete', 'type': 'keyword', 'key': 'work'},
+            {'op': 'upsert', 'type': 'keyword', 'key': 'home', 'value': 'Mannerheimintie 1'}
+        ]
+        event = {
+            'httpMethod': 'POST',
+            'queryStringParameters': {'action': 'sync'},
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'mutations': mutations})
+        }
+
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['applied'], {'deleted': 2, 'upserted': 1})
+        mock_apply.assert_called_once_with(mutations)
+
+    @patch('sync_store.apply_sync_mutations')
+    def test_sync_rejects_invalid_token_and_mutations(self, mock_apply):
+        event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'sync', 'since': 'yesterday'}}
+        self.assertEqual(handler.handler(event, None)['statusCode'], 400)
+
+        event = {
+            'httpMethod': 'POST',
+            'queryStringParameters': {'action': 'sync'},
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'mutations': [{'op': 'delete', 'type': 'todo', 'id': 't1'}, {'op': 'upsert', 'type': 'todo', 'id': 't2'}]})
+        }
+        response = handler.handler(event, None)
+        self.assertEqual(response['statusCode'], 400)
+        self.assertEqual(json.loads(response['body'])['index'], 1)
+        mock_apply.assert_not_called()
+
+    @patch('keyword_cache.get_keyword_map')
+    @patch('llm_service.analyze_transcript')
+    @patch('database.save_todo_item')
+    def test_async_handler_overlaps_llm_and_storage_prefetch(self, mock_save, mock_analyze, mock_keywords):
+        # Each side waits for the other: run one after the other, they break the barrier
+        both_running = threading.Barrier(2, timeout=5)
+
+        def analyze(*args, **kwargs):
+            both_running.wait()
+            return {"intent": "TODO", "title": "Buy milk", "priority": "medium"}
+
+        def keywords():
+            both_running.wait()
+            return {}
+
+        mock_analyze.side_effect = analyze
+        mock_keywords.side_effect = keywords
+        mock_save.return_value = {"id": "t1", "text": "Buy milk"}
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'transcript': 'Buy milk'})
+        }
+
+        response = asyncio.run(handler.async_handler(event, None))
+
+        self.assertEqual(response['statusCode'], 200)
+        mock_keywords.assert_called_once()
+        self.assertFalse(both_running.broken)
+
+    @patch('llm_service.analyze_transcript')
+    @patch('database.save_todo_item')
+    def test_sync_handler_reuses_one_loop_and_runs_inside_a_running_loop(self, mock_save, mock_analyze):
+        mock_analyze.return_value = {"intent": "TODO", "title": "Buy milk", "priority": "medium"}
+        mock_save.return_value = {"id": "t1", "text": "Buy milk"}
+        event = {'httpMethod': 'POST', 'headers': {}, 'body': json.dumps({'transcript': 'Buy milk'})}
+
+        self.assertEqual(handler.handler(event, None)['statusCode'], 200)
+        loop = handler._loop
+
+        async def from_async_caller():
+            return handler.handler(event, None)
+
+        self.assertEqual(asyncio.run(from_async_caller())['statusCode'], 200)
+        self.assertIs(handler._loop, loop)
+
+    @patch('database.get_all_todos', return_value=[])
+    def test_get_runs_inline_on_the_calling_thread(self, mock_todos):
+        threads = []
+        mock_todos.side_effect = lambda: threads.append(threading.current_thread()) or []
+
+        response = handler.handler({'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'todo'}}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(threads, [threading.current_thread()])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import json
+from unittest.mock import patch
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import handler
+import note_search
+from utils.text_index import InvertedIndex, tokenize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NOTES = [
+    {'id': 'n1', 'text': 'Ovikoodi on 1234', 'created_at': '2026-01-01T10:00:00'},
+    {'id': 'n2', 'text': 'Kaupasta maitoa ja leipää', 'created_at': '2026-01-02T10:00:00'},
+    {'id': 'n3', 'text': 'Idea: shopping list app for the family', 'created_at': '2026-01-03T10:00:00'},
+]
+
+def _delta(notes, deleted=(), full_resync=False, token='2026-01-04T00:00:00.000000'):
+    return {'token': token, 'full_resync': full_resync, 'changes': {'note': list(notes)}, 'deleted': [{'type': 'note', 'id': i} for i in deleted]}
+
+class TestTextIndex(unittest.TestCase):
+
+    def test_inflected_forms_share_stems(self):
+        self.assertEqual(tokenize('kauppa'), tokenize('kaupassa'))
+        self.assertEqual(tokenize('ovikoodin'), tokenize('ovikoodia'))
+        self.assertEqual(tokenize('meetings'), tokenize('meeting'))
+        # Stopwords are dropped
+        self.assertEqual(tokenize('the door and the code'), tokenize('door code'))
+
+    def test_bm25_ranks_and_updates_incrementally(self):
+        index = InvertedIndex()
+        index.add('a', 'milk milk bread')
+        index.add('b', 'milk and a very long note about many other unrelated things entirely')
+        index.add('c', 'bread only')
+
+        hits, total = index.search('milk')
+        self.assertEqual([doc_id for doc_id, _ in hits], ['a', 'b'])
+        self.assertEqual(total, 2)
+
+        index.remove('a')
+        index.add('b', 'eggs')
+        self.assertEqual(index.search('milk'), ([], 0))
+        self.assertEqual(len(index), 2)
+
+class TestNoteSearch(unittest.TestCase):
+
+    def setUp(self):
+        note_search.reset()
+
+    def tearDown(self):
+        note_search.reset()
+
+    @patch('note_search.sync_store.get_changes_since')
+    def test_loads_once_and_applies_writes_and_deltas(self, mock_changes):
+        mock_changes.return_value = _delta(NOTES, full_resync=True)
+
+        result = note_search.search('kauppa')
+        self.assertEqual([note['id'] for note in result['data']], ['n2'])
+        self.assertEqual(result['mode'], 'keyword')
+
+        # Writes through this instance are indexed without another DB read
+        note_search.on_notes_changed([{'id': 'n4', 'text': 'Kauppaan huomenna', 'created_at': '2026-01-04T10:00:00'}], ['n2'])
+        self.assertEqual([note['id'] for note in note_search.search('kaupassa')['data']], ['n4'])
+        mock_changes.assert_called_once()
+
+        # Other instances' writes arrive with the next sync delta
+        mock_changes.return_value = _delta([{'id': 'n5', 'text': 'Ovikoodi vaihtui', 'created_at': '2026-01-05T10:00:00'}], deleted=['n1'])
+        with patch('note_search.REFRESH_SECONDS', 0):
+            result = note_search.search('ovikoodi')
+        self.assertEqual([note['id'] for note in result['data']], ['n5'])
+        self.assertEqual(mock_changes.call_args[0][0], '2026-01-04T00:00:00.000000')
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    @patch.dict(os.environ, {'NOTE_SEARCH_EMBEDDINGS': 'true'})
+    @patch('note_search.embedding_store.save_note_embeddings')
+    @patch('note_search.embedding_store.get_note_embeddings', return_value=[])
+    @patch('note_search.sync_store.get_changes_since')
+    @patch('note_search._embed')
+    def test_hybrid_search_backfills_embeddings(self, mock_embed, mock_changes, _stored, mock_save):
+        mock_changes.return_value = _delta(NOTES, full_resync=True)
+        vectors = {'Ovikoodi on 1234': [1, 0, 0], 'Kaupasta maitoa ja leipää': [0, 1, 0], 'Idea: shopping list app for the family': [0, 0.9, 0.4]}
+        # The query itself has no keyword match, only a semantic one
+        mock_embed.side_effect = lambda texts: [[0, 1, 0.1] if text == 'groceries' else vectors[text] for text in texts]
+
+        # The first search only starts the backfill; its keyword results stand
+        self.assertEqual(note_search.search('groceries')['mode'], 'keyword')
+        note_search._backfill['thread'].join(timeout=5)
+        self.assertEqual(note_search.get_stats()['vectors'], 3)
+
+        result = note_search.search('groceries')
+
+        # Only the query is embedded on the request path
+        self.assertEqual(mock_embed.call_args[0][0], ['groceries'])
+        self.assertEqual(result['mode'], 'hybrid')
+        self.assertEqual(result['total'], 0)
+        self.assertEqual([note['id'] for note in result['data']][:2], ['n2', 'n3'])
+        saved = mock_save.call_args[0][1]
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(len(saved[0][1]), 3 * 2)  # float16
+
+    @patch('note_search.search')
+    def test_search_endpoint(self, mock_search):
+        mock_search.return_value = {'mode': 'keyword', 'total': 1, 'data': [dict(NOTES[0], score=1.5)]}
+        event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'search', 'type': 'note', 'q': 'ovikoodi', 'limit': '500'}}
+
+        response = handler.handler(event, None)
+
+        body = json.loads(response['body'])
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(body['type'], 'note_search')
+        self.assertEqual(body['data'][0]['id'], 'n1')
+        mock_search.assert_called_once_with('ovikoodi', note_search.MAX_LIMIT)
+
+        event['queryStringParameters'] = {'action': 'search', 'type': 'note'}
+        self.assertEqual(handler.handler(event, None)['statusCode'], 400)
+
+@unittest.skipIf(numpy is None, "NumPy not installed")
+class TestVectorIndex(unittest.TestCase):
+
+    def test_ivf_matches_brute_force_on_clustered_data(self):
+        from utils.vector_index import VectorIndex
+        rng = numpy.random.default_rng(7)
+        centers = rng.normal(size=(20, 16))
+        data = centers[rng.integers(0, 20, 600)] + 0.1 * rng.normal(size=(600, 16))
+        exact = VectorIndex(numpy, 16, ivf_min_rows=10**6)
+        ivf = VectorIndex(numpy, 16, ivf_min_rows=200)
+        for index in (exact, ivf):
+            index.add_many((f"v{i}", row) for i, row in enumerate(data))
+        self.assertIsNotNone(ivf._centroids)
+
+        query = data[5] + 0.05
+        self.assertEqual(exact.search(query, 5)[0][0], ivf.search(query, 5)[0][0])
+
+        ivf.remove('v5')
+        self.assertNotIn('v5', ivf)
+        self.assertEqual(len(ivf), 599)
+        self.assertNotIn('v5', [doc_id for doc_id, _ in ivf.search(query, 5)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import json
+import gzip
+import base64
+from unittest.mock import patch
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import handler
+from utils import response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NOTES = [{'id': f'n{i}', 'text': f'Muistiinpano numero {i} – "lainausmerkit"', 'created_at': f'2026-01-01T10:{i % 60:02d}:00'} for i in range(200)]
+
+def _list_event(accept_encoding=None):
+    event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'note'}, 'headers': {}}
+    if accept_encoding:
+        event['headers']['Accept-Encoding'] = accept_encoding
+    return event
+
+class TestResponseEncoding(unittest.TestCase):
+
+    def test_list_chunks_match_json_dumps(self):
+        body = ''.join(response.list_chunks('note_list', iter(NOTES[:3]), next_before=lambda: 'x', total_hint=3))
+        self.assertEqual(body, json.dumps({'status': 'success', 'type': 'note_list', 'data': NOTES[:3], 'next_before': 'x', 'total_hint': 3}))
+        self.assertEqual(''.join(response.list_chunks('todo_list', [])), json.dumps({'status': 'success', 'type': 'todo_list', 'data': []}))
+
+    def test_negotiate(self):
+        self.assertEqual(response.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(response.negotiate('gzip;q=0, deflate'), None)
+        self.assertEqual(response.negotiate('identity'), None)
+        self.assertEqual(response.negotiate(None), None)
+        with patch('utils.response._brotli', return_value=None):
+            self.assertEqual(response.negotiate('br, gzip;q=0.5'), 'gzip')
+            self.assertEqual(response.negotiate('*'), 'gzip')
+
+    @patch('database.get_all_notes', return_value=NOTES)
+    def test_large_list_is_gzipped(self, _notes):
+        with patch('utils.response._brotli', return_value=None):
+            result = handler.handler(_list_event('gzip, br'), None)
+
+        self.assertEqual(result['statusCode'], 200)
+        self.assertTrue(result['isBase64Encoded'])
+        self.assertEqual(result['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(result['headers']['Vary'], 'Accept-Encoding')
+        body = json.loads(gzip.decompress(base64.b64decode(result['body'])))
+        self.assertEqual(body['data'], NOTES)
+
+    @patch('database.get_all_notes')
+    def test_small_or_unaccepted_bodies_stay_plain(self, mock_notes):
+        mock_notes.return_value = NOTES
+        result = handler.handler(_list_event(), None)
+        self.assertNotIn('isBase64Encoded', result)
+        self.assertEqual(json.loads(result['body'])['data'], NOTES)
+
+        mock_notes.return_value = NOTES[:2]
+        result = handler.handler(_list_event('gzip'), None)
+        self.assertNotIn('isBase64Encoded', result)
+        self.assertEqual(json.loads(result['body'])['data'], NOTES[:2])
+
+    @patch('database.get_all_notes')
+    def test_cursor_error_while_encoding_is_a_500(self, mock_notes):
+        def failing():
+            yield NOTES[0]
+            raise RuntimeError('cursor died')
+        mock_notes.return_value = failing()
+
+        result = handler.handler(_list_event(), None)
+
+        self.assertEqual(result['statusCode'], 500)
+
+    @unittest.skipIf(brotli is None, "brotli not installed")
+    @patch('database.get_all_notes', return_value=NOTES)
+    def test_brotli_is_preferred(self, _notes):
+        result = handler.handler(_list_event('gzip, br'), None)
+
+        self.assertEqual(result['headers']['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(base64.b64decode(result['body'])))['data'], NOTES)
+
+if __name__ == '__main__':
+    unittest.main()
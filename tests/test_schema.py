@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import schema
+import database
+import sync_store
+
+# Set to a disposable database (e.g. mongodb://localhost:27017/schema_test) to verify real query plans
+MONGO_TEST_URI = os.environ.get('MONGO_TEST_URI')
+
+IXSCAN_PLAN = {'queryPlanner': {'winningPlan': {'stage': 'LIMIT', 'inputStage': {
+    'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'keyPattern': {'created_at': -1}}}}}}
+COLLSCAN_PLAN = {'queryPlanner': {'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}}}
+SBE_PLAN = {'queryPlanner': {'winningPlan': {'queryPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}}}
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        schema._ensured.clear()
+
+    def test_ensure_indexes_is_idempotent_per_process(self):
+        collections = {}
+        for name in schema.INDEX_SPECS:
+            collections[name] = MagicMock()
+            collections[name].name = name
+        db = MagicMock()
+        db.__getitem__.side_effect = collections.__getitem__
+
+        schema.ensure_indexes(db)
+        schema.ensure_indexes(db)
+
+        keywords = collections[schema.KEYWORDS_COLLECTION]
+        keywords.create_indexes.assert_called_once()
+        created = {model.document['name']: model.document for model in keywords.create_indexes.call_args[0][0]}
+        self.assertTrue(created['key_unique']['unique'])
+        self.assertEqual(dict(collections[schema.TODOS_COLLECTION].create_indexes.call_args[0][0][1].document['key']), {'created_at': -1, 'id': -1})
+
+    def test_uses_index(self):
+        self.assertTrue(schema.uses_index(IXSCAN_PLAN))
+        self.assertTrue(schema.uses_index(SBE_PLAN))
+        self.assertFalse(schema.uses_index(COLLSCAN_PLAN))
+
+    def test_verify_query_plans_with_mocked_explain(self):
+        db = MagicMock()
+        db.__getitem__.return_value.find.return_value.explain.return_value = IXSCAN_PLAN
+        db.__getitem__.return_value.find.return_value.sort.return_value.explain.return_value = IXSCAN_PLAN
+        db.__getitem__.return_value.find.return_value.sort.return_value.limit.return_value.explain.return_value = IXSCAN_PLAN
+
+        results = schema.verify_query_plans(db)
+        self.assertEqual(set(results), set(schema.hot_queries()))
+        self.assertTrue(all(results.values()))
+
+    @patch('schema.ensure_collection_indexes')
+    @patch('database.flush_writes')
+    def test_hot_queries_match_the_real_queries(self, _flush, _ensure):
+        def issued(run, name):
+            # The (filter, projection) and sort of the last find() on the collection
+            collections = {}
+            db = MagicMock()
+            db.__getitem__.side_effect = lambda key: collections.setdefault(key, MagicMock())
+            with patch('database._get_db', return_value=db):
+                run(db)
+            find = db[name].find
+            return find.call_args, find.return_value.sort.call_args
+
+        def shape(query):
+            # Operators and field names, not the probe values
+            if isinstance(query, dict):
+                return {key: shape(value) for key, value in query.items()}
+            if isinstance(query, list) and all(isinstance(value, dict) for value in query):
+                return [shape(value) for value in query]
+            return type(query)
+
+        hot = schema.hot_queries()
+        since = sync_store._now_iso()
+        pairs = [
+            (lambda db: list(database.iter_items_page('notes', before='2023-10-30T10:00:00,n1')), hot['iter_items_page'], 'notes'),
+            (lambda db: database.get_all_notes(), hot['get_all_notes'], 'notes'),
+            (lambda db: sync_store.get_changes_since(since, ['todo']), hot['get_changes_since'], 'todos'),
+            (lambda db: sync_store.get_changes_since(since, ['todo']), hot['get_changes_since/tombstones'], 'tombstones'),
+        ]
+        for run, build, name in pairs:
+            (real_find, real_sort), (hot_find, hot_sort) = issued(run, name), issued(build, name)
+            self.assertEqual(shape(real_find[0][0]), shape(hot_find[0][0]), name)
+            self.assertEqual(real_sort, hot_sort, name)
+
+    @unittest.skipUnless(MONGO_TEST_URI, "MONGO_TEST_URI not set")
+    def test_hot_queries_use_indexes_on_real_server(self):
+        import pymongo
+        client = pymongo.MongoClient(MONGO_TEST_URI)
+        db = client.get_default_database('schema_test')
+        try:
+            schema.ensure_indexes(db)
+            self.assertEqual(schema.verify_query_plans(db), {name: True for name in schema.hot_queries()})
+        finally:
+            client.drop_database(db.name)
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
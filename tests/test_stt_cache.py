@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+import json
+import threading
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import stt_cache
+import stt_service
+
+AUDIO = b'RIFF' + bytes(range(256)) * 64
+
+@patch.dict(os.environ, {'SCALEWAY_API_KEY': 'test'})
+class TestSttCache(unittest.TestCase):
+
+    def setUp(self):
+        stt_cache.clear()
+
+    @patch('stt_service._transcribe')
+    def test_retry_of_identical_audio_is_served_from_cache(self, mock_transcribe):
+        mock_transcribe.return_value = 'osta maitoa'
+
+        first = json.loads(stt_service.handle_speech_to_text(AUDIO, 'audio/wav')['body'])
+        retry = json.loads(stt_service.handle_speech_to_text(bytearray(AUDIO), 'audio/wav')['body'])
+
+        self.assertEqual(first, {'transcript': 'osta maitoa', 'cached': False})
+        self.assertEqual(retry, {'transcript': 'osta maitoa', 'cached': True})
+        mock_transcribe.assert_called_once()
+
+        # A different model would transcribe differently
+        with patch.dict(os.environ, {'STT_MODEL': 'whisper-small'}):
+            stt_service.handle_speech_to_text(AUDIO, 'audio/wav')
+        self.assertEqual(mock_transcribe.call_count, 2)
+
+    @patch('stt_service._transcribe')
+    def test_concurrent_duplicates_upload_once(self, mock_transcribe):
+        release = threading.Event()
+        def transcribe(*args, **kwargs):
+            release.wait(5)
+            return 'hello'
+        mock_transcribe.side_effect = transcribe
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(stt_service.handle_speech_to_text(AUDIO, 'audio/wav'))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        mock_transcribe.assert_called_once()
+        self.assertEqual(sorted(json.loads(r['body'])['cached'] for r in results), [False, True, True])
+
+    @patch('stt_service._transcribe')
+    def test_errors_are_not_cached(self, mock_transcribe):
+        mock_transcribe.side_effect = [RuntimeError('boom'), 'hello']
+
+        self.assertEqual(stt_service.handle_speech_to_text(AUDIO, 'audio/wav')['statusCode'], 500)
+        self.assertEqual(json.loads(stt_service.handle_speech_to_text(AUDIO, 'audio/wav')['body'])['cached'], False)
+
+    @patch.dict(os.environ, {'STT_CACHE_MONGO': 'true'})
+    @patch('cache_store.save_cache_entry')
+    @patch('cache_store.get_cache_entry')
+    @patch('stt_service._transcribe')
+    def test_mongo_tier_shared_across_instances(self, mock_transcribe, mock_get, mock_save):
+        mock_get.return_value = 'from another instance'
+
+        body = json.loads(stt_service.handle_speech_to_text(AUDIO, 'audio/wav')['body'])
+
+        self.assertEqual(body, {'transcript': 'from another instance', 'cached': True})
+        mock_transcribe.assert_not_called()
+        self.assertEqual(mock_get.call_args[0][0], 'stt_cache')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import sync_store
+
+class TestSync(unittest.TestCase):
+
+    def _db(self):
+        collections = {}
+        db = MagicMock()
+        db.__getitem__.side_effect = lambda name: collections.setdefault(name, MagicMock(name=name))
+        return db, collections
+
+    @patch('sync_store.schema.ensure_collection_indexes')
+    @patch('database._get_db')
+    def test_mutations_use_one_bulk_write_per_collection(self, mock_get_db, _ensure):
+        db, collections = self._db()
+        mock_get_db.return_value = db
+        for name in ('todos', 'keywords'):
+            db[name].bulk_write.return_value = MagicMock(deleted_count=1, upserted_count=1, matched_count=0)
+
+        sync_store.apply_sync_mutations([
+            {'op': 'delete', 'type': 'todo', 'id': 't1'},
+            {'op': 'delete', 'type': 'todo', 'id': 't2'},
+            {'op': 'delete', 'type': 'keyword', 'key': 'Work'},
+            {'op': 'upsert', 'type': 'keyword', 'key': 'Home', 'value': 'Mannerheimintie 1'}
+        ])
+
+        collections['todos'].bulk_write.assert_called_once()
+        self.assertEqual(len(collections['todos'].bulk_write.call_args[0][0]), 2)
+        collections['keywords'].bulk_write.assert_called_once()
+        self.assertNotIn('notes', collections)
+        tombstones = [doc for call in collections['tombstones'].insert_many.call_args_list for doc in call[0][0]]
+        self.assertEqual(sorted((t['type'], t['id']) for t in tombstones), [('keyword', 'work'), ('todo', 't1'), ('todo', 't2')])
+        collections['tombstones'].delete_many.assert_called_once_with({'type': 'keyword', 'id': {'$in': ['home']}})
+
+    @patch('sync_store.schema.ensure_collection_indexes')
+    @patch('database._get_db')
+    def test_stale_or_missing_token_forces_full_resync(self, mock_get_db, _ensure):
+        db, collections = self._db()
+        mock_get_db.return_value = db
+
+        self.assertTrue(sync_store.get_changes_since(None, ['note'])['full_resync'])
+        self.assertTrue(sync_store.get_changes_since('2000-01-01T00:00:00.000000', ['note'])['full_resync'])
+        collections['notes'].find.assert_called_with({}, {'_id': 0})
+        self.assertNotIn('tombstones', collections)
+
+        recent = sync_store._now_iso()
+        result = sync_store.get_changes_since(recent, ['note'])
+        self.assertFalse(result['full_resync'])
+        self.assertIn('$or', collections['notes'].find.call_args[0][0])
+        collections['tombstones'].find.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import json
+import datetime
+import threading
+from unittest.mock import patch
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import pytz
+import intent_cache
+import intent_handlers
+import llm_service
+from utils import time_context
+from utils.parser import extract_meeting_details
+
+HELSINKI = pytz.timezone('Europe/Helsinki')
+
+class TestTimeContext(unittest.TestCase):
+
+    def setUp(self):
+        intent_cache.clear()
+
+    def test_timezones_are_cached_and_unknown_names_fall_back_to_utc(self):
+        self.assertIs(time_context.get_timezone('Europe/Helsinki'), time_context.get_timezone('Europe/Helsinki'))
+        self.assertIs(time_context.get_timezone('Mars/Olympus_Mons'), pytz.UTC)
+        self.assertIs(time_context.get_timezone(None), pytz.UTC)
+        for invalid in ({'name': 'Europe/Helsinki'}, ['Europe/Helsinki'], 3):
+            self.assertIs(time_context.get_timezone(invalid), pytz.UTC)
+        self.assertEqual(time_context.now({'zone': 'x'}).tzinfo, pytz.UTC)
+        self.assertEqual(time_context.now('Europe/Helsinki').tzinfo.zone, 'Europe/Helsinki')
+
+    def test_calendar_is_reused_per_thread(self):
+        self.assertIs(time_context.calendar(), time_context.calendar())
+        other = []
+        thread = threading.Thread(target=lambda: other.append(time_context.calendar()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], time_context.calendar())
+
+    def test_meeting_details_resolve_against_the_request_now(self):
+        now = HELSINKI.localize(datetime.datetime(2026, 3, 28, 22, 30))
+        details = extract_meeting_details("Meeting with Anna tomorrow at 3pm for 30 minutes", 'Europe/Helsinki', now=now)
+
+        # The day after is the switch to summer time
+        self.assertEqual(details['start_time'].isoformat(), '2026-03-29T15:00:00+03:00')
+        self.assertEqual(details['end_time'] - details['start_time'], datetime.timedelta(minutes=30))
+
+    @patch('llm_service._request_intent', return_value={'intent': 'TODO', 'title': 'Call the plumber'})
+    def test_llm_prompt_time_is_in_the_user_timezone(self, mock_request):
+        llm_service.analyze_transcript("Can you make sure I remember to call the plumber", 'Europe/Helsinki')
+
+        now = mock_request.call_args[0][1]
+        self.assertEqual(now.tzinfo.zone, 'Europe/Helsinki')
+        self.assertTrue(llm_service._user_message('x', now).startswith(f'Current time: {now.isoformat()}'))
+        self.assertIn(now.isoformat()[-6:], ('+02:00', '+03:00'))
+
+    def test_meeting_handler_localizes_naive_model_times(self):
+        parsed = {'intent': 'MEETING', 'title': 'Sync with Anna', 'datetime': '2026-07-01T10:00:00'}
+        result = intent_handlers.handle_meeting(parsed, 'user@example.com', 'Europe/Helsinki')
+        self.assertEqual(json.loads(result['body'])['data']['start_time'], '2026-07-01T10:00:00+03:00')
+
+        now = HELSINKI.localize(datetime.datetime(2026, 7, 1, 12, 0))
+        result = intent_handlers.handle_meeting({'intent': 'MEETING', 'title': 'Sync with Anna'}, 'user@example.com', 'Europe/Helsinki', now=now)
+        # No model datetime: tomorrow at 9:00 (REQ-B-003)
+        self.assertEqual(json.loads(result['body'])['data']['start_time'], '2026-07-02T09:00:00+03:00')
+
+if __name__ == '__main__':
+    unittest.main()
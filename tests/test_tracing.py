@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import handler
+import database
+from utils import tracing
+
+class TestTracing(unittest.TestCase):
+
+    @patch('handler._prefetch_storage')
+    @patch('llm_service.analyze_transcript')
+    @patch('database.get_mongo_collection')
+    def test_server_timing_and_invocation_log(self, mock_collection, mock_analyze, _prefetch):
+        mock_analyze.return_value = {"intent": "TODO", "title": "Buy milk", "priority": "medium"}
+        # Simulates the driver reporting a 2.5 ms insert through the command listener
+        mock_collection.return_value.insert_one.side_effect = lambda item: database._command_listener.succeeded(MagicMock(duration_micros=2500))
+        event = {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'transcript': 'Buy milk'})
+        }
+
+        with self.assertLogs(level='INFO') as logs:
+            response = handler.handler(event, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        metrics = {m.split(';')[0]: m for m in response['headers']['Server-Timing'].split(', ')}
+        for name in ('parse', 'llm', 'dispatch', 'db.save_todo_item', 'total'):
+            self.assertIn(name, metrics)
+        self.assertEqual(metrics['mongo'], 'mongo;dur=2.5')
+
+        line = next(json.loads(r.getMessage()) for r in logs.records if '"invocation"' in r.getMessage())
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['bytes_in'], len(event['body']))
+        self.assertEqual(line['bytes_out'], len(response['body']))
+        self.assertEqual(line['spans']['db.save_todo_item']['count'], 1)
+        self.assertIn('cold', line)
+
+    @patch('database.get_all_todos', return_value=[])
+    def test_bytes_in_is_the_encoded_body_size(self, _todos):
+        for body, expected in (('{"q": "hääyö"}', len('{"q": "hääyö"}'.encode('utf-8'))), ({'type': 'todo', 'id': 'x'}, None)):
+            event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'todo'}, 'body': body}
+            with self.assertLogs(level='INFO') as logs:
+                handler.handler(event, None)
+            line = next(json.loads(r.getMessage()) for r in logs.records if '"invocation"' in r.getMessage())
+            self.assertEqual(line['bytes_in'], expected)
+
+    @patch('database.count_items', return_value=2)
+    @patch('database.iter_items_page')
+    def test_paged_listing_times_the_cursor(self, mock_page, _count):
+        mock_page.return_value = iter([{'id': 'n2', 'created_at': '2023-10-31T10:00:00'}, {'id': 'n1', 'created_at': '2023-10-30T10:00:00'}])
+        event = {'httpMethod': 'GET', 'queryStringParameters': {'action': 'list', 'type': 'note', 'limit': '5'}}
+
+        with self.assertLogs(level='INFO') as logs:
+            response = handler.handler(event, None)
+
+        self.assertEqual(len(json.loads(response['body'])['data']), 2)
+        line = next(json.loads(r.getMessage()) for r in logs.records if '"invocation"' in r.getMessage())
+        self.assertEqual(line['spans']['db.iter_items_page']['count'], 1)
+
+    def test_spans_outside_an_invocation_are_dropped(self):
+        self.assertIsNone(tracing.current())
+        with tracing.span('orphan'):
+            pass
+        database._command_listener.succeeded(MagicMock(duration_micros=1000))
+
+        trace = tracing.Trace()
+        token = tracing.activate(trace)
+        try:
+            with tracing.span('stt'):
+                pass
+            tracing.record('stt', 5.0)
+        finally:
+            tracing.deactivate(token)
+        self.assertEqual(list(trace.spans()), ['stt'])
+        self.assertEqual(trace.spans()['stt']['count'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import time
+import threading
+import datetime
+import urllib.error
+from unittest.mock import patch, MagicMock
+
+# Add backend to python path for testing
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import llm_service
+from utils import deadline
+from utils import upstream
+
+def _unavailable():
+    return urllib.error.HTTPError('https://llm.example', 503, 'Unavailable', {}, None)
+
+class TestUpstream(unittest.TestCase):
+
+    def setUp(self):
+        self.service = upstream.Upstream('test', timeout=10, retries=2, backoff=0.01)
+
+    @patch('utils.upstream.time.sleep')
+    def test_retries_transient_errors_with_jittered_backoff(self, mock_sleep):
+        func = MagicMock(side_effect=[_unavailable(), urllib.error.URLError('timed out'), 'ok'])
+
+        self.assertEqual(self.service.call(func), 'ok')
+
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        # Full jitter stays within the exponential cap
+        self.assertLessEqual(mock_sleep.call_args_list[1][0][0], 0.02)
+        self.assertEqual(self.service.stats()['retries'], 2)
+
+    def test_client_errors_are_not_retried_or_counted_as_failures(self):
+        func = MagicMock(side_effect=urllib.error.HTTPError('https://llm.example', 400, 'Bad Request', {}, None))
+
+        with self.assertRaises(urllib.error.HTTPError):
+            self.service.call(func)
+
+        func.assert_called_once()
+        self.assertEqual(self.service.stats()['failures'], 0)
+
+    @patch('utils.upstream.time.sleep')
+    def test_breaker_opens_fails_fast_and_recovers_through_a_probe(self, _sleep):
+        failing = MagicMock(side_effect=_unavailable())
+        for _ in range(upstream.BREAKER_FAILURES):
+            with self.assertRaises(urllib.error.HTTPError):
+                self.service.call(failing)
+        self.assertEqual(self.service.state, 'open')
+
+        calls = failing.call_count
+        with self.assertRaises(upstream.CircuitOpenError):
+            self.service.call(failing)
+        self.assertEqual(failing.call_count, calls)
+
+        with patch('utils.upstream.BREAKER_RESET_SECONDS', 0):
+            self.assertEqual(self.service.call(lambda timeout: 'ok'), 'ok')
+        self.assertEqual(self.service.state, 'closed')
+
+    @patch('utils.upstream.time.sleep')
+    def test_probe_that_runs_out_of_time_reopens_the_breaker(self, _sleep):
+        self.service._state = 'open'
+        failing = MagicMock(side_effect=_unavailable())
+
+        # The retry's timeout finds the budget spent after the backoff
+        with patch('utils.upstream.BREAKER_RESET_SECONDS', 0), patch('utils.upstream.deadline.remaining', side_effect=[10, 10, 0]):
+            with self.assertRaises(upstream.DeadlineExceeded):
+                self.service.call(failing)
+        self.assertEqual(self.service.state, 'open')
+
+        with patch('utils.upstream.BREAKER_RESET_SECONDS', 0):
+            self.assertEqual(self.service.call(lambda timeout: 'ok'), 'ok')
+        self.assertEqual(self.service.state, 'closed')
+
+    def test_slow_attempt_is_hedged_after_p95(self):
+        self.service._latencies.extend([0.01] * upstream.HEDGE_MIN_SAMPLES)
+        calls = []
+        release = threading.Event()
+
+        def func(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                # Stays in flight until the hedged duplicate has already answered
+                release.wait(timeout=5)
+                return 'slow'
+            return 'fast'
+
+        try:
+            self.assertEqual(self.service.call(func, hedge=True), 'fast')
+            self.assertFalse(release.is_set())
+        finally:
+            release.set()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.service.stats()['hedge_wins'], 1)
+
+    def test_attempt_timeout_is_capped_by_the_deadline(self):
+        timeouts = []
+        token = deadline.begin(3)
+        try:
+            self.service.call(lambda timeout: timeouts.append(timeout))
+        finally:
+            deadline.end(token)
+        self.assertLessEqual(timeouts[0], 3)
+        self.assertGreater(timeouts[0], 2)
+
+        token = deadline.begin(0.1)
+        try:
+            with self.assertRaises(upstream.DeadlineExceeded):
+                self.service.call(lambda timeout: 'too late')
+        finally:
+            deadline.end(token)
+
+class TestLlmResilience(unittest.TestCase):
+
+    def tearDown(self):
+        llm_service._upstream.reset()
+
+    @patch.dict(os.environ, {'LLM_API_KEY': 'test'})
+    @patch('llm_service.http_pool.request')
+    def test_open_breaker_skips_the_call_and_falls_back(self, mock_request):
+        llm_service._upstream._state = 'open'
+        llm_service._upstream._opened_at = time.monotonic()
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        self.assertIsNone(llm_service._request_intent('Remember the thing', now))
+        mock_request.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()